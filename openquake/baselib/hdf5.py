@@ -707,17 +707,19 @@ def build_dt(dtypedict, names):
     return numpy.dtype(lst)
 
 
-def _read_csv(fileobj, compositedt):
+def _read_csv_rows(fileobj, compositedt, lineno=2):
+    # slow path, converting the CSV row by row; lineno is the number of
+    # the first line after the header
     itemsize = [0] * len(compositedt)
     for i, name in enumerate(compositedt.names):
         if compositedt[name].kind == 'S':  # limit of the length of byte-fields
             itemsize[i] = compositedt[name].itemsize
     rows = []
-    for lineno, row in enumerate(csv.reader(fileobj), 3):
+    for lineno, row in enumerate(csv.reader(fileobj), lineno):
         cols = []
         for i, col in enumerate(row):
             if itemsize[i] and len(col) > itemsize[i]:
-                raise ValueError(
+                raise InvalidFile(
                     'line %d: %s=%r has length %d > %d' %
                     (lineno, compositedt.names[i], col, len(col), itemsize[i]))
             cols.append(col)
@@ -725,9 +727,94 @@ def _read_csv(fileobj, compositedt):
     return numpy.array(rows, compositedt)
 
 
-# NB: it would be nice to use numpy.loadtxt(
-#  f, build_dt(dtypedict, header), delimiter=sep, ndmin=1, comments=None)
-# however numpy does not support quoting, and "foo,bar" would be split :-(
+def _gen_csv_blocks(fileobj, compositedt, chunksize, lineno=2):
+    # fast path, parsing blocks of rows column by column with the C parser
+    # of pandas; numeric columns are converted directly into numbers
+    names = compositedt.names
+    dtype = {}
+    for i, name in enumerate(names):
+        kind = compositedt[name].kind
+        if kind == 'f':
+            dtype[i] = numpy.float64
+        elif kind in 'iu':
+            dtype[i] = numpy.int64
+        else:
+            dtype[i] = str
+    for df in pandas.read_csv(
+            fileobj, header=None, dtype=dtype, na_filter=False,
+            skip_blank_lines=False, float_precision='round_trip',
+            engine='c', chunksize=chunksize):
+        if len(df.columns) != len(names):
+            raise ValueError('Expected %d fields, got %d' %
+                             (len(names), len(df.columns)))
+        arr = numpy.zeros(len(df), compositedt)
+        for i, name in enumerate(names):
+            col = df[i].to_numpy()
+            dt = compositedt[name]
+            if dt.kind == 'S':  # limit of the length of byte-fields
+                lens = df[i].str.len().to_numpy()
+                [bad] = numpy.where(lens > dt.itemsize)
+                if len(bad):
+                    b = bad[0]
+                    raise InvalidFile('line %d: %s=%r has length %d > %d' % (
+                        lineno + b, name, col[b], lens[b], dt.itemsize))
+            arr[name] = col
+        yield arr
+        lineno += len(df)
+
+
+def _read_csv_blocks(fileobj, compositedt, chunksize, lineno):
+    arrays = list(_gen_csv_blocks(fileobj, compositedt, chunksize, lineno))
+    if not arrays:
+        return numpy.zeros(0, compositedt)
+    return numpy.concatenate(arrays) if len(arrays) > 1 else arrays[0]
+
+
+def _read_csv(fileobj, compositedt, lineno=2, chunksize=1_000_000):
+    # try first the vectorized reader; if pandas cannot parse or convert
+    # the file (for instance for an empty or malformed file) use the
+    # row-by-row reader, which has the same semantics and error messages
+    # as before
+    start = fileobj.tell()
+    try:
+        return _read_csv_blocks(fileobj, compositedt, chunksize, lineno)
+    except (pandas.errors.ParserError, ValueError):
+        fileobj.seek(start)
+        return _read_csv_rows(fileobj, compositedt, lineno)
+
+
+def _read_header(f, fname, sep):
+    # returns the attributes in the comment lines, the header fields and
+    # the number of the header line
+    attrs = {}
+    lineno = 0
+    while True:
+        first = f.readline()  # NB: next(f) would break f.tell()
+        lineno += 1
+        if not first:
+            raise InvalidFile('%s: missing header' % fname)
+        elif first.startswith('#'):
+            attrs = dict(parse_comment(first.strip('#,\n ')))
+            continue
+        break
+    return attrs, first.strip().split(sep), lineno
+
+
+def _build_dt(dtypedict, header, renamedict={}):
+    # build the dtype from the header and then rename the fields
+    try:
+        dt = build_dt(dtypedict, header)
+    except KeyError:
+        raise KeyError('Missing None -> default in dtypedict')
+    if renamedict:
+        dt = numpy.dtype([(renamedict.get(name, name), dt[name])
+                          for name in dt.names])
+    return dt
+
+
+# NB: numpy.loadtxt(f, build_dt(dtypedict, header), delimiter=sep, ndmin=1,
+# comments=None) cannot be used, since numpy does not support quoting and
+# "foo,bar" would be split :-( so the C parser of pandas is used instead
 def read_csv(fname, dtypedict={None: float}, renamedict={}, sep=',',
              index=None):
     """
@@ -738,19 +825,11 @@ def read_csv(fname, dtypedict={None: float}, renamedict={}, sep=',',
     :param index: if not None, returns a pandas DataFrame
     :returns: an ArrayWrapper, unless there is an index
     """
-    attrs = {}
     with open(fname, encoding='utf-8-sig') as f:
-        while True:
-            first = next(f)
-            if first.startswith('#'):
-                attrs = dict(parse_comment(first.strip('#,\n ')))
-                continue
-            break
-        header = first.strip().split(sep)
+        attrs, header, lineno = _read_header(f, fname, sep)
+        dt = _build_dt(dtypedict, header)
         try:
-            arr = _read_csv(f, build_dt(dtypedict, header))
-        except KeyError:
-            raise KeyError('Missing None -> default in dtypedict')
+            arr = _read_csv(f, dt, lineno + 1)
         except Exception as exc:
             raise InvalidFile('%s: %s' % (fname, exc))
     if renamedict:
@@ -766,6 +845,47 @@ def read_csv(fname, dtypedict={None: float}, renamedict={}, sep=',',
     return ArrayWrapper(arr, attrs)
 
 
+def read_csv_chunks(fname, dtypedict={None: float}, renamedict={}, sep=',',
+                    chunksize=1_000_000):
+    """
+    Read a large CSV file in chunks, so that the whole file never has to be
+    kept in memory. At least one (possibly empty) chunk is returned.
+
+    :param fname: a CSV file with an header and float fields
+    :param dtypedict: a dictionary fieldname -> dtype, None -> default
+    :param renamedict: aliases for the fields to rename
+    :param sep: separator (default comma)
+    :param chunksize: the maximum number of rows per chunk
+    :yields: structured arrays with at most chunksize rows
+    """
+    with open(fname, encoding='utf-8-sig') as f:
+        _attrs, header, lineno = _read_header(f, fname, sep)
+        dt = _build_dt(dtypedict, header, renamedict)
+        start = f.tell()
+        nrows = 0
+        try:
+            for arr in _gen_csv_blocks(f, dt, chunksize, lineno + 1):
+                nrows += len(arr)
+                yield arr
+        except InvalidFile as exc:
+            raise InvalidFile('%s: %s' % (fname, exc))
+        except (pandas.errors.ParserError, ValueError):
+            # use the row-by-row reader, which has the same semantics and
+            # error messages as read_csv, skipping the rows already read
+            f.seek(start)
+            try:
+                arr = _read_csv_rows(f, dt, lineno + 1)[nrows:]
+            except Exception as exc:
+                raise InvalidFile('%s: %s' % (fname, exc))
+            for i in range(0, len(arr), chunksize):
+                yield arr[i:i + chunksize]
+            if nrows == 0 and len(arr) == 0:
+                yield arr
+        else:
+            if nrows == 0:
+                yield numpy.zeros(0, dt)
+
+
 def save_npz(obj, path):
     """
     :param obj: object to serialize
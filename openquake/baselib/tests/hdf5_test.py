@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright (C) 2020 GEM Foundation
+#
+# OpenQuake is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# OpenQuake is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with OpenQuake. If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+from unittest import mock
+import numpy
+from openquake.baselib import hdf5, InvalidFile
+from openquake.baselib.general import gettemp
+
+S5 = (numpy.string_, 5)
+
+
+def read_rows(fname, dtypedict):
+    # read the file with the row-by-row reader
+    with open(fname, encoding='utf-8-sig') as f:
+        _attrs, header, lineno = hdf5._read_header(f, fname, ',')
+        return hdf5._read_csv_rows(
+            f, hdf5._build_dt(dtypedict, header), lineno + 1)
+
+
+class ReadCsvTestCase(unittest.TestCase):
+    def check(self, content, dtypedict):
+        # the fast path must give the same array as the row-by-row reader,
+        # without falling back on it
+        fname = gettemp(content, suffix='.csv')
+        with mock.patch.object(hdf5, '_read_csv_rows',
+                               side_effect=RuntimeError('fallback')):
+            arr = hdf5.read_csv(fname, dtypedict).array
+        expected = read_rows(fname, dtypedict)
+        self.assertEqual(arr.dtype, expected.dtype)
+        for name in arr.dtype.names:
+            numpy.testing.assert_equal(arr[name], expected[name])
+        return arr
+
+    def test_bool_bytes(self):
+        arr = self.check('flag,code,x\nTrue,ab,1\nFalse,abcde,2\n',
+                         {'flag': bool, 'code': S5, None: float})
+        self.assertEqual(list(arr['code']), [b'ab', b'abcde'])
+
+    def test_quoting(self):
+        arr = self.check('code,name,x\n"a,b","say ""hi""",1\nc,d,2\n',
+                         {'code': S5, 'name': str, None: float})
+        self.assertEqual(list(arr['code']), [b'a,b', b'c'])
+        self.assertEqual(list(arr['name']), ['say "hi"', 'd'])
+
+    def test_nan_inf(self):
+        arr = self.check('x,y\nnan,inf\n-inf,0.1\n',
+                         {None: float})
+        self.assertTrue(numpy.isnan(arr['x'][0]))
+        self.assertEqual(list(arr['y']), [numpy.inf, 0.1])
+        self.assertEqual(arr['x'][1], -numpy.inf)
+
+    def test_comments(self):
+        content = '#,,"vs30_ref=760"\ncode,x\nab,1\n'
+        dtypedict = {'code': S5, None: float}
+        self.check(content, dtypedict)
+        aw = hdf5.read_csv(gettemp(content), dtypedict)
+        self.assertEqual(aw.vs30_ref, 760)
+
+    def test_long_field(self):
+        # the error is raised by the fast path with the right line number
+        fname = gettemp('#,"a=1"\n#,"b=2"\ncode,x\nab,1\nabcdefgh,2\n')
+        with mock.patch.object(hdf5, '_read_csv_rows') as rows, \
+                self.assertRaises(InvalidFile) as ctx:
+            hdf5.read_csv(fname, {'code': S5, None: float})
+        self.assertFalse(rows.called)
+        self.assertIn("line 5: code='abcdefgh' has length 8 > 5",
+                      str(ctx.exception))
+        with self.assertRaises(InvalidFile) as ctx:
+            read_rows(fname, {'code': S5, None: float})
+        self.assertIn('line 5:', str(ctx.exception))
+        with self.assertRaises(InvalidFile) as ctx:
+            list(hdf5.read_csv_chunks(fname, {'code': S5, None: float}))
+        self.assertIn('line 5:', str(ctx.exception))
+
+    def test_fallback(self):
+        # an empty file cannot be parsed by pandas
+        [arr] = hdf5.read_csv_chunks(gettemp('x,y\n'))
+        self.assertEqual(len(arr), 0)
+        self.assertEqual(arr.dtype.names, ('x', 'y'))
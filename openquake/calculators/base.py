@@ -913,7 +913,7 @@ class RiskCalculator(HazardCalculator):
             imts, gmfs = to_gmfs(
                 shakemap, oq.spatial_correlation, oq.cross_correlation,
                 oq.site_effects, oq.truncation_level, E, oq.random_seed,
-                oq.imtls)
+                oq.imtls, oq.shakemap_max_distance)
             save_gmf_data(self.datastore, sitecol, gmfs, imts)
         return sitecol, assetcol
 
@@ -944,10 +944,10 @@ class RiskCalculator(HazardCalculator):
             self.datastore.swmr_on()
         return riskinputs
 
-    def get_getter(self, kind, sid):
+    def get_getter(self, kind, sids):
         """
         :param kind: 'poe' or 'gmf'
-        :param sid: a site ID
+        :param sids: a list of contiguous site IDs
         :returns: a PmapGetter or GmfDataGetter
         """
         if (self.oqparam.hazard_calculation_id and
@@ -959,9 +959,9 @@ class RiskCalculator(HazardCalculator):
             dstore = self.datastore
         if kind == 'poe':  # hcurves, shape (R, N)
             ws = [rlz.weight for rlz in self.realizations]
-            getter = getters.PmapGetter(dstore, ws, [sid])
+            getter = getters.PmapGetter(dstore, ws, sids)
         else:  # gmf
-            getter = getters.GmfDataGetter(dstore, [sid], self.R)
+            getter = getters.GmfDataGetter(dstore, sids, self.R)
             if len(dstore['gmf_data/data']) == 0:
                 raise RuntimeError(
                     'There are no GMFs available: perhaps you set '
@@ -983,18 +983,28 @@ class RiskCalculator(HazardCalculator):
                               % self.oqparam.inputs['job_ini'])
         rinfo_dt = numpy.dtype([('sid', U16), ('num_assets', U16)])
         rinfo = []
-        assets_by_site = self.assetcol.assets_by_site()
-        for sid, assets in enumerate(assets_by_site):
+        chunks = []  # pairs (sid, assets) with at most assets_per_site_limit
+        for sid, assets in enumerate(self.assetcol.assets_by_site()):
             if len(assets) == 0:
                 continue
-            getter = self.get_getter(kind, sid)
             for block in general.block_splitter(
                     assets, self.oqparam.assets_per_site_limit):
-                yield riskinput.RiskInput(sid, getter, numpy.array(block))
+                chunks.append((sid, numpy.array(block)))
             rinfo.append((sid, len(block)))
             if len(block) >= TWO16:
                 logging.error('There are %d assets on site #%d!',
                               len(block), sid)
+        # group contiguous sites in blocks, so that each hazard getter
+        # reads a single slab for the whole block
+        ct = self.oqparam.concurrent_tasks or 1
+        max_weight = min(self.oqparam.assets_per_site_limit,
+                         numpy.ceil(len(self.assetcol) / ct))
+        for block in general.block_splitter(
+                chunks, max_weight, lambda chunk: len(chunk[1])):
+            sids = sorted(set(sid for sid, _ in block))
+            getter = self.get_getter(kind, sids)
+            yield riskinput.RiskInput(
+                getter, numpy.concatenate([assets for _, assets in block]))
         self.datastore['riskinput_info'] = numpy.array(rinfo, rinfo_dt)
 
     def execute(self):
@@ -1030,86 +1040,109 @@ def save_gmf_data(dstore, sitecol, gmfs, imts, events=()):
         events = numpy.zeros(E, rupture.events_dt)
         events['id'] = numpy.arange(E, dtype=U32)
     dstore['events'] = events
-    offset = 0
     # convert an array of shape (N, E, M) into an array of type gmv_data_dt
     N, E, M = gmfs.shape
-    lst = [(sitecol.sids[s], ei, gmfs[s, ei])
-           for s in numpy.arange(N, dtype=U32)
-           for ei, event in enumerate(events)]
-    gmfa = numpy.array(lst, dstore['oqparam'].gmf_data_dt())
+    gmfa = numpy.zeros(N * E, dstore['oqparam'].gmf_data_dt())
+    gmfa['sid'] = numpy.repeat(sitecol.sids, E)
+    gmfa['eid'] = numpy.tile(numpy.arange(E, dtype=U32), N)
+    gmfa['gmv'] = gmfs.reshape(N * E, M)
     dstore['gmf_data/data'] = gmfa
-    dic = general.group_array(gmfa, 'sid')
-    lst = []
-    all_sids = sitecol.complete.sids
-    for sid in all_sids:
-        rows = dic.get(sid, ())
-        n = len(rows)
-        lst.append((offset, offset + n))
-        offset += n
     dstore['gmf_data/imts'] = ' '.join(imts)
-    dstore['gmf_data/indices'] = numpy.array(lst, U32)
+    dstore['gmf_data/indices'] = build_gmf_indices(
+        gmfa['sid'], sitecol.complete.sids)
 
 
-def import_gmfs(dstore, fname, sids):
+def build_gmf_indices(sids, all_sids):
     """
-    Import in the datastore a ground motion field CSV file.
+    :param sids: an array of site IDs sorted in ascending order
+    :param all_sids: the complete array of site IDs, in ascending order
+    :returns: an array of (start, stop) indices of shape (len(all_sids), 2)
+    """
+    indices = numpy.zeros((len(all_sids), 2), U32)
+    indices[:, 0] = numpy.searchsorted(sids, all_sids, 'left')
+    indices[:, 1] = numpy.searchsorted(sids, all_sids, 'right')
+    return indices
+
+
+def import_gmfs(dstore, fname, sids, chunksize=1_000_000):
+    """
+    Import in the datastore a ground motion field CSV file. The file is
+    read in chunks and only the IMTs required by the calculation are kept.
+    Each chunk is sorted by site ID and appended to gmf_data/data as it
+    arrives, so that only a chunk at a time is kept in memory; then the
+    indices are built from the stored site IDs.
 
     :param dstore: the datastore
     :param fname: the CSV file
     :param sids: the site IDs (complete)
+    :param chunksize: the maximum number of CSV rows to read at once
     :returns: event_ids, num_rlzs
     """
-    array = hdf5.read_csv(fname, {'sid': U32, 'eid': U32, None: F32},
-                          renamedict=dict(site_id='sid', event_id='eid',
-                                          rlz_id='rlzi')).array
-    names = array.dtype.names
-    if names[0] == 'rlzi':  # backward compatbility
-        names = names[1:]  # discard the field rlzi
-    imts = [name[4:] for name in names[2:]]
     oq = dstore['oqparam']
-    missing = set(oq.imtls) - set(imts)
-    if missing:
-        raise ValueError('The calculation needs %s which is missing from %s' %
-                         (', '.join(missing), fname))
     imt2idx = {imt: i for i, imt in enumerate(oq.imtls)}
-    arr = numpy.zeros(len(array), oq.gmf_data_dt())
-    for name in names:
-        if name.startswith('gmv_'):
-            try:
-                m = imt2idx[name[4:]]
-            except KeyError:  # the file contains more than enough IMTs
-                pass
-            else:
+    dset = dstore.create_dset('gmf_data/data', oq.gmf_data_dt())
+    imts = None
+    eids = numpy.zeros(0, U32)
+    for array in hdf5.read_csv_chunks(
+            fname, {'sid': U32, 'eid': U32, 'site_id': U32, 'event_id': U32,
+                    None: F32}, renamedict=dict(
+                        site_id='sid', event_id='eid', rlz_id='rlzi'),
+            chunksize=chunksize):
+        names = array.dtype.names
+        if names[0] == 'rlzi':  # backward compatbility
+            names = names[1:]  # discard the field rlzi
+        if imts is None:  # first chunk
+            imts = [name[4:] for name in names[2:]]
+            missing = set(oq.imtls) - set(imts)
+            if missing:
+                raise ValueError(
+                    'The calculation needs %s which is missing from %s' %
+                    (', '.join(missing), fname))
+        eids = numpy.union1d(eids, array['eid'])
+        # discard the sites not in the site collection
+        array = array[numpy.isin(array['sid'], sids)]
+        arr = numpy.zeros(len(array), oq.gmf_data_dt())
+        arr['sid'] = array['sid']
+        arr['eid'] = array['eid']
+        for name in names[2:]:
+            m = imt2idx.get(name[4:])
+            if m is not None:  # the file can contain more IMTs than needed
                 arr['gmv'][:, m] = array[name]
-        else:
-            arr[name] = array[name]
+        del array
+        # sort by site ID, keeping the order of the rows within each site
+        hdf5.extend(dset, arr[numpy.argsort(arr['sid'], kind='stable')])
+        del arr
 
-    n = len(numpy.unique(array[['sid', 'eid']]))
-    if n != len(array):
-        raise ValueError('Duplicated site_id, event_id in %s' % fname)
     # store the events
-    eids = numpy.unique(array['eid'])
-    eids.sort()
     if eids[0] != 0:
         raise ValueError('The event_id must start from zero in %s' % fname)
-    E = len(eids)
-    events = numpy.zeros(E, rupture.events_dt)
+    events = numpy.zeros(len(eids), rupture.events_dt)
     events['id'] = eids
     dstore['events'] = events
-    # store the GMFs
-    dic = general.group_array(arr, 'sid')
-    lst = []
-    offset = 0
-    gmvlst = []
-    for sid in sids:
-        n = len(dic.get(sid, []))
-        lst.append((offset, offset + n))
-        if n:
-            offset += n
-            gmvs = dic[sid]
-            gmvlst.append(gmvs)
-    dstore['gmf_data/data'] = numpy.concatenate(gmvlst)
-    dstore['gmf_data/indices'] = numpy.array(lst, U32)
+
+    # build the indices from the stored site IDs
+    sid = dset['sid']
+    key = (sid.astype(numpy.uint64) << 32) + dset['eid']
+    if len(numpy.unique(key)) != len(key):
+        raise ValueError('Duplicated site_id, event_id in %s' % fname)
+    del key
+    if (sid[1:] >= sid[:-1]).all():  # a single slice per site
+        dstore['gmf_data/indices'] = build_gmf_indices(sid, sids)
+    else:  # a slice per site and chunk, as in event_based
+        # a new slice starts where the site ID changes
+        starts = numpy.concatenate(
+            [[0], numpy.where(sid[1:] != sid[:-1])[0] + 1])
+        stops = numpy.append(starts[1:], len(sid))
+        indices = dstore.create_dset('gmf_data/indices', hdf5.vuint32,
+                                     shape=(len(sids), 2), fillvalue=None)
+        order = numpy.argsort(sid[starts], kind='stable')
+        uniq, idxs = numpy.unique(sid[starts][order], return_index=True)
+        slices = dict(zip(uniq, numpy.split(order, idxs[1:])))
+        empty = numpy.zeros(0, U32)
+        for i, s in enumerate(sids):
+            idx = slices.get(s, empty)
+            indices[i, 0] = U32(starts[idx])
+            indices[i, 1] = U32(stops[idx])
     dstore['gmf_data/imts'] = ' '.join(imts)
     dstore['weights'] = numpy.ones(1)
     return eids
@@ -42,7 +42,7 @@ def classical_damage(riskinputs, crmodel, param, monitor):
     for ri in riskinputs:
         for out in ri.gen_outputs(crmodel, monitor):
             for l, loss_type in enumerate(crmodel.loss_types):
-                ordinals = ri.assets['ordinal']
+                ordinals = out.assets['ordinal']
                 result[l, out.rlzi] += dict(zip(ordinals, out[loss_type]))
     return result
 
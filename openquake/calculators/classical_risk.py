@@ -17,6 +17,7 @@
 # along with OpenQuake. If not, see <http://www.gnu.org/licenses/>.
 import numpy
 from openquake.baselib.python3compat import encode
+from openquake.baselib.general import group_array
 from openquake.hazardlib.stats import compute_stats
 from openquake.risklib import scientific
 from openquake.calculators import base
@@ -41,34 +42,55 @@ def classical_risk(riskinputs, crmodel, param, monitor):
     result = dict(loss_curves=[], stat_curves=[])
     weights = [w['default'] for w in param['weights']]
     statnames, stats = zip(*param['stats'])
+    slices = [crmodel.imtls(imt) for imt in crmodel.imtls]
     for ri in riskinputs:
         A = len(ri.assets)
         L = len(crmodel.lti)
         R = ri.hazard_getter.num_rlzs
-        loss_curves = numpy.zeros((R, L, A), object)
+        losses = {}  # l -> array of shape (A, C)
+        poes = {}  # l -> array of shape (R, A, C)
         avg_losses = numpy.zeros((R, L, A))
-        for out in ri.gen_outputs(crmodel, monitor):
-            r = out.rlzi
-            for l, loss_type in enumerate(crmodel.loss_types):
-                # loss_curves has shape (A, C)
-                for i, asset in enumerate(ri.assets):
-                    loss_curves[out.rlzi, l, i] = lc = out[loss_type][i]
-                    aid = asset['ordinal']
-                    avg = scientific.average_loss(lc)
-                    avg_losses[r, l, i] = avg
-                    lcurve = (lc['loss'], lc['poe'], avg)
-                    result['loss_curves'].append((l, r, aid, lcurve))
+        aid2idx = {aid: idx for idx, aid in enumerate(ri.aids)}
+        haz = ri.hazard_getter.get_hazard()  # sid -> R probability curves
+        with monitor('computing risk', measuremem=False):
+            for taxo, assets in group_array(ri.assets, 'taxonomy').items():
+                aids = assets['ordinal']
+                idxs = [aid2idx[aid] for aid in aids]
+                rmodels, rweights = crmodel.get_rmodels_weights(taxo)
+                for r in range(R):
+                    # the hazard curves on the sites of the assets
+                    hcurves = numpy.array([haz[sid][r].array[:, 0]
+                                           for sid in assets['site_id']])
+                    for l, loss_type in enumerate(crmodel.loss_types):
+                        # loss_curves has shape (A, C), computed for all
+                        # the sites of the block at once
+                        arrays = [rm(loss_type, assets,
+                                     hcurves[:, slices[rm.imti[loss_type]]],
+                                     [], ()) for rm in rmodels]
+                        lcs = arrays[0] if len(arrays) == 1 else numpy.average(
+                            arrays, weights=rweights, axis=0)
+                        if l not in poes:
+                            losses[l] = numpy.zeros((A,) + lcs.shape[1:],
+                                                    lcs['loss'].dtype)
+                            poes[l] = numpy.zeros((R, A) + lcs.shape[1:],
+                                                  lcs['poe'].dtype)
+                        losses[l][idxs] = lcs['loss']
+                        poes[l][r, idxs] = lcs['poe']
+                        avgs = scientific.average_loss(lcs)
+                        avg_losses[r, l, idxs] = avgs
+                        if R > 1:
+                            for aid, lc, avg in zip(aids, lcs, avgs):
+                                lcurve = (lc['loss'], lc['poe'], avg)
+                                result['loss_curves'].append(
+                                    (l, r, aid, lcurve))
 
-        # compute statistics
-        for l, loss_type in enumerate(crmodel.loss_types):
-            for i, asset in enumerate(ri.assets):
-                avg_stats = compute_stats(avg_losses[:, l, i], stats, weights)
-                losses = loss_curves[0, l, i]['loss']
-                all_poes = numpy.array(
-                    [loss_curves[r, l, i]['poe'] for r in range(R)])
-                poes_stats = compute_stats(all_poes, stats, weights)
+        # compute statistics for all the assets at once
+        for l in sorted(poes):
+            avg_stats = compute_stats(avg_losses[:, l], stats, weights)
+            poes_stats = compute_stats(poes[l], stats, weights)
+            for i, aid in enumerate(ri.aids):
                 result['stat_curves'].append(
-                    (l, asset['ordinal'], losses, poes_stats, avg_stats))
+                    (l, aid, losses[l][i], poes_stats[:, i], avg_stats[:, i]))
     if R == 1:  # the realization is the same as the mean
         del result['loss_curves']
     return result
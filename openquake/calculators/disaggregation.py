@@ -79,7 +79,7 @@ def _iml4(rlzs, iml_disagg, imtls, poes_disagg, curves):
     N, Z = rlzs.shape
     P = len(poes_disagg)
     M = len(imtls)
-    arr = numpy.empty((N, M, P, Z))
+    arr = numpy.full((N, M, P, Z), numpy.nan)  # NaN for sites without hazard
     for m, imt in enumerate(imtls):
         for (s, z), rlz in numpy.ndenumerate(rlzs):
             curve = curves[s][z]
@@ -22,26 +22,25 @@ import operator
 import numpy
 
 from openquake.baselib import hdf5
-from openquake.baselib.general import AccumDict, get_indices
+from openquake.baselib.general import AccumDict
 from openquake.hazardlib.probability_map import ProbabilityMap
 from openquake.hazardlib.stats import compute_pmap_stats
 from openquake.hazardlib.calc.stochastic import sample_ruptures
 from openquake.hazardlib.calc.filters import nofilter
 from openquake.hazardlib import InvalidFile
 from openquake.hazardlib.source import rupture
-from openquake.risklib.riskinput import str2rsi
 from openquake.baselib import parallel
 from openquake.commonlib import calc, util, logs
 from openquake.calculators import base
 from openquake.calculators.getters import (
-    GmfGetter, RuptureGetter, gen_rgetters, gen_rupture_getters,
-    sig_eps_dt, time_dt)
+    GmfGetter, gen_rupture_getters, sig_eps_dt, time_dt)
 from openquake.calculators.classical import ClassicalCalculator
 from openquake.engine import engine
 
 U8 = numpy.uint8
 U16 = numpy.uint16
 U32 = numpy.uint32
+I64 = numpy.int64
 F32 = numpy.float32
 F64 = numpy.float64
 TWO32 = numpy.float64(2 ** 32)
@@ -102,11 +101,13 @@ class EventBasedCalculator(base.HazardCalculator):
 
     def acc0(self):
         """
-        Initial accumulator, a dictionary (grp_id, gsim) -> curves
+        Initial accumulator, an array of hazard curves of shape (N, R, L),
+        empty if hazard_curves_from_gmfs is not set
         """
         self.L = len(self.oqparam.imtls.array)
-        zd = {r: ProbabilityMap(self.L) for r in range(self.R)}
-        return zd
+        N = (len(self.sitecol.complete)
+             if self.oqparam.hazard_curves_from_gmfs else 0)
+        return numpy.zeros((N, self.R, self.L))
 
     def build_events_from_sources(self):
         """
@@ -169,8 +170,8 @@ class EventBasedCalculator(base.HazardCalculator):
 
     def agg_dicts(self, acc, result):
         """
-        :param acc: accumulator dictionary
-        :param result: an AccumDict with events, ruptures, gmfs and hcurves
+        :param acc: accumulator array of shape (N, R, L)
+        :param result: a dictionary with gmfdata, indices and hcurves
         """
         sav_mon = self.monitor('saving gmfs')
         agg_mon = self.monitor('aggregating hcurves')
@@ -183,58 +184,34 @@ class EventBasedCalculator(base.HazardCalculator):
                 hdf5.extend(self.datastore['gmf_data/data'], data)
                 sig_eps = result.pop('sig_eps')
                 hdf5.extend(self.datastore['gmf_data/sigma_epsilon'], sig_eps)
-                for sid, start, stop in result['indices']:
-                    self.indices[sid, 0].append(start + self.offset)
-                    self.indices[sid, 1].append(stop + self.offset)
+                indices = result['indices'].astype(I64)
+                indices[:, 1:] += self.offset
+                self.indices.append(indices)
                 self.offset += len(data)
         if self.offset >= TWO32:
             raise RuntimeError(
                 'The gmf_data table has more than %d rows' % TWO32)
-        imtls = self.oqparam.imtls
-        with agg_mon:
-            for key, poes in result.get('hcurves', {}).items():
-                r, sid, imt = str2rsi(key)
-                array = acc[r].setdefault(sid, 0).array[imtls(imt), 0]
-                array[:] = 1. - (1. - array) * (1. - poes)
+        hcurves = result.get('hcurves', ())
+        if len(hcurves):
+            with agg_mon:
+                # the pairs (sid, rlz) are unique within a task
+                idx = hcurves['sid'], hcurves['rlz']
+                acc[idx] = 1. - (1. - acc[idx]) * (1. - hcurves['poes'])
         self.datastore.flush()
         return acc
 
     def save_events(self, rup_array):
         """
         :param rup_array: an array of ruptures with fields grp_id
-        :returns: a list of RuptureGetters
         """
         # this is very fast compared to saving the ruptures
-        eids = rupture.get_eids(
-            rup_array, self.samples_by_grp, self.num_rlzs_by_grp)
-        self.check_overflow()  # check the number of events
-        events = numpy.zeros(len(eids), rupture.events_dt)
-        # when computing the events all ruptures must be considered,
+        # NB: when computing the events all ruptures must be considered,
         # including the ones far away that will be discarded later on
-        rgetters = gen_rgetters(self.datastore)
-        # build the associations eid -> rlz sequentially or in parallel
-        # this is very fast: I saw 30 million events associated in 1 minute!
-        logging.info('Building assocs event_id -> rlz_id for {:_d} events'
-                     ' and {:_d} ruptures'.format(len(events), len(rup_array)))
-        if len(events) < 1E5:
-            it = map(RuptureGetter.get_eid_rlz, rgetters)
-        else:
-            it = parallel.Starmap(RuptureGetter.get_eid_rlz,
-                                  ((rgetter,) for rgetter in rgetters),
-                                  progress=logging.debug,
-                                  h5=self.datastore.hdf5)
-        i = 0
-        for eid_rlz in it:
-            for er in eid_rlz:
-                events[i] = er
-                i += 1
-                if i >= TWO32:
-                    raise ValueError('There are more than %d events!' % i)
-        events.sort(order='rup_id')  # fast too
-        # sanity check
-        n_unique_events = len(numpy.unique(events[['id', 'rup_id']]))
-        assert n_unique_events == len(events), (n_unique_events, len(events))
-        events['id'] = numpy.arange(len(events))
+        self.check_overflow()  # check the number of events
+        logging.info('Building assocs event_id -> rlz_id for {:_d} ruptures'
+                     .format(len(rup_array)))
+        events = rupture.get_events(
+            rup_array, self.samples_by_grp, self.rlzs_by_gsim_grp)
         # set event year and event ses starting from 1
         itime = int(self.oqparam.investigation_time)
         nses = self.oqparam.ses_per_logic_tree_path
@@ -243,10 +220,12 @@ class EventBasedCalculator(base.HazardCalculator):
         extra['year'] = numpy.random.choice(itime, len(events)) + 1
         extra['ses_id'] = numpy.random.choice(nses, len(events)) + 1
         self.datastore['events'] = util.compose_arrays(events, extra)
-        eindices = get_indices(events['rup_id'])
-        arr = numpy.array(list(eindices.values()))[:, 0, :]
-        self.datastore['ruptures']['e0'] = arr[:, 0]
-        self.datastore['ruptures']['e1'] = arr[:, 1]
+        # the events are ordered by rup_id, so each rupture has an
+        # associated slice of events e0:e1
+        counts = numpy.bincount(events['rup_id'], minlength=len(rup_array))
+        e1 = numpy.cumsum(counts)
+        self.datastore['ruptures']['e0'] = e1 - counts
+        self.datastore['ruptures']['e1'] = e1
 
     def check_overflow(self):
         """
@@ -300,7 +279,7 @@ class EventBasedCalculator(base.HazardCalculator):
         oq = self.oqparam
         self.set_param()
         self.offset = 0
-        self.indices = AccumDict(accum=[])  # sid, idx -> indices
+        self.indices = []  # arrays of triples (sid, start, stop)
         if oq.hazard_calculation_id:  # from ruptures
             self.datastore.parent = util.read(oq.hazard_calculation_id)
             self.init_logic_tree(self.datastore.parent['full_lt'])
@@ -344,12 +323,19 @@ class EventBasedCalculator(base.HazardCalculator):
             logging.info('Saving gmf_data/indices')
             with self.monitor('saving gmf_data/indices', measuremem=True):
                 self.datastore['gmf_data/imts'] = ' '.join(oq.imtls)
+                indices = numpy.concatenate(self.indices)
+                indices = indices[numpy.argsort(indices[:, 0], kind='stable')]
+                sids, idxs = numpy.unique(indices[:, 0], return_index=True)
+                startstop = dict(
+                    zip(sids, numpy.split(indices[:, 1:], idxs[1:])))
+                empty = numpy.zeros((0, 2), U32)
                 for sid in self.sitecol.complete.sids:
-                    start = numpy.array(self.indices[sid, 0])
-                    stop = numpy.array(self.indices[sid, 1])
+                    start, stop = startstop.get(sid, empty).T
                     dset[sid, 0] = start
                     dset[sid, 1] = stop
-                    num_evs[sid] = (stop - start).sum()
+                num_evs[:] = numpy.bincount(
+                    indices[:, 0], weights=indices[:, 2] - indices[:, 1],
+                    minlength=N)
             avg_events_by_sid = num_evs[()].sum() / N
             logging.info('Found ~%d GMVs per site', avg_events_by_sid)
         elif oq.ground_motion_fields:
@@ -365,7 +351,7 @@ class EventBasedCalculator(base.HazardCalculator):
         M = len(oq.imtls)
         L = len(oq.imtls.array)
         L1 = L // M
-        if result and oq.hazard_curves_from_gmfs:
+        if oq.hazard_curves_from_gmfs and len(result):
             rlzs = self.datastore['full_lt'].get_realizations()
             # compute and save statistics; this is done in process and can
             # be very slow if there are thousands of realizations
@@ -375,7 +361,9 @@ class EventBasedCalculator(base.HazardCalculator):
             # save the statistical curves only
             hstats = oq.hazard_stats()
             S = len(hstats)
-            pmaps = list(result.values())
+            sids = self.sitecol.complete.sids
+            pmaps = [ProbabilityMap.from_array(result[:, r], sids)
+                     for r in range(result.shape[1])]
             R = len(weights)
             if len(pmaps) != R:
                 # this should never happen, unless I break the
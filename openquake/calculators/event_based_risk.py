@@ -79,8 +79,8 @@ def event_based_risk(riskinputs, crmodel, param, monitor):
                 loss_ratios = out[loss_type]
                 if loss_ratios is None:  # for GMFs below the minimum_intensity
                     continue
-                avalues = riskmodels.get_values(loss_type, ri.assets)
-                for a, asset in enumerate(ri.assets):
+                avalues = riskmodels.get_values(loss_type, out.assets)
+                for a, asset in enumerate(out.assets):
                     aval = avalues[a]
                     aid = asset['ordinal']
                     idx = aid2idx[aid]
@@ -16,22 +16,20 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with OpenQuake.  If not, see <http://www.gnu.org/licenses/>.
 import collections
-import itertools
 import operator
 import logging
-import unittest.mock as mock
 import numpy
 from openquake.baselib import hdf5, datastore, general
 from openquake.hazardlib.gsim.base import ContextMaker, FarAwayRupture
 from openquake.hazardlib import calc, probability_map, stats
-from openquake.hazardlib.source.rupture import (
-    EBRupture, BaseRupture, events_dt, RuptureProxy)
-from openquake.risklib.riskinput import rsi2str
-from openquake.commonlib.calc import _gmvs_to_haz_curve
+from openquake.hazardlib.source.rupture import BaseRupture, RuptureProxy
 
 U16 = numpy.uint16
 U32 = numpy.uint32
 F32 = numpy.float32
+F64 = numpy.float64
+I64 = numpy.int64
+TWO16 = 2 ** 16
 by_taxonomy = operator.attrgetter('taxonomy')
 code2cls = BaseRupture.init()
 
@@ -129,26 +127,35 @@ class PmapGetter(object):
         # populate _pmap_by_grp
         self._pmap_by_grp = {}
         if 'poes' in self.dstore:
-            # build probability maps restricted to the given sids
-            ok_sids = set(self.sids)
+            # build probability maps restricted to the given sids, by
+            # reading the curves in contiguous runs of rows per group
             for grp, dset in self.dstore['poes'].items():
                 ds = dset['array']
                 L, G = ds.shape[1:]
                 pmap = probability_map.ProbabilityMap(L, G)
-                for idx, sid in enumerate(dset['sids'][()]):
-                    if sid in ok_sids:
-                        pmap[sid] = probability_map.ProbabilityCurve(ds[idx])
+                sids = dset['sids'][()]
+                idxs, = numpy.where(numpy.isin(sids, self.sids))
+                # a new run starts where an index does not follow the previous
+                brk = numpy.where(numpy.diff(idxs) > 1)[0] + 1
+                for run in numpy.split(idxs, brk):
+                    if len(run) == 0:  # no sites in this group
+                        continue
+                    slab = ds[run[0]:run[-1] + 1]
+                    for idx, array in zip(run, slab):
+                        pmap[sids[idx]] = probability_map.ProbabilityCurve(
+                            array)
                 self._pmap_by_grp[grp] = pmap
                 self.nbytes += pmap.nbytes
         return self._pmap_by_grp
 
-    # used in risk calculation where there is a single site per getter
+    # used in risk calculations
     def get_hazard(self, gsim=None):
         """
         :param gsim: ignored
-        :returns: R probability curves for the given site
+        :returns: a dictionary sid -> R probability curves
         """
-        return self.get_pcurves(self.sids[0])
+        pmap_by_grp = self.init()
+        return {sid: self.get_pcurves(sid, pmap_by_grp) for sid in self.sids}
 
     def get(self, rlzi, grp=None):
         """
@@ -267,7 +274,6 @@ class GmfDataGetter(collections.abc.Mapping):
         self.dstore = dstore
         self.sids = sids
         self.num_rlzs = num_rlzs
-        assert len(sids) == 1, sids
 
     def init(self):
         if hasattr(self, 'data'):  # already initialized
@@ -278,9 +284,10 @@ class GmfDataGetter(collections.abc.Mapping):
         except KeyError:  # engine < 3.3
             self.imts = list(self.dstore['oqparam'].imtls)
         self.rlzs = self.dstore['events']['rlz_id']
-        self.data = self[self.sids[0]]
-        if not self.data:  # no GMVs, return 0, counted in no_damage
-            self.data = {rlzi: 0 for rlzi in range(self.num_rlzs)}
+        self.data = self.read(self.sids)
+        for sid in self.sids:
+            if not self.data.get(sid):  # no GMVs, counted in no_damage
+                self.data[sid] = {rlzi: 0 for rlzi in range(self.num_rlzs)}
         # now some attributes set for API compatibility with the GmfGetter
         # number of ground motion fields
         # dictionary rlzi -> array(imts, events, nbytes)
@@ -289,21 +296,63 @@ class GmfDataGetter(collections.abc.Mapping):
     def get_hazard(self, gsim=None):
         """
         :param gsim: ignored
-        :returns: an dict rlzi -> datadict
+        :returns: a dict sid -> rlzi -> datadict
         """
         return self.data
 
-    def __getitem__(self, sid):
+    def read(self, sids):
+        """
+        Read the GMFs of the given sites. The slices of gmf_data/data
+        are merged into contiguous runs, so that a block of contiguous
+        sites is read with a few slab reads, and then split in memory.
+
+        :param sids: a list of site IDs
+        :returns: a dictionary sid -> rlzi -> array of GMVs
+        """
         dset = self.dstore['gmf_data/data']
-        idxs = self.dstore['gmf_data/indices'][sid]
-        if idxs.dtype.name == 'uint32':  # scenario
-            idxs = [idxs]
-        elif not idxs.dtype.names:  # engine >= 3.2
-            idxs = zip(*idxs)
-        data = [dset[start:stop] for start, stop in idxs]
-        if len(data) == 0:  # site ID with no data
+        indices = self.dstore['gmf_data/indices']
+        smin, smax = min(sids), max(sids)
+        ok = set(sids)
+        sid_list, starts, stops = [], [], []
+        for sid, idxs in zip(range(smin, smax + 1), indices[smin:smax + 1]):
+            if sid not in ok:
+                continue
+            if idxs.dtype.name == 'uint32':  # scenario
+                idxs = [idxs]
+            elif not idxs.dtype.names:  # engine >= 3.2
+                idxs = zip(*idxs)
+            for start, stop in idxs:
+                if stop > start:
+                    sid_list.append(sid)
+                    starts.append(start)
+                    stops.append(stop)
+        if not sid_list:  # no data for the given sites
             return {}
-        return group_by_rlz(numpy.concatenate(data), self.rlzs)
+        sid_arr = numpy.array(sid_list)
+        starts = numpy.array(starts, I64)
+        stops = numpy.array(stops, I64)
+        order = numpy.argsort(starts, kind='stable')
+        starts, stops, sid_arr = starts[order], stops[order], sid_arr[order]
+        # a new run starts where a slice does not follow the previous one
+        brk = numpy.concatenate([[0], numpy.where(
+            starts[1:] != stops[:-1])[0] + 1, [len(starts)]])
+        slabs = [dset[starts[b0]:stops[b1 - 1]]
+                 for b0, b1 in zip(brk[:-1], brk[1:])]
+        buf = numpy.concatenate(slabs)
+        # offsets of the slices inside the concatenated buffer
+        lens = stops - starts
+        offsets = numpy.cumsum(numpy.concatenate([[0], lens[:-1]]))
+        dic = {}
+        order = numpy.argsort(sid_arr, kind='stable')
+        uniq, idxs = numpy.unique(sid_arr[order], return_index=True)
+        for sid, idx in zip(uniq, numpy.split(order, idxs[1:])):
+            data = numpy.concatenate(
+                [buf[offsets[i]:offsets[i] + lens[i]] for i in idx])
+            dic[sid] = group_by_rlz(data, self.rlzs)
+        return dic
+
+    def __getitem__(self, sid):
+        return self.read([sid]).get(sid, {})
 
     def __iter__(self):
         return iter(self.sids)
@@ -406,6 +455,37 @@ class GmfGetter(object):
             return {}
         return general.group_array(data, 'sid')
 
+    def get_hcurves(self, gmfdata, rlzs):
+        """
+        :param gmfdata: an array of the dtype (sid, eid, gmv)
+        :param rlzs: an array of shape E with the realization of each event
+        :returns: an array of dtype hcurves_dt with the hazard curves for
+                  each pair (sid, rlz) with GMFs
+        """
+        imtls = self.oqparam.imtls
+        hcurves = numpy.zeros(0, hcurves_dt(len(imtls.array)))
+        if len(gmfdata) == 0:
+            return hcurves
+        # group the GMVs by (sid, rlz) and count the exceedances of each
+        # level for all groups at once; the poes are computed as in
+        # commonlib.calc._gmvs_to_haz_curve
+        rlz = rlzs[gmfdata['eid']]
+        keys = gmfdata['sid'].astype(numpy.int64) * TWO16 + rlz
+        order = numpy.argsort(keys, kind='stable')
+        ukeys, start = numpy.unique(keys[order], return_index=True)
+        hcurves = numpy.zeros(len(ukeys), hcurves.dtype)
+        hcurves['sid'] = ukeys // TWO16
+        hcurves['rlz'] = ukeys % TWO16
+        gmvs = gmfdata['gmv'][order]
+        counts = numpy.zeros((len(ukeys), len(imtls.array)))
+        for m, imt in enumerate(imtls):
+            exceed = gmvs[:, m, None] >= imtls[imt]  # shape (D, L1)
+            counts[:, imtls(imt)] = numpy.add.reduceat(
+                exceed, start, axis=0, dtype=U32)
+        hcurves['poes'] = 1. - numpy.exp(
+            -counts / self.oqparam.ses_per_logic_tree_path)
+        return hcurves
+
     def compute_gmfs_curves(self, rlzs, monitor):
         """
         :param rlzs: an array of shapeE
@@ -413,53 +493,50 @@ class GmfGetter(object):
         """
         oq = self.oqparam
         mon = monitor('getting ruptures', measuremem=True)
-        hcurves = {}  # key -> poes
+        gmfdata = self.get_gmfdata(mon)  # computed only once
         if oq.hazard_curves_from_gmfs:
-            hc_mon = monitor('building hazard curves', measuremem=False)
-            gmfdata = self.get_gmfdata(mon)  # returned later
-            hazard = self.get_hazard_by_sid(data=gmfdata)
-            for sid, hazardr in hazard.items():
-                dic = group_by_rlz(hazardr, rlzs)
-                for rlzi, array in dic.items():
-                    with hc_mon:
-                        gmvs = array['gmv']
-                        for imti, imt in enumerate(oq.imtls):
-                            poes = _gmvs_to_haz_curve(
-                                gmvs[:, imti], oq.imtls[imt],
-                                oq.ses_per_logic_tree_path)
-                            hcurves[rsi2str(rlzi, sid, imt)] = poes
+            with monitor('building hazard curves', measuremem=False):
+                hcurves = self.get_hcurves(gmfdata, rlzs)
+        else:
+            hcurves = numpy.zeros(0, hcurves_dt(len(oq.imtls.array)))
         if not oq.ground_motion_fields:
             return dict(gmfdata=(), hcurves=hcurves)
-        gmfdata = self.get_gmfdata(mon)
         if len(gmfdata) == 0:
             return dict(gmfdata=[])
-        indices = []
         gmfdata.sort(order=('sid', 'eid'))
-        start = stop = 0
-        for sid, rows in itertools.groupby(gmfdata['sid']):
-            for row in rows:
-                stop += 1
-            indices.append((sid, start, stop))
-            start = stop
+        sids, start, counts = numpy.unique(
+            gmfdata['sid'], return_index=True, return_counts=True)
+        indices = numpy.zeros((len(sids), 3), U32)
+        indices[:, 0] = sids
+        indices[:, 1] = start
+        indices[:, 2] = start + counts
         times = numpy.array([tup + (monitor.task_no,) for tup in self.times],
                             time_dt)
         times.sort(order='rup_id')
         res = dict(gmfdata=gmfdata, hcurves=hcurves, times=times,
                    sig_eps=numpy.array(self.sig_eps, self.sig_eps_dt),
-                   indices=numpy.array(indices, (U32, 3)))
+                   indices=indices)
         return res
 
 
+def hcurves_dt(L):
+    """
+    :param L: the total number of levels
+    :returns: the dtype of the hazard curves returned by the GmfGetter
+    """
+    return numpy.dtype([('sid', U32), ('rlz', U16), ('poes', (F64, (L,)))])
+
+
 def group_by_rlz(data, rlzs):
     """
     :param data: a composite array of D elements with a field `eid`
     :param rlzs: an array of E >= D elements
     :returns: a dictionary rlzi -> data for each realization
     """
-    acc = general.AccumDict(accum=[])
-    for rec in data:
-        acc[rlzs[rec['eid']]].append(rec)
-    return {rlzi: numpy.array(recs) for rlzi, recs in acc.items()}
+    rlzis = rlzs[data['eid']]
+    order = numpy.argsort(rlzis, kind='stable')
+    uniq, idxs = numpy.unique(rlzis[order], return_index=True)
+    return dict(zip(uniq, numpy.split(data[order], idxs[1:])))
 
 
 def gen_rgetters(dstore, slc=slice(None)):
@@ -581,19 +658,6 @@ class RuptureGetter(object):
     def num_ruptures(self):
         return len(self.proxies)
 
-    def get_eid_rlz(self):
-        """
-        :returns: a composite array with the associations eid->rlz
-        """
-        eid_rlz = []
-        for rup in self.proxies:
-            ebr = EBRupture(mock.Mock(rup_id=rup['serial']), rup['source_id'],
-                            self.grp_id, rup['n_occ'], self.samples)
-            for rlz_id, eids in ebr.get_eids_by_rlz(self.rlzs_by_gsim).items():
-                for eid in eids:
-                    eid_rlz.append((eid + rup['e0'], rup['id'], rlz_id))
-        return numpy.array(eid_rlz, events_dt)
-
     def get_rupdict(self):
         """
         :returns: a dictionary with the parameters of the rupture
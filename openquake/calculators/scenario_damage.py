@@ -19,7 +19,7 @@
 import logging
 import numpy
 from openquake.baselib import hdf5
-from openquake.baselib.general import AccumDict, get_indices
+from openquake.baselib.general import get_indices
 from openquake.hazardlib.stats import set_rlzs_stats
 from openquake.calculators import base
 
@@ -37,29 +37,47 @@ def floats_in(numbers):
     return (U32(numbers) != numbers).sum()
 
 
-def bin_ddd(fractions, n, seed):
+def bin_ddd(fractions, numbers, seeds):
     """
-    Converting fractions into discrete damage distributions using bincount
-    and numpy.random.choice
+    Converting fractions into discrete damage distributions by sampling
+    a damage state for each building, with a random generator per asset.
+    The draws are the same as numpy.random.choice(D, n, p) event by event,
+    i.e. a uniform number per building mapped to the cumulative fractions.
+
+    :param fractions: an array of shape (A, E, D)
+    :param numbers: an array of A asset numbers
+    :param seeds: an array of A seeds
+    :returns: an array of shape (A, E, D)
     """
-    n = int(n)
-    D = fractions.shape[1]  # shape (E, D)
-    ddd = numpy.zeros(fractions.shape, U32)
-    numpy.random.seed(seed)
-    for e, frac in enumerate(fractions):
-        ddd[e] = numpy.bincount(
-            numpy.random.choice(D, n, p=frac/frac.sum()), minlength=D)
+    A, E, D = fractions.shape
+    probs = F64(fractions / fractions.sum(axis=2)[:, :, None])
+    cdf = probs.cumsum(axis=2)
+    cdf /= cdf[:, :, -1:]
+    ddd = numpy.zeros((A, E, D), U32)
+    for a, (n, seed) in enumerate(zip(numbers, seeds)):
+        n = int(n)
+        # shape (E, n), the same numbers drawn by the E calls to choice
+        rnd = numpy.random.RandomState(seed).random_sample((E, n))
+        # number of buildings in a damage state >= d, as in searchsorted
+        above = [n] + [(rnd >= cdf[a, :, d, None]).sum(axis=1)
+                       for d in range(D - 1)] + [0]
+        for d in range(D):
+            ddd[a, :, d] = above[d] - above[d + 1]
     return ddd
 
 
-def approx_ddd(fractions, n, seed=None):
+def approx_ddd(fractions, numbers, seeds=None):
     """
-    Converting fractions into uint16 discrete damage distributions using round
+    Converting fractions into uint32 discrete damage distributions using round
+
+    :param fractions: an array of shape (A, E, D)
+    :param numbers: an array of A asset numbers
+    :returns: an array of shape (A, E, D)
     """
-    ddd = U32(numpy.round(fractions * n))  # shape (E, D)
+    ddd = U32(numpy.round(fractions * numbers[:, None, None]))
     # fix the no-damage discrete damage distributions by making sure
     # that the total sum is n: nodamage = n - sum(others)
-    ddd[:, 0] = n - ddd[:, 1:].sum(axis=1)
+    ddd[:, :, 0] = numbers[:, None] - ddd[:, :, 1:].sum(axis=2)
     return ddd
 
 
@@ -77,23 +95,27 @@ def scenario_damage(riskinputs, crmodel, param, monitor):
         dictionary of extra parameters
     :returns:
         a dictionary {'d_asset': [(l, r, a, mean-stddev), ...],
-                      'd_event': dict eid -> array of shape (L, D)
+                      'd_event': array of shape (E, L, D - 1),
+                      'affected': boolean array of shape E
                       + optional consequences}
 
     `d_asset` and `d_tag` are related to the damage distributions.
     """
     L = len(crmodel.loss_types)
     D = len(crmodel.damage_states)
+    E = param['E']
     consequences = crmodel.get_consequences()
     haz_mon = monitor('getting hazard', measuremem=False)
     rsk_mon = monitor('aggregating risk', measuremem=False)
-    d_event = AccumDict(accum=numpy.zeros((L, D - 1), U32))
-    res = {'d_event': d_event}
+    d_event = numpy.zeros((E, L, D - 1), U32)
+    affected = numpy.zeros(E, bool)  # events affecting at least an asset
+    res = {'d_event': d_event, 'affected': affected}
     for name in consequences:
-        res[name + '_by_event'] = AccumDict(accum=numpy.zeros(L, F64))
+        res[name + '_by_event'] = numpy.zeros((E, L), F64)
         # using F64 here is necessary: with F32 the non-commutativity
         # of addition would hurt too much with multiple tasks
     seed = param['master_seed']
+    aed_dt = param['aed_dt']
     # algorithm used to compute the discrete damage distributions
     make_ddd = approx_ddd if param['approx_ddd'] else bin_ddd
     for ri in riskinputs:
@@ -102,37 +124,44 @@ def scenario_damage(riskinputs, crmodel, param, monitor):
         result = dict(d_asset=[])
         for name in consequences:
             result['avg_' + name] = []
-        ddic = AccumDict(accum=numpy.zeros((L, D - 1), F32))  # aid,eid->dd
+        aeds = []
         with haz_mon:
             ri.hazard_getter.init()
         for out in ri.gen_outputs(crmodel, monitor):
             with rsk_mon:
                 r = out.rlzi
+                eids = out.eids
+                aids = out.assets['ordinal']
+                numbers = out.assets['number']
+                dd = numpy.zeros((len(aids), len(eids), L, D - 1), U32)
                 for l, loss_type in enumerate(crmodel.loss_types):
-                    for asset, fractions in zip(ri.assets, out[loss_type]):
-                        aid = asset['ordinal']
-                        ddds = make_ddd(fractions, asset['number'], seed + aid)
-                        for e, ddd in enumerate(ddds):
-                            eid = out.eids[e]
-                            ddic[aid, eid][l] = ddd[1:]
-                            d_event[eid][l] += ddd[1:]
-                        if make_ddd is approx_ddd:
-                            tot = (fractions * asset['number']).sum(axis=0)
-                        else:
-                            tot = ddds.sum(axis=0)
-                        result['d_asset'].append((l, r, asset['ordinal'], tot))
-                        # TODO: use the ddd, not the fractions in compute_csq
-                        csq = crmodel.compute_csq(asset, fractions, loss_type)
-                        for name, values in csq.items():
-                            result['avg_%s' % name].append(
-                                (l, r, asset['ordinal'], values.sum(axis=0)))
-                            by_event = res[name + '_by_event']
-                            for eid, value in zip(out.eids, values):
-                                by_event[eid][l] += value
+                    fractions = out[loss_type]  # shape (A, E, D)
+                    ddds = make_ddd(fractions, numbers, seed + aids)
+                    dd[:, :, l] = ddds[:, :, 1:]
+                    if make_ddd is approx_ddd:
+                        tot = (fractions * numbers[:, None, None]).sum(axis=1)
+                    else:
+                        tot = ddds.sum(axis=1)  # shape (A, D)
+                    result['d_asset'].extend(
+                        (l, r, aid, t) for aid, t in zip(aids, tot))
+                    # TODO: use the ddd, not the fractions in compute_csq
+                    csq = crmodel.compute_csq(out.assets, fractions, loss_type)
+                    for name, values in csq.items():  # shape (A, E)
+                        result['avg_%s' % name].extend(
+                            (l, r, aid, v)
+                            for aid, v in zip(aids, values.sum(axis=1)))
+                        numpy.add.at(res[name + '_by_event'][:, l], eids,
+                                     values.sum(axis=0))
+                numpy.add.at(d_event, eids, dd.sum(axis=0, dtype=U32))
+                affected[eids] = True
+                aed = numpy.zeros(len(aids) * len(eids), aed_dt)
+                aed['aid'] = numpy.repeat(aids, len(eids))
+                aed['eid'] = numpy.tile(eids, len(aids))
+                aed['dd'] = dd.reshape(len(aed), L, D - 1)
+                aeds.append(aed)
         with rsk_mon:
-            result['aed'] = aed = numpy.zeros(len(ddic), param['aed_dt'])
-            for i, ((aid, eid), dd) in enumerate(sorted(ddic.items())):
-                aed[i] = (aid, eid, dd)
+            aed = numpy.concatenate(aeds) if aeds else numpy.zeros(0, aed_dt)
+            result['aed'] = aed[numpy.lexsort((aed['eid'], aed['aid']))]
         yield result
     yield res
 
@@ -162,6 +191,7 @@ class ScenarioDamageCalculator(base.RiskCalculator):
         self.param['approx_ddd'] = self.oqparam.approx_ddd or num_floats
         self.param['aed_dt'] = aed_dt = self.crmodel.aid_eid_dd_dt()
         self.param['master_seed'] = self.oqparam.master_seed
+        self.param['E'] = self.E
         A = len(self.assetcol)
         self.datastore.create_dset('dd_data/data', aed_dt, compression='gzip')
         self.datastore.create_dset('dd_data/indices', U32, (A, 2))
@@ -220,17 +250,17 @@ class ScenarioDamageCalculator(base.RiskCalculator):
 
         # damage by event: make sure the sum of the buildings is consistent
         tot = self.assetcol['number'].sum()
+        d_event = result['d_event']  # shape E, L, D - 1
         dbe = numpy.zeros((self.E, L, D), U32)  # shape E, L, D
-        dbe[:, :, 0] = tot
-        for e, dmg_by_lt in result['d_event'].items():
-            for l, dmg in enumerate(dmg_by_lt):
-                dbe[e, l,  0] = tot - dmg.sum()
-                dbe[e, l,  1:] = dmg
+        dbe[:, :, 0] = tot - d_event.sum(axis=2)
+        dbe[:, :, 1:] = d_event
         self.datastore['dmg_by_event'] = dbe
 
         # consequence distributions
         del result['d_asset']
         del result['d_event']
+        # the events affecting at least an asset
+        eids, = result.pop('affected').nonzero()
         dtlist = [('event_id', U32), ('rlz_id', U16), ('loss', (F32, (L,)))]
         rlz = self.datastore['events']['rlz_id']
         for name, csq in result.items():
@@ -243,9 +273,10 @@ class ScenarioDamageCalculator(base.RiskCalculator):
                                asset_id=self.assetcol['id'],
                                loss_type=oq.loss_names)
             elif name.endswith('_by_event'):
-                arr = numpy.zeros(len(csq), dtlist)
-                for i, (eid, loss) in enumerate(csq.items()):
-                    arr[i] = (eid, rlz[eid], loss)
+                arr = numpy.zeros(len(eids), dtlist)
+                arr['event_id'] = eids
+                arr['rlz_id'] = rlz[eids]
+                arr['loss'] = csq[eids]
                 self.datastore[name] = arr
 
 
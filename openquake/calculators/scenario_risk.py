@@ -91,8 +91,8 @@ def scenario_risk(riskinputs, crmodel, param, monitor):
                 losses = out[loss_type]
                 if numpy.product(losses.shape) == 0:  # happens for all NaNs
                     continue
-                avg = numpy.zeros(len(ri.assets), F32)
-                for a, asset in enumerate(ri.assets):
+                avg = numpy.zeros(len(out.assets), F32)
+                for a, asset in enumerate(out.assets):
                     aid = asset['ordinal']
                     avg[a] = losses[a].mean()
                     result['avg'].append((l, r, asset['ordinal'], avg[a]))
@@ -271,6 +271,14 @@ hazard_uhs-std.csv
         self.assertEqualFiles('expected/hazard_uhs-mean-0.1.xml', fnames[1])
         self.assertEqualFiles('expected/hazard_uhs-mean-0.2.xml', fnames[2])
 
+        # reading a non-contiguous subset of sites with PmapGetter
+        full = PmapGetter(self.calc.datastore, self.calc.weights).init()
+        pgetter = PmapGetter(self.calc.datastore, self.calc.weights, [0, 2])
+        for grp, pmap in pgetter.init().items():
+            self.assertEqual(sorted(pmap), [0, 2])
+            for sid in pmap:
+                aac(pmap[sid].array, full[grp][sid].array)
+
         # npz exports
         [fname] = export(('hmaps', 'npz'), self.calc.datastore)
         arr = numpy.load(fname)['all']
@@ -25,14 +25,18 @@ import numpy.testing
 
 from openquake.baselib.general import group_array, countby, gettemp
 from openquake.baselib.datastore import read
+from openquake.baselib.performance import Monitor
 from openquake.hazardlib import nrml, InvalidFile
 from openquake.hazardlib.sourceconverter import RuptureConverter
+from openquake.commonlib.calc import _gmvs_to_haz_curve
 from openquake.commonlib.writers import write_csv
 from openquake.commonlib.util import max_rel_diff_index
 from openquake.calculators.views import view
 from openquake.calculators.export import export
 from openquake.calculators.extract import extract
 from openquake.calculators.event_based import get_mean_curves
+from openquake.calculators.getters import (
+    GmfGetter, gen_rupture_getters, group_by_rlz, hcurves_dt)
 from openquake.calculators.tests import CalculatorTestCase
 from openquake.qa_tests_data.classical import case_18 as gmpe_tables
 from openquake.qa_tests_data.event_based import (
@@ -195,6 +199,28 @@ class EventBasedTestCase(CalculatorTestCase):
         self.assertEqualFiles(
             'expected/hazard_curve-smltp_b1-gsimltp_b1.csv', fname)
 
+    def test_agg_dicts(self):
+        # the hazard curves coming from several tasks are composed in
+        # the (N, R, L) accumulator; the same (sid, rlz) pair can appear
+        # in more than one task
+        self.run_calc(case_2.__file__, 'job.ini')
+        self.calc.datastore.close()  # reopen in write mode
+        self.calc.datastore.open('r+')
+        N, R, L = 3, 2, 4
+        numpy.random.seed(42)
+        acc = numpy.zeros((N, R, L))
+        expected = numpy.ones((N, R, L))
+        for pairs in [[(0, 0), (2, 1)], [(0, 0), (1, 1), (2, 0)],
+                      [(2, 1), (0, 0)]]:
+            hcurves = numpy.zeros(len(pairs), hcurves_dt(L))
+            hcurves['sid'], hcurves['rlz'] = zip(*pairs)
+            hcurves['poes'] = numpy.random.random((len(pairs), L))
+            for (sid, rlz), poes in zip(pairs, hcurves['poes']):
+                expected[sid, rlz] *= 1. - poes
+            acc = self.calc.agg_dicts(acc, dict(gmfdata=(), hcurves=hcurves))
+        self.calc.datastore.close()
+        numpy.testing.assert_allclose(acc, 1. - expected)
+
     def test_case_2bis(self):  # oversampling
         out = self.run_calc(case_2.__file__, 'job_2.ini', exports='csv,xml')
         [fname, _, _] = out['gmf_data', 'csv']  # 2 realizations, 1 TRT
@@ -375,6 +401,36 @@ class EventBasedTestCase(CalculatorTestCase):
         with self.assertRaises(KeyError):
             self.calc.datastore['gmf_data']
 
+    def test_gmfs_curves(self):
+        # the single-pass compute_gmfs_curves must give the same GMFs and
+        # curves as computing the GMFs twice and the curves site by site
+        imtls = '{"PGA": [.1, .4, .6], "SA(0.1)": [.1, .2, .4]}'
+        self.run_calc(case_17.__file__, 'job.ini', ground_motion_fields='true',
+                      ses_per_logic_tree_path='20',
+                      intensity_measure_types_and_levels=imtls)
+        oq = self.calc.oqparam
+        rlzs = self.calc.datastore['events']['rlz_id']
+        srcfilter = self.calc.srcfilter
+        for rgetter in gen_rupture_getters(self.calc.datastore, srcfilter, 1):
+            getter = GmfGetter(rgetter, srcfilter, oq)
+            res = getter.compute_gmfs_curves(rlzs, Monitor())
+            gmfdata = getter.get_gmfdata(Monitor())
+            gmfdata.sort(order=('sid', 'eid'))
+            numpy.testing.assert_equal(res['gmfdata'], gmfdata)
+            hcurves = []
+            for sid, data in group_array(gmfdata, 'sid').items():
+                for rlz, array in group_by_rlz(data, rlzs).items():
+                    poes = numpy.zeros(len(oq.imtls.array))
+                    for m, imt in enumerate(oq.imtls):
+                        poes[oq.imtls(imt)] = _gmvs_to_haz_curve(
+                            array['gmv'][:, m], oq.imtls[imt],
+                            oq.ses_per_logic_tree_path)
+                    hcurves.append((sid, rlz, poes))
+            self.assertGreater(len(numpy.unique(res['hcurves']['rlz'])), 1)
+            self.assertGreater(res['hcurves']['poes'].max(), 0)
+            numpy.testing.assert_equal(res['hcurves'], numpy.array(
+                hcurves, hcurves_dt(len(oq.imtls.array))))
+
     def test_case_18(self):  # oversampling, 3 realizations
         out = self.run_calc(case_18.__file__, 'job.ini', exports='csv')
         [fname, _, _] = out['gmf_data', 'csv']
@@ -16,6 +16,8 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with OpenQuake. If not, see <http://www.gnu.org/licenses/>.
 
+import functools
+from unittest import mock
 import numpy
 from openquake.qa_tests_data.scenario_risk import (
     case_1, case_2, case_2d, case_1g, case_1h, case_3, case_4, case_5,
@@ -25,6 +27,7 @@ from openquake.qa_tests_data.scenario_risk import (
 from openquake.baselib.general import gettemp
 from openquake.hazardlib import InvalidFile
 from openquake.commonlib.logictree import InvalidLogicTree
+from openquake.calculators import base
 from openquake.calculators.tests import CalculatorTestCase
 from openquake.calculators.views import view
 from openquake.calculators.export import export
@@ -192,6 +195,17 @@ class ScenarioRiskTestCase(CalculatorTestCase):
         # make sure the fullreport can be extracted
         view('fullreport', self.calc.datastore)
 
+        # importing the GMFs in small chunks gives the same losses
+        # even if the file is ordered by event and not by site
+        import_gmfs = functools.partial(base.import_gmfs, chunksize=100)
+        with mock.patch.object(base, 'import_gmfs', import_gmfs):
+            self.run_calc(case_8.__file__, 'job.ini')
+        indices = self.calc.datastore['gmf_data/indices']
+        # the GMFs of a site are in two slices, one per event
+        self.assertEqual(len(indices[0, 0]), 2)
+        agglosses = extract(self.calc.datastore, 'agg_losses/structural')
+        aac(agglosses.array, [1159325.6])
+
     def test_case_10(self):
         # missing occupants in the exposure
         with self.assertRaises(InvalidFile):
@@ -213,3 +227,23 @@ class ScenarioRiskTestCase(CalculatorTestCase):
 
         [fname] = export(('realizations', 'csv'), self.calc.datastore)
         self.assertEqualFiles('expected/realizations.csv', fname)
+
+    def test_case_shakemap_max_distance(self):
+        # truncating the spatial correlation at a distance larger than the
+        # region gives a single tile, i.e. the same GMFs as the full sampler
+        self.run_calc(case_shakemap.__file__, 'pre-job.ini')
+        hc_id = str(self.calc.datastore.calc_id)
+        self.run_calc(case_shakemap.__file__, 'job.ini',
+                      hazard_calculation_id=hc_id,
+                      shakemap_max_distance='1000')
+        [fname] = export(('agglosses', 'csv'), self.calc.datastore)
+        self.assertEqualFiles('expected/agglosses.csv', fname)
+
+        # a short distance gives several tiles
+        self.run_calc(case_shakemap.__file__, 'job.ini',
+                      hazard_calculation_id=hc_id,
+                      shakemap_max_distance='5')
+        gmfa = dict(extract(self.calc.datastore, 'gmf_data'))['rlz-000']
+        self.assertEqual(gmfa.shape, (9,))
+        for imt in ('PGA', 'SA(0.3)', 'SA(1.0)'):
+            self.assertGreater(gmfa[imt].min(), 0)
@@ -16,6 +16,16 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with OpenQuake.  If not, see <http://www.gnu.org/licenses/>.
 
+import os
+import tempfile
+import unittest
+import h5py
+import numpy
+from openquake.hazardlib.geo.nodalplane import NodalPlane
+from openquake.hazardlib.geo.point import Point
+from openquake.hazardlib.mfd import EvenlyDiscretizedMFD
+from openquake.hazardlib.pmf import PMF
+from openquake.hazardlib.source.point import PointSource
 from openquake.calculators.export import export
 from openquake.calculators.views import view
 from openquake.calculators import ucerf_base
@@ -69,6 +79,10 @@ class UcerfTestCase(CalculatorTestCase):
         for fname, exp in zip(fnames, expected):
             self.assertEqualFiles('expected/' + exp, fname)
 
+        # the 20 background cells are stored in a single gridded source
+        codes = list(self.calc.datastore['source_info']['code'])
+        self.assertEqual(codes.count(b'M'), 1)
+
         # make sure this runs
         view('fullreport', self.calc.datastore)
 
@@ -93,3 +107,132 @@ class UcerfTestCase(CalculatorTestCase):
         fname = out['hcurves', 'csv'][0]
         self.assertEqualFiles('expected/hazard_curve-sampling.csv', fname,
                               delta=1E-6)
+
+
+BRANCH_ID = 'FM0_0/MEANFS/MEANMSR/MeanRates'
+
+
+def _fake_ucerf_file(num_sections, num_ruptures):
+    # build a small UCERF-like file with vertical planar sections
+    fname = os.path.join(tempfile.mkdtemp(), 'ucerf.hdf5')
+    idx_set = ucerf_base.build_idx_set(BRANCH_ID, None)
+    rng = numpy.random.RandomState(42)
+    with h5py.File(fname, 'w') as h5:
+        h5[idx_set['mag']] = rng.uniform(6, 8, num_ruptures)
+        h5[idx_set['rate']] = rng.uniform(0, 1E-3, num_ruptures)
+        h5[idx_set['rake']] = rng.uniform(-90, 90, num_ruptures)
+        ridx = h5.create_dataset(
+            idx_set['geol'] + '/RuptureIndex', (num_ruptures,),
+            h5py.special_dtype(vlen=numpy.int64))
+        for i in range(num_ruptures):  # two contiguous sections each
+            ridx[i] = [i % num_sections, (i + 1) % num_sections]
+        for idx in range(num_sections):
+            trace = '%s/%d' % (idx_set['sec'], idx)
+            lon = idx * .1
+            # corners (tl, tr, br, bl) x (lon, lat, depth) x 1 plane
+            plane = numpy.array([[lon, 0., 0.], [lon + .1, 0., 0.],
+                                 [lon + .1, 0., 10.], [lon, 0., 10.]])
+            h5[trace + '/RupturePlanes'] = plane[:, :, None]
+            h5[trace + '/Centroids'] = [[lon + .05, 0., 5.]]
+    return fname
+
+
+class SectionStoreTestCase(unittest.TestCase):
+    def test_store(self):
+        fname = _fake_ucerf_file(num_sections=4, num_ruptures=6)
+        store = ucerf_base.get_section_store(fname, BRANCH_ID)
+        # the store is read once per process
+        self.assertIs(ucerf_base.get_section_store(fname, BRANCH_ID), store)
+
+        # the surfaces of a section are shared between the ruptures
+        surf01 = store.get_surfaces([0, 1])
+        surf12 = store.get_surfaces([1, 2])
+        self.assertEqual(len(surf01), 2)
+        self.assertIs(surf01[1], surf12[0])
+        numpy.testing.assert_allclose(
+            store.get_centroids([1, 2]), [[.15, 0., 5.], [.25, 0., 5.]])
+
+        # the slices of the store are the same as reading the file
+        src = ucerf_base.UCERFSource.__new__(ucerf_base.UCERFSource)
+        src.source_file, src.branch_id = fname, BRANCH_ID
+        src.start, src.stop = 2, 5
+        idx_set = ucerf_base.build_idx_set(BRANCH_ID, None)
+        with h5py.File(fname, 'r') as h5:
+            for attr in ('mag', 'rate', 'rake'):
+                expected = h5[idx_set[attr]][src.start:src.stop]
+                got = getattr(src, 'mags' if attr == 'mag' else attr)
+                numpy.testing.assert_equal(got, expected)
+            ridx = h5[idx_set['geol'] + '/RuptureIndex'][3]
+        numpy.testing.assert_equal(src.get_ridx(3), ridx)
+
+
+def _add_grid(fname, mags, mmax):
+    # add a background grid to a fake UCERF file, with a cell per mmax
+    num_cells = len(mmax)
+    idx_set = ucerf_base.build_idx_set(BRANCH_ID, None)
+    grid = 'Grid/' + idx_set['grid_key']
+    rng = numpy.random.RandomState(42)
+    with h5py.File(fname, 'a') as h5:
+        h5['Grid/Locations'] = numpy.array(
+            [[-120. + .1 * i, 35. + .05 * i] for i in range(num_cells)])
+        h5[grid + '/Magnitude'] = mags
+        h5[grid + '/MMax'] = mmax
+        h5[grid + '/RateArray'] = rng.uniform(0, 1E-3, (num_cells, len(mags)))
+
+
+def _point_sources(ucerf):
+    # one PointSource per background cell, as in the original code
+    idx_set = ucerf.idx_set
+    grid = 'Grid/' + idx_set['grid_key']
+    with h5py.File(ucerf.source_file, 'r') as h5:
+        mags = h5[grid + '/Magnitude'][()]
+        mmax = h5[grid + '/MMax'][()]
+        rates = h5[grid + '/RateArray'][()]
+        locations = h5['Grid/Locations'][()]
+    for i, (lon, lat) in enumerate(locations):
+        ok = (ucerf.min_mag <= mags) & (mags < mmax[i])
+        src_mags = mags[ok]
+        bin_width = src_mags[1] - src_mags[0] if len(src_mags) > 1 else .1
+        mfd = EvenlyDiscretizedMFD(src_mags[0], bin_width, list(rates[i, ok]))
+        yield PointSource(
+            str(i), str(i), ucerf.tectonic_region_type, mfd,
+            ucerf.mesh_spacing, ucerf.msr, ucerf.aspect, ucerf.tom,
+            ucerf.usd, ucerf.lsd, Point(lon, lat), ucerf.npd, ucerf.hdd)
+
+
+def _rupture_data(src):
+    # magnitudes, rates, hypocenters and corners of the ruptures
+    return [(rup.mag, rup.occurrence_rate, rup.rake,
+             rup.hypocenter.longitude, rup.hypocenter.latitude,
+             rup.hypocenter.depth) + tuple(rup.surface.corner_lons) +
+            tuple(rup.surface.corner_lats) + tuple(rup.surface.corner_depths)
+            for rup in src.iter_ruptures()]
+
+
+class BackgroundSourcesTestCase(unittest.TestCase):
+    def check(self, mags, min_mag):
+        fname = _fake_ucerf_file(num_sections=2, num_ruptures=2)
+        # cells with a different number of magnitude bins
+        mmax = numpy.linspace(min_mag + .1, mags[-1] + .1, 7)
+        _add_grid(fname, mags, mmax)
+        npd = PMF([(.5, NodalPlane(0., 90., 0.)),
+                   (.5, NodalPlane(45., 60., 90.))])
+        hdd = PMF([(.7, 5.), (.3, 10.)])
+        ucerf = ucerf_base.UCERFSource(fname, 50., None, min_mag, npd, hdd)
+        ucerf = ucerf.new(0, BRANCH_ID)
+        ucerf.id = 0
+        ucerf.cells_per_block = 3
+        srcs = ucerf.get_background_sources()
+        self.assertEqual([len(src.mesh) for src in srcs], [3, 3, 1])
+        got = [data for src in srcs for data in _rupture_data(src)]
+        expected = [data for src in _point_sources(ucerf)
+                    for data in _rupture_data(src)]
+        numpy.testing.assert_allclose(got, expected)
+        self.assertEqual(sum(src.num_ruptures for src in srcs), len(got))
+
+    def test_many_bins(self):
+        self.check(numpy.arange(5.05, 8., .1), 6.5)
+
+    def test_one_bin(self):
+        # only the last magnitude bin is above min_mag
+        self.check(numpy.array([5.05, 5.15, 5.25]), 5.2)
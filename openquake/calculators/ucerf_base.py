@@ -20,20 +20,22 @@ import copy
 import math
 import logging
 import pickle
+import functools
 from datetime import datetime
 import numpy
 import h5py
 import zlib
 
-from openquake.baselib.general import random_filter, AccumDict, cached_property
+from openquake.baselib.general import random_filter, AccumDict
 from openquake.hazardlib.calc.filters import SourceFilter, getdefault
 from openquake.hazardlib.source.base import BaseSeismicSource
 from openquake.hazardlib.geo.geodetic import min_geodetic_distance
 from openquake.hazardlib.geo.surface.planar import PlanarSurface
 from openquake.hazardlib.geo.surface.multi import MultiSurface
 from openquake.hazardlib.geo.utils import KM_TO_DEGREES, angular_distance
-from openquake.hazardlib.source.point import PointSource
-from openquake.hazardlib.mfd import EvenlyDiscretizedMFD
+from openquake.hazardlib.source.multi import MultiPointSource
+from openquake.hazardlib.mfd.multi_mfd import MultiMFD
+from openquake.hazardlib.geo.mesh import Mesh
 from openquake.hazardlib.tom import PoissonTOM
 from openquake.hazardlib.scalerel.wc1994 import WC1994
 from openquake.hazardlib.source.rupture import ParametricProbabilisticRupture
@@ -127,6 +129,92 @@ class UcerfFilter(SourceFilter):
         return indices
 
 
+class SectionStore(object):
+    """
+    In-memory store for the fault sections of an UCERF branch. The
+    magnitudes, rates, rakes and rupture indices of the whole branch are
+    read once; the centroids and the planar surfaces of the sections are
+    read lazily and shared by all the ruptures referencing them.
+
+    :param source_file: path to the HDF5 file containing the UCERF model
+    :param idx_set: dictionary of keys returned by :func:`build_idx_set`
+    """
+    def __init__(self, source_file, idx_set):
+        self.source_file = source_file
+        self.sec = idx_set["sec"]
+        with h5py.File(source_file, "r") as hdf5:
+            self.mags = hdf5[idx_set["mag"]][()]
+            self.rate = hdf5[idx_set["rate"]][()]
+            self.rake = hdf5[idx_set["rake"]][()]
+            self.ridx = hdf5[idx_set["geol"] + "/RuptureIndex"][()]
+        self.centroids = {}  # section index -> array of centroids
+        self.surfaces = {}  # section index -> list of planar surfaces
+
+    def _load(self, ridx):
+        # read the sections which are not in the store yet
+        missing = [idx for idx in ridx if idx not in self.surfaces]
+        if not missing:
+            return
+        with h5py.File(self.source_file, "r") as hdf5:
+            for idx in missing:
+                trace = "{:s}/{:s}".format(self.sec, str(idx))
+                self.centroids[idx] = hdf5[trace + "/Centroids"][()]
+                plane = hdf5[trace + "/RupturePlanes"][:].astype("float64")
+                self.surfaces[idx] = build_surfaces(trace, plane)
+
+    def get_centroids(self, ridx):
+        """
+        :returns: array of centroids for the given rupture index
+        """
+        self._load(ridx)
+        return numpy.concatenate([self.centroids[idx] for idx in ridx])
+
+    def get_surfaces(self, ridx):
+        """
+        :returns: list of planar surfaces for the given rupture index
+        """
+        self._load(ridx)
+        surfaces = []
+        for idx in ridx:
+            surfaces.extend(self.surfaces[idx])
+        return surfaces
+
+
+@functools.lru_cache(maxsize=4)
+def get_section_store(source_file, branch_id):
+    """
+    :returns: the :class:`SectionStore` of the given branch, read only
+              once per process
+    """
+    return SectionStore(source_file, build_idx_set(branch_id, None))
+
+
+def build_surfaces(trace, plane):
+    """
+    :param trace: path to the section in the HDF5 file
+    :param plane: array of shape (4, 3, P) with the corners of the planes
+    :returns: a list of P ImperfectPlanarSurfaces
+    """
+    surfaces = []
+    for jloc in range(0, plane.shape[2]):
+        top_left = Point(
+            plane[0, 0, jloc], plane[0, 1, jloc], plane[0, 2, jloc])
+        top_right = Point(
+            plane[1, 0, jloc], plane[1, 1, jloc], plane[1, 2, jloc])
+        bottom_right = Point(
+            plane[2, 0, jloc], plane[2, 1, jloc], plane[2, 2, jloc])
+        bottom_left = Point(
+            plane[3, 0, jloc], plane[3, 1, jloc], plane[3, 2, jloc])
+        try:
+            surfaces.append(
+                ImperfectPlanarSurface.from_corner_points(
+                    top_left, top_right, bottom_right, bottom_left))
+        except ValueError as err:
+            raise ValueError(err, trace, top_left, top_right,
+                             bottom_right, bottom_left)
+    return surfaces
+
+
 class UCERFSource(BaseSeismicSource):
     """
     :param source_file:
@@ -162,6 +250,7 @@ class UCERFSource(BaseSeismicSource):
     MODIFICATIONS = set()
     tectonic_region_type = DEFAULT_TRT
     ruptures_per_block = None  # overridden by the source_reader
+    cells_per_block = 1000  # background cells per gridded source
     checksum = 0
     _wkt = ''
 
@@ -196,23 +285,28 @@ class UCERFSource(BaseSeismicSource):
     def num_ruptures(self, value):  # hack to make the sourceconverter happy
         pass
 
-    @cached_property
+    @property
+    def store(self):
+        """
+        The :class:`SectionStore` of the branch, shared by all the
+        sources of the branch living in the same process
+        """
+        return get_section_store(self.source_file, self.branch_id)
+
+    @property
     def mags(self):
         # read from FM0_0/MEANFS/MEANMSR/Magnitude
-        with h5py.File(self.source_file, "r") as hdf5:
-            return hdf5[self.idx_set["mag"]][self.start: self.stop]
+        return self.store.mags[self.start: self.stop]
 
-    @cached_property
+    @property
     def rate(self):
         # read from FM0_0/MEANFS/MEANMSR/Rates/MeanRates
-        with h5py.File(self.source_file, "r") as hdf5:
-            return hdf5[self.idx_set["rate"]][self.start: self.stop]
+        return self.store.rate[self.start: self.stop]
 
-    @cached_property
+    @property
     def rake(self):
         # read from FM0_0/MEANFS/Rake
-        with h5py.File(self.source_file, "r") as hdf5:
-            return hdf5[self.idx_set["rake"]][self.start:self.stop]
+        return self.store.rake[self.start:self.stop]
 
     def wkt(self):
         return ''
@@ -233,6 +327,7 @@ class UCERFSource(BaseSeismicSource):
         new = copy.copy(self)
         new.grp_id = grp_id
         new.source_id = branch_id
+        new.branch_id = branch_id
         new.idx_set = build_idx_set(branch_id, self.start_date)
         with h5py.File(self.source_file, "r") as hdf5:
             new.start = 0
@@ -253,31 +348,15 @@ class UCERFSource(BaseSeismicSource):
 
     def get_ridx(self, iloc=None):
         """List of rupture indices for the given iloc"""
-        with h5py.File(self.source_file, "r") as hdf5:
-            if iloc is None:
-                iloc = slice(self.start, self.stop)
-            return hdf5[self.idx_set["geol"] + "/RuptureIndex"][iloc]
+        if iloc is None:
+            iloc = slice(self.start, self.stop)
+        return self.store.ridx[iloc]
 
     def get_centroids(self, ridx):
         """
         :returns: array of centroids for the given rupture index
         """
-        centroids = []
-        with h5py.File(self.source_file, "r") as hdf5:
-            for idx in ridx:
-                trace = "{:s}/{:s}".format(self.idx_set["sec"], str(idx))
-                centroids.append(hdf5[trace + "/Centroids"][()])
-        return numpy.concatenate(centroids)
-
-    def gen_trace_planes(self, ridx):
-        """
-        :yields: trace and rupture planes for the given rupture index
-        """
-        with h5py.File(self.source_file, "r") as hdf5:
-            for idx in ridx:
-                trace = "{:s}/{:s}".format(self.idx_set["sec"], str(idx))
-                plane = hdf5[trace + "/RupturePlanes"][:].astype("float64")
-                yield trace, plane
+        return self.store.get_centroids(ridx)
 
     def get_bounding_box(self, maxdist):
         """
@@ -331,28 +410,11 @@ class UCERFSource(BaseSeismicSource):
         mag = self.mags[iloc - self.start]
         if mag < self.min_mag:
             return
-        surface_set = []
         indices = self.src_filter.get_indices(self, ridx, mag)
         if len(indices) == 0:
             return
-        for trace, plane in self.gen_trace_planes(ridx):
-            # build simple fault surface
-            for jloc in range(0, plane.shape[2]):
-                top_left = Point(
-                    plane[0, 0, jloc], plane[0, 1, jloc], plane[0, 2, jloc])
-                top_right = Point(
-                    plane[1, 0, jloc], plane[1, 1, jloc], plane[1, 2, jloc])
-                bottom_right = Point(
-                    plane[2, 0, jloc], plane[2, 1, jloc], plane[2, 2, jloc])
-                bottom_left = Point(
-                    plane[3, 0, jloc], plane[3, 1, jloc], plane[3, 2, jloc])
-                try:
-                    surface_set.append(
-                        ImperfectPlanarSurface.from_corner_points(
-                            top_left, top_right, bottom_right, bottom_left))
-                except ValueError as err:
-                    raise ValueError(err, trace, top_left, top_right,
-                                     bottom_right, bottom_left)
+        # the section surfaces are shared between the ruptures
+        surface_set = self.store.get_surfaces(ridx)
 
         rupture = ParametricProbabilisticRupture(
             mag, self.rake[iloc - self.start], trt,
@@ -365,8 +427,9 @@ class UCERFSource(BaseSeismicSource):
         """
         Yield ruptures for the current set of indices
         """
+        rate = self.rate
         for ridx in range(self.start, self.stop):
-            if self.rate[ridx - self.start]:  # may have have zero rate
+            if rate[ridx - self.start]:  # may have have zero rate
                 rup = self.get_ucerf_rupture(ridx)
                 if rup:
                     yield rup
@@ -390,7 +453,8 @@ class UCERFSource(BaseSeismicSource):
 
     def get_background_sources(self, sample_factor=None):
         """
-        Turn the background model of a given branch into a set of point sources
+        Turn the background model of a given branch into a set of gridded
+        sources, i.e. MultiPointSources with `cells_per_block` cells each
 
         :param sample_factor:
             Used to reduce the sources if OQ_SAMPLE_SOURCES is set
@@ -406,28 +470,38 @@ class UCERFSource(BaseSeismicSource):
             mmax = hdf5[grid_loc + "/MMax"][background_sids]
             rates = hdf5[grid_loc + "/RateArray"][background_sids, :]
             locations = hdf5["Grid/Locations"][background_sids, :]
-            sources = []
-            for i, bg_idx in enumerate(background_sids):
-                src_id = "_".join([self.idx_set["grid_key"], str(bg_idx)])
-                src_name = "|".join([self.idx_set["total_key"], str(bg_idx)])
-                mag_idx = (self.min_mag <= mags) & (mags < mmax[i])
-                src_mags = mags[mag_idx]
-                src_mfd = EvenlyDiscretizedMFD(
-                    src_mags[0],
-                    src_mags[1] - src_mags[0],
-                    rates[i, mag_idx].tolist())
-                ps = PointSource(
-                    src_id, src_name, self.tectonic_region_type, src_mfd,
-                    self.mesh_spacing, self.msr, self.aspect, self.tom,
-                    self.usd, self.lsd,
-                    Point(locations[i, 0], locations[i, 1]),
-                    self.npd, self.hdd)
-                ps.checksum = zlib.adler32(pickle.dumps(vars(ps), protocol=4))
-                ps._wkt = ps.wkt()
-                ps.id = self.id
-                ps.grp_id = self.grp_id
-                ps.num_ruptures = ps.count_ruptures()
-                sources.append(ps)
+        # the magnitudes are sorted, so the magnitudes of each cell are
+        # a contiguous slice starting from the first one above min_mag
+        ok = self.min_mag <= mags
+        first = ok.argmax()
+        # the magnitudes are an evenly spaced grid, so the bin width is the
+        # grid spacing, also when a single bin is above min_mag; it does
+        # not matter if the grid contains a single magnitude
+        i = min(first, len(mags) - 2)
+        bin_width = mags[i + 1] - mags[i] if len(mags) > 1 else 0.1
+        lengths = (ok & (mags < mmax[:, None])).sum(axis=1)
+        sources = []
+        for start in range(0, len(background_sids), self.cells_per_block):
+            stop = min(start + self.cells_per_block, len(background_sids))
+            mfd = MultiMFD(
+                'incrementalMFD', stop - start,
+                min_mag=[mags[first]], bin_width=[bin_width],
+                occurRates=[rates[i, first:first + lengths[i]]
+                            for i in range(start, stop)])
+            src_id = "%s:%d-%d" % (self.idx_set["grid_key"], start, stop)
+            src_name = "%s|%d-%d" % (self.idx_set["total_key"], start, stop)
+            src = MultiPointSource(
+                src_id, src_name, self.tectonic_region_type, mfd,
+                self.msr, self.aspect, self.usd, self.lsd, self.npd, self.hdd,
+                Mesh(locations[start:stop, 0], locations[start:stop, 1]),
+                self.tom)
+            src.checksum = zlib.adler32(
+                pickle.dumps(vars(src), protocol=4))
+            src._wkt = src.wkt()
+            src.id = self.id
+            src.grp_id = self.grp_id
+            src.num_ruptures = src.count_ruptures()
+            sources.append(src)
         return sources
 
     def get_one_rupture(self):
@@ -96,8 +96,8 @@ def prepare_site_model(exposure_xml, sites_csv, vs30_csv,
         fields.append('vs30measured')
     with performance.Monitor(measuremem=True) as mon:
         if exposure_xml:
-            mesh, assets_by_site = Exposure.read(
-                exposure_xml, check_dupl=False).get_mesh_assets_by_site()
+            exposure = Exposure.read(exposure_xml, check_dupl=False)
+            mesh, assets_by_site = exposure.get_mesh_assets_by_site()
             hdf5['assetcol'] = assetcol = site.SiteCollection.from_points(
                 mesh.lons, mesh.lats, req_site_params=req_site_params)
             if grid_spacing:
@@ -108,13 +108,13 @@ def prepare_site_model(exposure_xml, sites_csv, vs30_csv,
                 logging.info(
                     'Associating exposure grid with %d locations to %d '
                     'exposure sites', len(haz_sitecol), len(assets_by_site))
-                haz_sitecol, assets_by, discarded = assoc(
-                    assets_by_site, haz_sitecol,
+                haz_sitecol, aids_by_site, discarded = assoc(
+                    exposure.get_asset_array(), haz_sitecol,
                     grid_spacing * SQRT2, 'filter')
                 if len(discarded):
-                    logging.info('Discarded %d sites with assets '
+                    logging.info('Discarded %d assets '
                                  '[use oq plot_assets]', len(discarded))
-                    hdf5['discarded'] = numpy.array(discarded)
+                    hdf5['discarded'] = discarded
                 haz_sitecol.make_complete()
             else:
                 haz_sitecol = assetcol
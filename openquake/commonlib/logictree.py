@@ -47,7 +47,7 @@ from openquake.hazardlib.imt import from_string
 from openquake.hazardlib import valid, nrml, InvalidFile, pmf
 from openquake.hazardlib.sourceconverter import SourceGroup
 from openquake.hazardlib.lt import (
-    Branch, BranchSet, LogicTreeError, parse_uncertainty, sample)
+    Branch, BranchSet, LogicTreeError, parse_uncertainty, sample_idxs)
 
 TRT_REGEX = re.compile(r'tectonicRegion="([^"]+?)"')
 ID_REGEX = re.compile(r'id="([^"]+?)"')
@@ -652,6 +652,11 @@ class SourceModelLogicTree(object):
 # used in GsimLogicTree
 BranchTuple = namedtuple('BranchTuple', 'trt id gsim weight effective')
 
+# brs is an array of shape (P, T) with the branch index of each path for each
+# tectonic region type, weights an array of shape (P, K) with the weights of
+# each path for each key in keys (the first key is 'weight', then the IMTs)
+GsimPaths = namedtuple('GsimPaths', 'brs weights keys')
+
 
 class InvalidLogicTree(Exception):
     pass
@@ -717,6 +722,15 @@ class ImtWeight(object):
         except KeyError:
             return self.dic['weight']
 
+    @classmethod
+    def new(cls, keys, values):
+        """
+        :returns: an ImtWeight instance with the given keys and values
+        """
+        self = object.__new__(cls)
+        self.dic = dict(zip(keys, values))
+        return self
+
     def __repr__(self):
         return '<%s %s>' % (self.__class__.__name__, self.dic)
 
@@ -1000,30 +1014,112 @@ class GsimLogicTree(object):
             [trt] = self.values
         return sorted(self.values[trt])
 
-    def sample(self, n, seed):
+    def get_branches_by_trt(self):
+        """
+        :returns: a list of T lists of branches, one per TRT in .values
+        """
+        return [[b for b in self.branches if b.trt == trt]
+                for trt in self.values]
+
+    def get_weight_keys(self):
+        """
+        :returns: 'weight' followed by the IMTs with specific weights
+        """
+        keys = set()
+        for branch in self.branches:
+            keys.update(branch.weight.dic)
+        keys.discard('weight')
+        return ['weight'] + sorted(keys)
+
+    def _get_weights(self, brs, keys, groups):
+        # weights of the paths as an array of shape (P, K), by multiplying
+        # the weights of the branches in the order of the TRTs
+        weights = numpy.ones((len(brs), len(keys)))
+        for t, branches in enumerate(groups):
+            ws = numpy.array([[br.weight[k] for k in keys]
+                              for br in branches])
+            weights *= ws[brs[:, t]]
+        return weights
+
+    def get_effective_paths(self):
+        """
+        Array-based equivalent of `get_effective_rlzs(self)`. The index of
+        an effective realization is decoded into the branch indices of the
+        effective TRTs arithmetically, in the same order as
+        `itertools.product`; the paths differing only for the branches of
+        the non-effective TRTs are merged by summing their weights and
+        represented by the first branch.
+
+        :returns: a GsimPaths instance with G effective paths
+        """
+        groups = self.get_branches_by_trt()
+        keys = self.get_weight_keys()
+        T = len(groups)
+        eff = [t for t, brs in enumerate(groups) if brs and brs[0].effective]
+        if not eff or not all(groups):  # no realizations
+            return GsimPaths(numpy.zeros((0, T), U16),
+                             numpy.zeros((0, len(keys))), keys)
+        noneff = [t for t in range(T) if t not in eff]
+        shape = [len(groups[t]) for t in eff]
+        brs = numpy.zeros((numpy.prod(shape), T), U16)
+        brs[:, eff] = numpy.array(
+            numpy.unravel_index(numpy.arange(len(brs)), shape)).T
+        weights = numpy.zeros((len(brs), len(keys)))
+        for idxs in itertools.product(*[range(len(groups[t]))
+                                        for t in noneff]):
+            brs[:, noneff] = idxs
+            weights += self._get_weights(brs, keys, groups)
+        brs[:, noneff] = 0
+        return GsimPaths(brs, weights, keys)
+
+    def sample_paths(self, n, seed):
         """
         :param n: number of samples
         :param seed: random seed
-        :returns: n Realization objects
+        :returns: a GsimPaths instance with n sampled paths
         """
-        brlists = [sample([b for b in self.branches if b.trt == trt],
-                          n, seed + i) for i, trt in enumerate(self.values)]
+        groups = self.get_branches_by_trt()
+        keys = self.get_weight_keys()
+        brs = numpy.zeros((n, len(groups)), U16)
+        for t, branches in enumerate(groups):
+            brs[:, t] = sample_idxs(
+                [br.weight['weight'] for br in branches], n, seed + t)
+        return GsimPaths(brs, self._get_weights(brs, keys, groups), keys)
+
+    def get_pids(self, paths):
+        """
+        :param paths: a GsimPaths instance
+        :returns: a list of path IDs, with '@' for the non-effective TRTs
+        """
+        ids = [[br.id if br.effective else '@' for br in branches]
+               for branches in self.get_branches_by_trt()]
+        return ['_'.join(ids[t][b] for t, b in enumerate(brs))
+                for brs in paths.brs]
+
+    def to_rlzs(self, paths, samples=1):
+        """
+        :param paths: a GsimPaths instance
+        :param samples: the number of paths represented by each path
+        :returns: a list of Realization objects
+        """
+        groups = self.get_branches_by_trt()
         rlzs = []
-        for i in range(n):
-            weight = 1
-            lt_path = []
-            lt_uid = []
-            value = []
-            for brlist in brlists:  # there is branch list for each TRT
-                branch = brlist[i]
-                lt_path.append(branch.id)
-                lt_uid.append(branch.id if branch.effective else '@')
-                weight *= branch.weight
-                value.append(branch.gsim)
-            rlz = Realization(tuple(value), weight, i, tuple(lt_uid), 1)
-            rlzs.append(rlz)
+        for i, (brs, weights) in enumerate(zip(paths.brs, paths.weights)):
+            branches = [groups[t][b] for t, b in enumerate(brs)]
+            value = tuple(br.gsim for br in branches)
+            lt_uid = tuple(br.id if br.effective else '@' for br in branches)
+            weight = ImtWeight.new(paths.keys, weights)
+            rlzs.append(Realization(value, weight, i, lt_uid, samples))
         return rlzs
 
+    def sample(self, n, seed):
+        """
+        :param n: number of samples
+        :param seed: random seed
+        :returns: n Realization objects
+        """
+        return self.to_rlzs(self.sample_paths(n, seed))
+
     def __iter__(self):
         """
         Yield :class:`openquake.commonlib.logictree.Realization` instances
@@ -1238,42 +1334,91 @@ class FullLogicTree(object):
         """
         return dict(zip(self.gsim_lt.values, rlz.gsim_rlz.value))
 
+    def get_gsim_paths(self):
+        """
+        :returns:
+            a GsimPaths instance with the paths of all the realizations in
+            case of sampling, or the effective paths of the gsim logic tree
+            otherwise; the result is cached
+        """
+        cache = vars(self).get('_gsim_paths')
+        if cache is None or cache[0] is not self.gsim_lt:
+            if self.num_samples:
+                lst = [self.gsim_lt.sample_paths(
+                    sm.samples, self.seed + sm.ordinal)
+                       for sm in self.sm_rlzs]
+                paths = GsimPaths(
+                    numpy.concatenate([p.brs for p in lst]),
+                    numpy.concatenate([p.weights for p in lst]),
+                    self.gsim_lt.get_weight_keys())
+            else:
+                paths = self.gsim_lt.get_effective_paths()
+            self._gsim_paths = cache = (self.gsim_lt, paths)
+        return cache[1]
+
+    def _get_paths(self, eri):
+        # the gsim paths of the given source model realization
+        paths = self.get_gsim_paths()
+        if self.num_samples:
+            sm = self.sm_rlzs[eri]
+            sl = slice(sm.offset, sm.offset + sm.samples)
+            return GsimPaths(paths.brs[sl], paths.weights[sl], paths.keys)
+        return paths
+
+    def _get_samples(self):
+        # number of paths of the gsim logic tree merged in each effective path
+        if self.num_samples:
+            return 1
+        return int(numpy.prod([len(branches) for branches in
+                               self.gsim_lt.get_branches_by_trt()
+                               if branches and not branches[0].effective]))
+
     def get_rlzs(self, eri):
         """
         :returns: a list of LtRealization objects
         """
         rlzs = []
         sm = self.sm_rlzs[eri]
-        if self.num_samples:
-            gsim_rlzs = self.gsim_lt.sample(sm.samples, self.seed + sm.ordinal)
-        elif hasattr(self, 'gsim_rlzs'):  # cache
-            gsim_rlzs = self.gsim_rlzs
-        else:
-            self.gsim_rlzs = gsim_rlzs = get_effective_rlzs(self.gsim_lt)
+        gsim_rlzs = self.gsim_lt.to_rlzs(
+            self._get_paths(eri), self._get_samples())
         for i, gsim_rlz in enumerate(gsim_rlzs):
             weight = sm.weight * gsim_rlz.weight
             rlz = LtRealization(sm.offset + i, sm.lt_path, gsim_rlz, weight)
             rlzs.append(rlz)
         return rlzs
 
-    def get_realizations(self):
+    def get_weights(self):
         """
-        :returns: the complete list of LtRealizations
+        :returns:
+            an array of shape (R, K) with the weights of the realizations for
+            each key in `.get_gsim_paths().keys`, summing up to 1
         """
-        rlzs = sum((self.get_rlzs(sm.ordinal) for sm in self.sm_rlzs), [])
-        assert rlzs, 'No realizations found??'
+        weights = numpy.concatenate([
+            sm.weight * self._get_paths(sm.ordinal).weights
+            for sm in self.sm_rlzs])
+        assert len(weights), 'No realizations found??'
         if self.num_samples:
-            assert len(rlzs) == self.num_samples, (len(rlzs), self.num_samples)
-            for rlz in rlzs:
-                for k in rlz.weight.dic:
-                    rlz.weight.dic[k] = 1. / self.num_samples
+            assert len(weights) == self.num_samples, (
+                len(weights), self.num_samples)
+            weights[:] = 1. / self.num_samples
         else:
-            tot_weight = sum(rlz.weight for rlz in rlzs)
-            if not tot_weight.is_one():
+            # NB: cumsum sums sequentially, as the builtin sum
+            tot_weight = numpy.cumsum(weights, axis=0)[-1]
+            if not all(abs(w - 1.) < pmf.PRECISION for w in tot_weight if w):
                 # this may happen for rounding errors; we ensure the sum of
                 # the weights is 1
-                for rlz in rlzs:
-                    rlz.weight = rlz.weight / tot_weight
+                weights /= tot_weight
+        return weights
+
+    def get_realizations(self):
+        """
+        :returns: the complete list of LtRealizations
+        """
+        keys = self.get_gsim_paths().keys
+        weights = self.get_weights()
+        rlzs = sum((self.get_rlzs(sm.ordinal) for sm in self.sm_rlzs), [])
+        for rlz, ws in zip(rlzs, weights):
+            rlz.weight = ImtWeight.new(keys, ws)
         return rlzs
 
     def get_rlzs_by_gsim(self, grp_id):
@@ -1281,9 +1426,17 @@ class FullLogicTree(object):
         :returns: a dictionary gsim -> rlzs
         """
         trti, eri = divmod(grp_id, len(self.sm_rlzs))
-        rlzs_by_gsim = AccumDict(accum=[])
-        for rlz in self.get_rlzs(eri):
-            rlzs_by_gsim[rlz.gsim_rlz.value[trti]].append(rlz.ordinal)
+        offset = self.sm_rlzs[eri].offset
+        brs = self._get_paths(eri).brs[:, trti]
+        branches = self.gsim_lt.get_branches_by_trt()[trti]
+        rlzs_by_gsim = {}
+        for br in numpy.unique(brs):
+            rlzs = offset + numpy.where(brs == br)[0]
+            gsim = branches[br].gsim
+            if gsim in rlzs_by_gsim:  # the same gsim in different branches
+                rlzs = numpy.sort(numpy.concatenate(
+                    [rlzs_by_gsim[gsim], rlzs]))
+            rlzs_by_gsim[gsim] = rlzs
         return {gsim: U32(rlzs) for gsim, rlzs in sorted(rlzs_by_gsim.items())}
 
     def get_rlzs_by_gsim_grp(self):
@@ -1324,18 +1477,25 @@ class FullLogicTree(object):
         # with this FullLogicTree instances will be unpickled correctly
         return self.seed, self.num_samples, self.sm_rlzs
 
+    def __getstate__(self):
+        # the cached gsim paths can be large and are not sent to the workers
+        return {k: v for k, v in vars(self).items() if k != '_gsim_paths'}
+
     def __toh5__(self):
-        # save full_lt/sm_data in the datastore
+        # save full_lt/sm_data and the gsim paths in the datastore
         sm_data = []
         for sm in self.sm_rlzs:
             sm_data.append((sm.value, sm.weight, '_'.join(sm.lt_path),
                             sm.samples, sm.offset))
+        paths = self.get_gsim_paths()
         return (dict(
             source_model_lt=self.source_model_lt,
             gsim_lt=self.gsim_lt,
-            sm_data=numpy.array(sm_data, source_model_dt)),
+            sm_data=numpy.array(sm_data, source_model_dt),
+            gsim_brs=paths.brs, gsim_weights=paths.weights),
                 dict(seed=self.seed, num_samples=self.num_samples,
-                     trts=hdf5.array_of_vstr(self.gsim_lt.values)))
+                     trts=hdf5.array_of_vstr(self.gsim_lt.values),
+                     weight_keys=hdf5.array_of_vstr(paths.keys)))
 
     def __fromh5__(self, dic, attrs):
         # TODO: this is called more times than needed, maybe we should cache it
@@ -1350,6 +1510,11 @@ class FullLogicTree(object):
                 rec['name'], rec['weight'], sm_id, path,
                 rec['samples'], rec['offset'])
             self.sm_rlzs.append(sm)
+        if 'gsim_brs' in dic:  # missing in old datastores
+            keys = [decode(k) for k in attrs['weight_keys']]
+            paths = GsimPaths(dic['gsim_brs'][()], dic['gsim_weights'][()],
+                              keys)
+            self._gsim_paths = (self.gsim_lt, paths)
 
     def get_num_rlzs(self, sm_rlz=None):
         """
@@ -1367,9 +1532,17 @@ class FullLogicTree(object):
         """
         :returns: an array of realizations
         """
-        tups = [(r.ordinal, r.pid, r.weight['weight'])
-                for r in self.get_realizations()]
-        return numpy.array(tups, rlz_dt)
+        weights = self.get_weights()
+        arr = numpy.zeros(len(weights), rlz_dt)
+        arr['ordinal'] = numpy.arange(len(weights))
+        arr['weight'] = weights[:, 0]
+        pids = []
+        for sm in self.sm_rlzs:
+            smpid = '_'.join(sm.lt_path)
+            pids.extend(smpid + '~' + pid for pid in self.gsim_lt.get_pids(
+                self._get_paths(sm.ordinal)))
+        arr['branch_path'] = pids
+        return arr
 
     def get_gsims_by_trt(self):
         """
@@ -1377,10 +1550,12 @@ class FullLogicTree(object):
         """
         if self.num_samples:
             gsims_by_trt = AccumDict(accum=set())
-            for sm in self.sm_rlzs:
-                rlzs = self.gsim_lt.sample(sm.samples, self.seed + sm.ordinal)
-                for t, trt in enumerate(self.gsim_lt.values):
-                    gsims_by_trt[trt].update([rlz.value[t] for rlz in rlzs])
+            brs = self.get_gsim_paths().brs
+            groups = self.gsim_lt.get_branches_by_trt()
+            for t, trt in enumerate(self.gsim_lt.values):
+                if len(brs):
+                    gsims_by_trt[trt].update(
+                        groups[t][b].gsim for b in numpy.unique(brs[:, t]))
         else:
             gsims_by_trt = self.gsim_lt.values
         return {trt: sorted(gsims) for trt, gsims in gsims_by_trt.items()}
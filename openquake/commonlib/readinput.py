@@ -825,15 +825,13 @@ def get_sitecol_assetcol(oqparam, haz_sitecol=None, cost_types=()):
 
     if haz_sitecol.mesh != exposure.mesh:
         # associate the assets to the hazard sites
-        sitecol, assets_by, discarded = geo.utils.assoc(
-            exposure.assets_by_site, haz_sitecol, haz_distance, 'filter')
+        sitecol, aids_by_site, discarded = geo.utils.assoc(
+            exposure.get_asset_array(), haz_sitecol, haz_distance, 'filter')
         assets_by_site = [[] for _ in sitecol.complete.sids]
-        num_assets = 0
-        for sid, assets in zip(sitecol.sids, assets_by):
-            assets_by_site[sid] = assets
-            num_assets += len(assets)
-        logging.info(
-            'Associated %d assets to %d sites', num_assets, len(sitecol))
+        for sid, aids in zip(sitecol.sids, aids_by_site):
+            assets_by_site[sid] = [exposure.assets[a] for a in aids]
+        logging.info('Associated %d assets to %d sites',
+                     len(exposure.assets) - len(discarded), len(sitecol))
     else:
         # asset sites and hazard sites are the same
         sitecol = haz_sitecol
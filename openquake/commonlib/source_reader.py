@@ -17,6 +17,7 @@
 # along with OpenQuake.  If not, see <http://www.gnu.org/licenses/>.
 import copy
 import random
+import hashlib
 import os.path
 import pickle
 import operator
@@ -24,7 +25,7 @@ import logging
 import zlib
 import numpy
 
-from openquake.baselib import parallel, general
+from openquake.baselib import parallel, general, hdf5, config, __version__
 from openquake.hazardlib import nrml, sourceconverter, calc, InvalidFile
 from openquake.hazardlib.lt import apply_uncertainties
 
@@ -62,6 +63,64 @@ def read_source_model(fname, converter, srcfilter, monitor):
     return {fname: sm}
 
 
+def _cache_key(fname, converter):
+    # build a key depending on the engine version, on the path and content
+    # of the source model file, on the associated .hdf5 file (if any) and
+    # on the converter; a SHA-256 digest makes collisions negligible
+    sha = hashlib.sha256(__version__.encode('utf8'))
+    sha.update(os.path.abspath(fname).encode('utf8'))
+    for path in (fname, os.path.splitext(fname)[0] + '.hdf5'):
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(TWO16 * 16), b''):
+                    sha.update(block)
+    params = sorted((k, v) for k, v in vars(converter).items() if k != 'fname')
+    sha.update(repr(params).encode('utf8'))
+    return sha.hexdigest()
+
+
+def read_cached_source_models(cache, keydict):
+    """
+    :param cache: path to the HDF5 file containing the cached source models
+    :param keydict: a dictionary fname -> cache key
+    :returns: a dictionary fname -> SourceModel for the files in the cache
+    """
+    smdict = {}
+    if not os.path.exists(cache):
+        return smdict
+    try:
+        with hdf5.File(cache, 'r') as h5:
+            for fname, key in keydict.items():
+                if key in h5:
+                    sm = pickle.loads(h5[key][()].tobytes())
+                    sm.fname = fname
+                    smdict[fname] = sm
+    except OSError as exc:  # for instance the cache is locked
+        logging.warning('Could not read %s: %s', cache, exc)
+    return smdict
+
+
+def save_cached_source_models(cache, keydict, smdict):
+    """
+    Store the given source models in the cache, as pickled byte arrays
+    keyed by the checksum of the source model file and converter parameters
+
+    :param cache: path to the HDF5 file containing the cached source models
+    :param keydict: a dictionary fname -> cache key
+    :param smdict: a dictionary fname -> SourceModel
+    """
+    try:
+        with hdf5.File(cache, 'a') as h5:
+            for fname, sm in smdict.items():
+                key = keydict[fname]
+                if key not in h5:
+                    pik = pickle.dumps(sm, pickle.HIGHEST_PROTOCOL)
+                    h5[key] = numpy.frombuffer(pik, numpy.uint8)
+                    h5[key].attrs['fname'] = fname
+    except OSError as exc:  # for instance the cache is locked
+        logging.warning('Could not update %s: %s', cache, exc)
+
+
 def get_csm(oq, full_lt, h5=None):
     """
     Build source models from the logic tree and to store
@@ -89,7 +148,6 @@ def get_csm(oq, full_lt, h5=None):
             src_groups.append(sg)
             src = sg[0].new(sm_rlz.ordinal, sm_rlz.value)  # one source
             sg.mags = numpy.unique(numpy.round(src.mags))
-            del src.__dict__['mags']  # remove cache
             src.checksum = src.grp_id = src.id = grp_id
             src.samples = sm_rlz.samples
             if classical:
@@ -115,14 +173,30 @@ def get_csm(oq, full_lt, h5=None):
     # (for instance in oq-engine/demos) so the processpool must be used
     dist = ('no' if os.environ.get('OQ_DISTRIBUTE') == 'no'
             else 'processpool')
+    # NB: the sampled source models are never cached
+    cache = None if srcfilter else config.directory.get('source_cache')
+    smpaths = full_lt.source_model_lt.info.smpaths
+    if cache:
+        keydict = {fname: _cache_key(fname, converter) for fname in smpaths}
+        smdict = read_cached_source_models(cache, keydict)
+        if smdict:
+            logging.info('Read %d source model(s) from %s',
+                         len(smdict), cache)
+    else:
+        smdict = {}
     # NB: h5 is None in logictree_test.py
     allargs = []
-    for fname in full_lt.source_model_lt.info.smpaths:
-        allargs.append((fname, converter, srcfilter))
-    smdict = parallel.Starmap(read_source_model, allargs, distribute=dist,
-                              h5=h5 if h5 else None).reduce()
-    if len(smdict) > 1:  # really parallel
-        parallel.Starmap.shutdown()  # save memory
+    for fname in smpaths:
+        if fname not in smdict:
+            allargs.append((fname, converter, srcfilter))
+    if allargs:
+        parsed = parallel.Starmap(read_source_model, allargs, distribute=dist,
+                                  h5=h5 if h5 else None).reduce()
+        if len(parsed) > 1:  # really parallel
+            parallel.Starmap.shutdown()  # save memory
+        if cache:
+            save_cached_source_models(cache, keydict, parsed)
+        smdict.update(parsed)
     groups = _build_groups(full_lt, smdict)
 
     # checking the changes
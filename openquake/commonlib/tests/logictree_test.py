@@ -1297,6 +1297,11 @@ class SampleTestCase(unittest.TestCase):
         self.assertEqual(count(samples, value='B'), 278)
         self.assertEqual(count(samples, value='C'), 497)
 
+    def test_sample_idxs(self):
+        # the same random indices used by lt.sample
+        idxs = lt.sample_idxs([0.2, 0.3, 0.5], 1000, 42)
+        self.assertEqual(list(numpy.bincount(idxs)), [225, 278, 497])
+
     def test_sample_broken_branch_weights(self):
         branches = [logictree.Branch('BS', 0, 0.1, 0),
                     logictree.Branch('BS', 1, 0.2, 1)]
@@ -2047,6 +2052,27 @@ class GsimLogicTreeTestCase(unittest.TestCase):
         effective_rlzs = set(rlz.pid for rlz in fs_bg_model_lt)
         self.assertEqual(len(effective_rlzs), 5 * 4)
 
+    def test_effective_paths(self):
+        # the array-based enumeration gives the same effective realizations
+        # of get_effective_rlzs, also for a reduced logic tree
+        xml = codecs.open(
+            os.path.join(DATADIR, 'gmpe_logic_tree_share_reduced.xml'),
+            encoding='utf8').read().encode('utf8')
+        gsim_lt = self.parse_valid(xml, ['Active Shallow Crust',
+                                         'Stable Shallow Crust', 'Shield'])
+        for trts in ({'*'}, {'Shield', 'Stable Shallow Crust'}):
+            red_lt = gsim_lt.reduce(trts)
+            expected = logictree.get_effective_rlzs(red_lt)
+            paths = red_lt.get_effective_paths()
+            self.assertEqual(paths.brs.shape, (len(expected), 3))
+            rlzs = red_lt.to_rlzs(paths)
+            self.assertEqual([r.lt_path for r in rlzs],
+                             [r.lt_path for r in expected])
+            self.assertEqual([r.value for r in rlzs],
+                             [r.value for r in expected])
+            self.assertEqual([r.weight['weight'] for r in rlzs],
+                             [r.weight['weight'] for r in expected])
+
     def test_sampling(self):
         xml = _make_nrml("""\
         <logicTree logicTreeID="lt1">
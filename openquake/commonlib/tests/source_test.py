@@ -17,18 +17,21 @@
 # along with OpenQuake. If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import tempfile
 import unittest
+from unittest import mock
 from io import BytesIO
 
 import numpy
 from numpy.testing import assert_allclose
 
-from openquake.baselib.general import assert_close
+from openquake.baselib import config, hdf5
+from openquake.baselib.general import assert_close, gettemp
 from openquake.baselib.parallel import Starmap
 from openquake.hazardlib import site, geo, mfd, pmf, scalerel, tests as htests
 from openquake.hazardlib import source, sourceconverter as s
 from openquake.hazardlib.tom import PoissonTOM
-from openquake.commonlib import tests, readinput
+from openquake.commonlib import tests, readinput, source_reader
 from openquake.commonlib.logictree import FullLogicTree
 from openquake.hazardlib import nrml
 
@@ -742,6 +745,33 @@ Subduction Interface,b3,[SadighEtAl1997],w=1.0>''')
         # counting the sources in each TRT model (after splitting)
         self.assertEqual([9, 18], list(map(len, csm.src_groups)))
 
+    def test_source_cache(self):
+        oqparam = tests.get_oqparam('classical_job.ini')
+        cache = os.path.join(tempfile.mkdtemp(), 'source_cache.hdf5')
+        with mock.patch.dict(config.directory, source_cache=cache):
+            csm1 = readinput.get_composite_source_model(oqparam)
+            with hdf5.File(cache, 'r') as h5:
+                self.assertEqual(len(h5), 1)  # one source model file
+            # the second time the source model is read from the cache
+            with mock.patch('openquake.commonlib.source_reader.'
+                            'read_source_model') as read:
+                csm2 = readinput.get_composite_source_model(oqparam)
+            self.assertFalse(read.called)
+        self.assertEqual([src.source_id for src in csm1.get_sources()],
+                         [src.source_id for src in csm2.get_sources()])
+
+    def test_cache_key(self):
+        fname = gettemp('<?xml version="1.0" encoding="utf-8"?>',
+                        suffix='.xml')
+        conv = s.SourceConverter(50., 1., 10, 0.1, 10.)
+        key = source_reader._cache_key(fname, conv)
+        self.assertEqual(len(key), 64)  # SHA-256 hex digest
+        # the key changes with the engine version and the converter
+        with mock.patch.object(source_reader, '__version__', '0.0.0'):
+            self.assertNotEqual(source_reader._cache_key(fname, conv), key)
+        conv.area_source_discretization = 5.
+        self.assertNotEqual(source_reader._cache_key(fname, conv), key)
+
     def test_oversampling(self):
         from openquake.qa_tests_data.classical import case_17
         oq = readinput.get_oqparam(
@@ -37,6 +37,8 @@ from openquake.hazardlib.gsim import base
 from openquake.hazardlib.calc.filters import IntegrationDistance
 from openquake.hazardlib.probability_map import ProbabilityMap
 from openquake.hazardlib.geo.surface import PlanarSurface
+from openquake.hazardlib.geo.surface.planar import (
+    KERNELS, build_planar_array, get_distances_planar)
 
 bymag = operator.attrgetter('mag')
 bydist = operator.attrgetter('dist')
@@ -82,6 +84,31 @@ def get_distances(rupture, sites, param):
     return dist
 
 
+def get_planar_distances(ruptures, sites, params):
+    """
+    Compute the distances of the ruptures with a planar surface with the
+    batched kernels in :mod:`openquake.hazardlib.geo.surface.planar`.
+
+    :param ruptures: a list of ruptures
+    :param sites: a mesh of points or a site collection
+    :param params: the kinds of distance to compute
+    :returns: a dictionary rupture index -> param -> array of distances,
+              for the planar ruptures and the params supported by the kernels
+    """
+    params = set(params) & set(KERNELS)
+    idxs = [i for i, rup in enumerate(ruptures)
+            if isinstance(rup.surface, PlanarSurface)]
+    if not params or not idxs:
+        return {}
+    planes = build_planar_array([ruptures[i].surface for i in idxs])
+    dists = {}
+    for param in params:
+        dists[param] = get_distances_planar(planes, sites, param)
+        dists[param].flags.writeable = False
+    return {i: {param: dists[param][j] for param in params}
+            for j, i in enumerate(idxs)}
+
+
 class FarAwayRupture(Exception):
     """Raised if the rupture is outside the maximum distance for all sites"""
 
@@ -226,13 +253,15 @@ class ContextMaker(object):
             raise FarAwayRupture('%d: %d km' % (rup.rup_id, distances.min()))
         return sites, DistancesContext([(self.filter_distance, distances)])
 
-    def get_dctx(self, sites, rup):
+    def get_dctx(self, sites, rup, distances=None):
         """
         :param sites: :class:`openquake.hazardlib.site.SiteCollection`
         :param rup: :class:`openquake.hazardlib.source.rupture.BaseRupture`
+        :param distances: the filter distances, if already computed
         :returns: :class:`DistancesContext`
         """
-        distances = get_distances(rup, sites, self.filter_distance)
+        if distances is None:
+            distances = get_distances(rup, sites, self.filter_distance)
         mdist = self.maximum_distance(self.trt, rup.mag)
         if (distances > mdist).all():
             raise FarAwayRupture('%d: %d km' % (rup.rup_id, distances.min()))
@@ -269,7 +298,7 @@ class ContextMaker(object):
             setattr(ctx, param, value)
         return ctx
 
-    def make_contexts(self, sites, rupture, filt=True):
+    def make_contexts(self, sites, rupture, filt=True, dists=None):
         """
         Filter the site collection with respect to the rupture and
         create context objects.
@@ -284,6 +313,10 @@ class ContextMaker(object):
         :param boolean filt:
             If True filter the sites
 
+        :param dists:
+            If given, a dictionary param -> distances already computed
+            on all the sites (used only if filt is False)
+
         :returns:
             Tuple of two items: sites and distances context.
 
@@ -293,10 +326,16 @@ class ContextMaker(object):
         """
         if filt:
             sites, dctx = self.filter(sites, rupture)
+            dists = {}
         else:
-            dctx = self.get_dctx(sites, rupture)
+            dists = dists or {}
+            dctx = self.get_dctx(
+                sites, rupture, dists.get(self.filter_distance))
         for param in self.REQUIRES_DISTANCES - set([self.filter_distance]):
-            distances = get_distances(rupture, sites, param)
+            if param in dists:
+                distances = dists[param]
+            else:
+                distances = get_distances(rupture, sites, param)
             setattr(dctx, param, distances)
         reqv_obj = (self.reqv.get(self.trt) if self.reqv else None)
         if reqv_obj and isinstance(rupture.surface, PlanarSurface):
@@ -313,9 +352,17 @@ class ContextMaker(object):
             a list of fat RuptureContexts
         """
         ctxs = []
-        for rup in ruptures:
+        if filt:  # the sites change with the rupture
+            planar = {}
+        else:  # compute the distances of the planar ruptures all together
+            ruptures = list(ruptures)
+            planar = get_planar_distances(
+                ruptures, sites,
+                self.REQUIRES_DISTANCES | {self.filter_distance})
+        for i, rup in enumerate(ruptures):
             try:
-                ctx, r_sites, dctx = self.make_contexts(sites, rup, filt)
+                ctx, r_sites, dctx = self.make_contexts(
+                    sites, rup, filt, planar.get(i))
             except FarAwayRupture:
                 continue
             for par in self.REQUIRES_SITES_PARAMETERS:
@@ -174,6 +174,70 @@ def min_distance_to_segment(seglons, seglats, lons, lats):
     return dists
 
 
+def min_distance_to_segments(seglons, seglats, lons, lats):
+    """
+    Compute at once the distance between a set of points and the closest
+    segment of a polyline. It is equivalent to calling
+    :func:`min_distance_to_segment` for each segment and taking for each
+    point the distance with the smallest absolute value, but the exact
+    distances are computed only for the segments which can be the closest.
+
+    :parameter seglons:
+        An array of longitudes of the vertexes of the polyline
+    :parameter seglats:
+        An array of latitudes of the vertexes of the polyline
+    :parameter lons:
+        An array of longitudes of the points
+    :parameter lats:
+        An array of latitudes of the points
+    :returns:
+        An array of the same shape as lons with the signed distances, with
+        the same sign conventions of :func:`min_distance_to_segment`
+    """
+    flons, flats = numpy.ravel(lons), numpy.ravel(lats)
+    vdists = cdist(spherical_to_cartesian(seglons, seglats),
+                   spherical_to_cartesian(flons, flats))  # chord distances
+    seglens = geodetic_distance(seglons[:-1], seglats[:-1],
+                                seglons[1:], seglats[1:])
+    # (dist1 + dist2 - seglen) / 2 is a lower bound for the distance from a
+    # segment, while the distance from the closest vertex is an upper bound
+    # for the distance from the closest segment
+    lower = (vdists[:-1] + vdists[1:] - seglens[:, None]) / 2
+    upper = numpy.arcsin(
+        numpy.minimum(vdists.min(axis=0) / EARTH_RADIUS / 2, 1)
+    ) * EARTH_RADIUS * 2 + 1E-6
+    sidx, pidx = (lower <= upper).nonzero()  # candidate pairs
+
+    lons0, lats0 = seglons[sidx], seglats[sidx]
+    lons1, lats1 = seglons[sidx + 1], seglats[sidx + 1]
+    plons, plats = flons[pidx], flats[pidx]
+    seg_azim = azimuth(lons0, lats0, lons1, lats1)
+    azimuth1 = azimuth(lons0, lats0, plons, plats)
+    azimuth2 = azimuth(lons1, lats1, plons, plats)
+
+    # for the points inside the band defined by the two lines perpendicular
+    # to the segment the closest distance is the distance from the great arc;
+    # for the points outside it is the minimum of the distances from the two
+    # vertexes of the segment
+    inside = ((numpy.cos(numpy.radians(seg_azim - azimuth1)) >= 0.0) &
+              (numpy.cos(numpy.radians(seg_azim - azimuth2)) <= 0.0))
+    dists = numpy.minimum(vdists[sidx, pidx], vdists[sidx + 1, pidx])
+    dists[inside] = distance_to_arc(
+        lons0[inside], lats0[inside], seg_azim[inside],
+        plons[inside], plats[inside])
+    dists = abs(dists)
+
+    # for each point take the closest segment (the first one in case of ties)
+    order = numpy.lexsort((sidx, dists, pidx))
+    _, idx = numpy.unique(pidx[order], return_index=True)
+    closest = order[idx]
+    dists = dists[closest]
+    neg = numpy.sin(numpy.radians(
+        azimuth1[closest] - seg_azim[closest])) < 0.0
+    dists[neg] = - dists[neg]
+    return dists.reshape(numpy.shape(lons))
+
+
 def _reshape(array, orig_shape):
     if orig_shape:
         return array.reshape(orig_shape)
@@ -21,7 +21,7 @@ Module :mod:`openquake.hazardlib.geo.mesh` defines classes :class:`Mesh` and
 its subclass :class:`RectangularMesh`.
 """
 import numpy
-from scipy.spatial.distance import cdist
+from scipy.spatial import cKDTree
 import shapely.geometry
 import shapely.ops
 
@@ -241,11 +241,10 @@ class Mesh(object):
             numpy array of distances in km of shape (self.size, mesh.size)
 
         Method doesn't make any assumptions on arrangement of the points
-        in either mesh and instead calculates the distance from each point of
-        this mesh to each point of the target mesh and returns the lowest found
-        for each.
+        in either mesh and instead finds the closest point of this mesh to
+        each point of the target mesh and returns the distance.
         """
-        return cdist(self.xyz, mesh.xyz).min(axis=0)
+        return self._min_idx_dst(mesh)[1]
 
     def get_closest_points(self, mesh):
         """
@@ -255,7 +254,7 @@ class Mesh(object):
             :class:`Mesh` object of the same shape as `mesh` with closest
             points from this one at respective indices.
         """
-        min_idx = cdist(self.xyz, mesh.xyz).argmin(axis=0)  # lose shape
+        min_idx = self._min_idx_dst(mesh)[0]  # lose shape
         if hasattr(mesh, 'shape'):
             min_idx = min_idx.reshape(mesh.shape)
         lons = self.lons.take(min_idx)
@@ -263,6 +262,13 @@ class Mesh(object):
         deps = self.depths.take(min_idx)
         return Mesh(lons, lats, deps)
 
+    def _min_idx_dst(self, mesh):
+        # nearest neighbour search with a KD-tree on the points of this mesh;
+        # unlike a full distance matrix the memory occupation is linear in
+        # the number of points of the target mesh
+        dists, idxs = cKDTree(self.xyz).query(mesh.xyz)
+        return idxs, dists
+
     def get_distance_matrix(self):
         """
         Compute and return distances between each pairs of points in the mesh.
@@ -337,9 +343,13 @@ class Mesh(object):
         # the exact distance to enclosing polygon of this mesh and it
         # depends on mesh spacing. but the difference can be neglected
         # if calculated geodetic distance is over some threshold.
-        # get the highest slice from the 3D mesh
-        distances = geodetic.min_geodetic_distance(
-            (self.lons, self.lats), (mesh.lons, mesh.lats))
+        # get the highest slice from the 3D mesh; the closest points are
+        # found with a KD-tree, since the matrix of the distances between
+        # all the points of the two meshes can be huge
+        xyz = geo_utils.spherical_to_cartesian(
+            self.lons.flatten(), self.lats.flatten())
+        distances, _ = cKDTree(xyz).query(geo_utils.spherical_to_cartesian(
+            mesh.lons.flatten(), mesh.lats.flatten()))
         # here we find the points for which calculated mesh-to-mesh
         # distance is below a threshold. this threshold is arbitrary:
         # lower values increase the maximum possible error, higher
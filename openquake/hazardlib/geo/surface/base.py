@@ -22,6 +22,7 @@ Module :mod:`openquake.hazardlib.geo.surface.base` implements
 """
 import numpy
 import math
+from openquake.baselib.general import cached_property
 from openquake.hazardlib.geo import geodetic, utils, Point, Line,\
     RectangularMesh
 
@@ -158,16 +159,14 @@ class BaseSurface:
             Numpy array of distances in km.
         """
         # This computes ry0 by using an average strike direction
-        top_edge = self.mesh[0:1]
+        lons, lats = self._top_edge
         mean_strike = self.get_strike()
 
-        dst1 = geodetic.distance_to_arc(top_edge.lons[0, 0],
-                                        top_edge.lats[0, 0],
+        dst1 = geodetic.distance_to_arc(lons[0], lats[0],
                                         (mean_strike + 90.) % 360,
                                         mesh.lons, mesh.lats)
 
-        dst2 = geodetic.distance_to_arc(top_edge.lons[0, -1],
-                                        top_edge.lats[0, -1],
+        dst2 = geodetic.distance_to_arc(lons[-1], lats[-1],
                                         (mean_strike + 90.) % 360,
                                         mesh.lons, mesh.lats)
         # Find the points on the rupture
@@ -199,72 +198,37 @@ class BaseSurface:
         :returns:
             Numpy array of distances in km.
         """
-        top_edge = self.mesh[0:1]
-
-        dists = []
-        if top_edge.lons.shape[1] < 3:
-
-            i = 0
-            p1 = Point(
-                top_edge.lons[0, i],
-                top_edge.lats[0, i],
-                top_edge.depths[0, i]
-            )
-            p2 = Point(
-                top_edge.lons[0, i + 1], top_edge.lats[0, i + 1],
-                top_edge.depths[0, i + 1]
-            )
-            azimuth = p1.azimuth(p2)
-            dists.append(
-                geodetic.distance_to_arc(
-                    p1.longitude, p1.latitude, azimuth,
-                    mesh.lons, mesh.lats
-                )
-            )
-
+        lons, lats = self._top_edge
+        if len(lons) < 3:
+            azimuth = geodetic.azimuth(lons[0], lats[0], lons[1], lats[1])
+            return geodetic.distance_to_arc(
+                lons[0], lats[0], azimuth, mesh.lons, mesh.lats)
+
+        # the first and last segments are extended to semi-arcs; the first
+        # one is swapped and the sign of the distance is corrected
+        azimuth = geodetic.azimuth(lons[1], lats[1], lons[0], lats[0])
+        first = geodetic.distance_to_semi_arc(
+            lons[1], lats[1], azimuth, mesh.lons, mesh.lats)
+        azimuth = geodetic.azimuth(lons[-2], lats[-2], lons[-1], lats[-1])
+        last = geodetic.distance_to_semi_arc(
+            lons[-2], lats[-2], azimuth, mesh.lons, mesh.lats)
+        if len(lons) > 3:  # the segments in between are computed together
+            middle = geodetic.min_distance_to_segments(
+                lons[1:-1], lats[1:-1], mesh.lons, mesh.lats)
+            dists = numpy.array([-first, middle, last])
         else:
-
-            for i in range(top_edge.lons.shape[1] - 1):
-                p1 = Point(
-                    top_edge.lons[0, i],
-                    top_edge.lats[0, i],
-                    top_edge.depths[0, i]
-                )
-                p2 = Point(
-                    top_edge.lons[0, i + 1],
-                    top_edge.lats[0, i + 1],
-                    top_edge.depths[0, i + 1]
-                )
-                # Swapping
-                if i == 0:
-                    pt = p1
-                    p1 = p2
-                    p2 = pt
-
-                # Computing azimuth and distance
-                if i == 0 or i == top_edge.lons.shape[1] - 2:
-                    azimuth = p1.azimuth(p2)
-                    tmp = geodetic.distance_to_semi_arc(p1.longitude,
-                                                        p1.latitude,
-                                                        azimuth,
-                                                        mesh.lons, mesh.lats)
-                else:
-                    tmp = geodetic.min_distance_to_segment(
-                        numpy.array([p1.longitude, p2.longitude]),
-                        numpy.array([p1.latitude, p2.latitude]),
-                        mesh.lons, mesh.lats)
-                # Correcting the sign of the distance
-                if i == 0:
-                    tmp *= -1
-                dists.append(tmp)
-
-        # Computing distances
-        dists = numpy.array(dists)
+            dists = numpy.array([-first, last])
         iii = abs(dists).argmin(axis=0)
-        dst = dists[iii, list(range(dists.shape[1]))]
+        dst = dists[iii, numpy.arange(dists.shape[1])]
 
         return dst
 
+    @cached_property
+    def _top_edge(self):
+        # longitudes and latitudes of the top edge, used in Rx and Ry0
+        top_edge = self.mesh[0:1]
+        return top_edge.lons[0], top_edge.lats[0]
+
     def get_top_edge_depth(self):
         """
         Return minimum depth of surface's top edge.
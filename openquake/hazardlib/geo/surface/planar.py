@@ -111,14 +111,7 @@ class PlanarSurface(BaseSurface):
         self._init_plane()
 
         # now we can check surface for validity
-        dists, xx, yy = self._project(self.mesh.xyz)
-        # "length" of the rupture is measured along the top edge
-        length1, length2 = xx[1] - xx[0], xx[3] - xx[2]
-        # "width" of the rupture is measured along downdip direction
-        width1, width2 = yy[2] - yy[0], yy[3] - yy[1]
-        self.width = (width1 + width2) / 2.0
-        self.length = (length1 + length2) / 2.0
-
+        dists, length1, length2 = self._init_width_length()
         if check:
             # calculate the imperfect rectangle tolerance
             # relative to surface's area
@@ -161,6 +154,28 @@ class PlanarSurface(BaseSurface):
                    bottom_right, bottom_left)
         return self
 
+    @classmethod
+    def from_corners(cls, strike, dip, corners):
+        """
+        :param strike: strike of the surface
+        :param dip: dip of the surface
+        :param corners:
+            an array of shape (3, 4) with the longitudes, latitudes and
+            depths of the corners top_left, top_right, bottom_left,
+            bottom_right
+        :returns: a :class:`PlanarSurface` instance
+
+        This is used when the corners are computed by the engine, as in the
+        case of the ruptures of point sources, so they are not checked.
+        """
+        self = object.__new__(cls)
+        self.strike = strike
+        self.dip = dip
+        self.corner_lons, self.corner_lats, self.corner_depths = corners
+        self._init_plane()
+        self._init_width_length()
+        return self
+
     @classmethod
     def from_array(cls, array3N):
         """
@@ -201,6 +216,24 @@ class PlanarSurface(BaseSurface):
         self.uv2 = numpy.cross(self.normal, self.uv1)
         self.zero_zero = tl
 
+    def _init_width_length(self):
+        """
+        Set the width and the length of the surface by projecting the corners
+        on the plane containing it.
+
+        :returns:
+            the distances of the corners from the plane and the lengths of
+            the top and bottom edges, needed to check the surface
+        """
+        dists, xx, yy = self._project(self.mesh.xyz)
+        # "length" of the rupture is measured along the top edge
+        length1, length2 = xx[1] - xx[0], xx[3] - xx[2]
+        # "width" of the rupture is measured along downdip direction
+        width1, width2 = yy[2] - yy[0], yy[3] - yy[1]
+        self.width = (width1 + width2) / 2.0
+        self.length = (length1 + length2) / 2.0
+        return dists, length1, length2
+
     def translate(self, p1, p2):
         """
         Translate the surface for a specific distance along a specific azimuth
@@ -221,12 +254,23 @@ class PlanarSurface(BaseSurface):
                                    p2.longitude, p2.latitude)
         distance = geodetic.geodetic_distance(p1.longitude, p1.latitude,
                                               p2.longitude, p2.latitude)
+        return self.with_corners(*geodetic.point_at(
+            self.corner_lons, self.corner_lats, azimuth, distance))
+
+    def with_corners(self, corner_lons, corner_lats):
+        """
+        :param corner_lons: the new longitudes of the corners
+        :param corner_lats: the new latitudes of the corners
+        :returns:
+            A new :class:`PlanarSurface` object with the same dip, strike,
+            width, length and depths but with the given corners
+        """
         # avoid calling PlanarSurface's constructor
         nsurf = object.__new__(PlanarSurface)
         nsurf.dip = self.dip
         nsurf.strike = self.strike
-        nsurf.corner_lons, nsurf.corner_lats = geodetic.point_at(
-            self.corner_lons, self.corner_lats, azimuth, distance)
+        nsurf.corner_lons = corner_lons
+        nsurf.corner_lats = corner_lats
         nsurf.corner_depths = self.corner_depths.copy()
         nsurf._init_plane()
         nsurf.width = self.width
@@ -622,3 +666,155 @@ class PlanarSurface(BaseSurface):
         return (self.corner_lons.take([0, 1, 3, 2, 0]),
                 self.corner_lats.take([0, 1, 3, 2, 0]),
                 self.corner_depths.take([0, 1, 3, 2, 0]))
+
+
+# ######################## batched distance kernels ######################## #
+
+F64 = numpy.float64
+plane_dt = numpy.dtype([
+    ('strike', F64), ('width', F64), ('length', F64), ('d', F64),
+    ('normal', (F64, 3)), ('uv1', (F64, 3)), ('uv2', (F64, 3)),
+    ('zero_zero', (F64, 3)), ('corners', (F64, (3, 4)))])
+
+
+def build_planar_array(surfaces):
+    """
+    :param surfaces: a list of R planar surfaces
+    :returns: an array of R planes with dtype plane_dt
+    """
+    planes = numpy.zeros(len(surfaces), plane_dt)
+    for plane, surface in zip(planes, surfaces):
+        plane['strike'] = surface.strike
+        plane['width'] = surface.width
+        plane['length'] = surface.length
+        plane['d'] = surface.d
+        plane['normal'] = surface.normal
+        plane['uv1'] = surface.uv1
+        plane['uv2'] = surface.uv2
+        plane['zero_zero'] = surface.zero_zero
+        plane['corners'] = (surface.corner_lons, surface.corner_lats,
+                            surface.corner_depths)
+    return planes
+
+
+def _project(planes, xyz):
+    # the same as PlanarSurface._project, for R planes and N points;
+    # returns three arrays of shape (R, N)
+    normal = planes['normal'][:, None]
+    dists = (normal * xyz).sum(axis=-1) + planes['d'][:, None]
+    projs = xyz + normal * -dists[..., None]
+    vectors2d = projs - planes['zero_zero'][:, None]
+    xx = (vectors2d * planes['uv1'][:, None]).sum(axis=-1)
+    yy = (vectors2d * planes['uv2'][:, None]).sum(axis=-1)
+    return dists, xx, yy
+
+
+def get_rrup(planes, mesh):
+    """
+    :param planes: an array of R planes with dtype plane_dt
+    :param mesh: a mesh of N points
+    :returns: an array of shape (R, N) with the distances from the planes,
+              see :meth:`PlanarSurface.get_min_distance`
+    """
+    dists, xx, yy = _project(planes, mesh.xyz)
+    length = planes['length'][:, None]
+    width = planes['width'][:, None]
+    mxx = numpy.select([xx < 0, xx > length], [xx, xx - length], 0)
+    myy = numpy.select([yy < 0, yy > width], [yy, yy - width], 0)
+    return numpy.sqrt(dists ** 2 + (mxx ** 2 + myy ** 2))
+
+
+def get_rjb(planes, mesh):
+    """
+    :param planes: an array of R planes with dtype plane_dt
+    :param mesh: a mesh of N points
+    :returns: an array of shape (R, N) with the Joyner-Boore distances, see
+              :meth:`PlanarSurface.get_joyner_boore_distance`
+    """
+    corners = planes['corners']
+    strike = planes['strike']
+    downdip_azimuth = (strike + 90) % 360
+    # arcs starting from the corners TL, BL, TL, TR, shape (R, 1, 4)
+    arcs_lons = corners[:, 0].take([0, 2, 0, 1], axis=-1)[:, None]
+    arcs_lats = corners[:, 1].take([0, 2, 0, 1], axis=-1)[:, None]
+    arcs_azimuths = numpy.stack(
+        [strike, strike, downdip_azimuth, downdip_azimuth], axis=-1)[:, None]
+    lons = mesh.lons.reshape(1, -1, 1)
+    lats = mesh.lats.reshape(1, -1, 1)
+    # shape (R, N, 4)
+    dists_to_arcs = geodetic.distance_to_arc(
+        arcs_lons, arcs_lats, arcs_azimuths, lons, lats)
+    # shape (R, N), see geodetic.min_geodetic_distance
+    corners_xyz = geo_utils.spherical_to_cartesian(
+        corners[:, 0], corners[:, 1])
+    dists_to_corners = numpy.sqrt(
+        ((corners_xyz[:, None] - mesh.xyz.reshape(1, -1, 1, 3)) ** 2).sum(
+            axis=-1)).min(axis=-1)
+    ds1, ds2, ds3, ds4 = numpy.sign(dists_to_arcs).transpose(2, 0, 1)
+    dists_to_arcs = numpy.abs(dists_to_arcs).reshape(
+        dists_to_arcs.shape[:2] + (2, 2)).min(axis=-1)
+    return numpy.select(
+        [(ds1 == ds2) & (ds3 == ds4), ds1 == ds2, ds3 == ds4],
+        [dists_to_corners, dists_to_arcs[..., 0], dists_to_arcs[..., 1]], 0)
+
+
+def get_rx(planes, mesh):
+    """
+    :param planes: an array of R planes with dtype plane_dt
+    :param mesh: a mesh of N points
+    :returns: an array of shape (R, N) with the Rx distances, see
+              :meth:`PlanarSurface.get_rx_distance`
+    """
+    corners = planes['corners']
+    return geodetic.distance_to_arc(
+        corners[:, 0, 0, None], corners[:, 1, 0, None],
+        planes['strike'][:, None], mesh.lons.reshape(1, -1),
+        mesh.lats.reshape(1, -1))
+
+
+def get_ry0(planes, mesh):
+    """
+    :param planes: an array of R planes with dtype plane_dt
+    :param mesh: a mesh of N points
+    :returns: an array of shape (R, N) with the Ry0 distances, see
+              :meth:`PlanarSurface.get_ry0_distance`
+    """
+    corners = planes['corners']
+    azimuths = (planes['strike'][:, None] + 90.) % 360
+    lons = mesh.lons.reshape(1, -1)
+    lats = mesh.lats.reshape(1, -1)
+    dst1 = geodetic.distance_to_arc(
+        corners[:, 0, 0, None], corners[:, 1, 0, None], azimuths, lons, lats)
+    dst2 = geodetic.distance_to_arc(
+        corners[:, 0, 1, None], corners[:, 1, 1, None], azimuths, lons, lats)
+    # the distance is zero for the points between the two lines
+    return numpy.where(numpy.sign(dst1) == numpy.sign(dst2),
+                       numpy.fmin(numpy.abs(dst1), numpy.abs(dst2)), 0)
+
+
+KERNELS = dict(rrup=get_rrup, rjb=get_rjb, rx=get_rx, ry0=get_ry0)
+
+
+def get_distances_planar(planes, mesh, param, chunksize=100_000):
+    """
+    Compute the distances of the given kind between R planes and N points,
+    in chunks of at most chunksize // N planes. The largest temporary arrays
+    are the ones of get_rjb, with shape (R, N, 4) and (R, N, 4, 3) for a
+    chunk of R planes, i.e. up to 16 x chunksize floats.
+
+    :param planes: an array of R planes with dtype plane_dt
+    :param mesh: a mesh of N points or a site collection
+    :param param: the kind of distance ('rrup', 'rjb', 'rx' or 'ry0')
+    :param chunksize: the maximum number of distances per chunk
+    :returns: an array of shape (R, N)
+    """
+    try:
+        kernel = KERNELS[param]
+    except KeyError:
+        raise ValueError('Unknown distance measure %r' % param)
+    N = len(mesh.lons.flat)
+    dists = numpy.zeros((len(planes), N))
+    step = max(chunksize // max(N, 1), 1)
+    for start in range(0, len(planes), step):
+        dists[start:start + step] = kernel(planes[start:start + step], mesh)
+    return dists
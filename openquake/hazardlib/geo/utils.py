@@ -22,14 +22,13 @@ to several geographical primitives and some other low-level spatial operations.
 """
 import math
 import logging
-import operator
 import collections
 
 import numpy
 from scipy.spatial import cKDTree
 import shapely.geometry
+import shapely.vectorized
 
-from openquake.baselib.hdf5 import vstr
 from openquake.hazardlib.geo import geodetic
 
 U32 = numpy.uint32
@@ -109,72 +108,70 @@ class _GeographicObjects(object):
         :returns: filtered site collection, filtered objects, discarded
         """
         assert mode in 'strict warn filter', mode
-        dic = {}
-        discarded = []
-        for sid, lon, lat in zip(sitecol.sids, sitecol.lons, sitecol.lats):
-            obj, distance = self.get_closest(lon, lat)
-            if assoc_dist is None:
-                dic[sid] = obj  # associate all
-            elif distance <= assoc_dist:
-                dic[sid] = obj  # associate within
-            elif mode == 'warn':
-                dic[sid] = obj  # associate outside
+        # a single query for all the sites
+        dists, idxs = self.kdtree.query(
+            spherical_to_cartesian(sitecol.lons, sitecol.lats))
+        if assoc_dist is None:  # associate all
+            ok = numpy.ones(len(dists), bool)
+        else:
+            ok = dists <= assoc_dist
+        far, = (~ok).nonzero()
+        if len(far) and mode == 'strict':
+            raise SiteAssociationError(
+                'There is nothing closer than %s km '
+                'to site (%s %s)' % (assoc_dist, sitecol.lons[far[0]],
+                                     sitecol.lats[far[0]]))
+        elif mode == 'warn':
+            for i in far:  # associate outside
+                obj = self.objects[idxs[i]]
                 logging.warning(
                     'The closest vs30 site (%.1f %.1f) is distant more than %d'
                     ' km from site #%d (%.1f %.1f)', obj['lon'], obj['lat'],
-                    int(distance), sid, lon, lat)
-            elif mode == 'filter':
-                discarded.append(obj)
-            elif mode == 'strict':
-                raise SiteAssociationError(
-                    'There is nothing closer than %s km '
-                    'to site (%s %s)' % (assoc_dist, lon, lat))
-        if not dic:
+                    int(dists[i]), sitecol.sids[i], sitecol.lons[i],
+                    sitecol.lats[i])
+            ok[:] = True
+        discarded = list(self.objects[idxs[far]]) if mode == 'filter' else []
+        if not ok.any():
             raise SiteAssociationError(
                 'No sites could be associated within %s km' % assoc_dist)
-        sids = sorted(dic)
-        return (sitecol.filtered(sids), numpy.array([dic[s] for s in sids]),
-                discarded)
+        sids = sitecol.sids[ok]
+        order = numpy.argsort(sids)
+        return (sitecol.filtered(sids[order]),
+                self.objects[idxs[ok][order]], discarded)
 
-    def assoc2(self, assets_by_site, assoc_dist, mode):
+    def assoc2(self, assets, assoc_dist, mode):
         """
-        Associated a list of assets by site to the site collection used
+        Associated an array of assets to the site collection used
         to instantiate GeographicObjects.
 
-        :param assets_by_sites: a list of lists of assets
+        :param assets: an array with fields lon, lat, ordinal
         :param assoc_dist: the maximum distance for association
-        :param mode: 'strict', 'warn' or 'filter'
-        :returns: filtered site collection, filtered assets by site, discarded
+        :param mode: 'strict' or 'filter'
+        :returns: filtered site collection, a list of arrays with the
+                  indices of the assets of each site, discarded assets
         """
         assert mode in 'strict filter', mode
         self.objects.filtered  # self.objects must be a SiteCollection
-        asset_dt = numpy.dtype(
-            [('asset_ref', vstr), ('lon', F32), ('lat', F32)])
-        assets_by_sid = collections.defaultdict(list)
-        discarded = []
-        for assets in assets_by_site:
-            lon, lat = assets[0].location
-            obj, distance = self.get_closest(lon, lat)
-            if distance <= assoc_dist:
-                # keep the assets, otherwise discard them
-                assets_by_sid[obj['sids']].extend(assets)
-            elif mode == 'strict':
-                raise SiteAssociationError(
-                    'There is nothing closer than %s km '
-                    'to site (%s %s)' % (assoc_dist, lon, lat))
-            else:
-                discarded.extend(assets)
-        sids = sorted(assets_by_sid)
-        if not sids:
+        # a single query for the locations of all the assets
+        dists, idxs = self.kdtree.query(
+            spherical_to_cartesian(assets['lon'], assets['lat']))
+        ok = dists <= assoc_dist
+        if mode == 'strict' and not ok.all():
+            far = assets[~ok][0]
+            raise SiteAssociationError(
+                'There is nothing closer than %s km '
+                'to site (%s %s)' % (assoc_dist, far['lon'], far['lat']))
+        if not ok.any():
             raise SiteAssociationError(
                 'Could not associate any site to any assets within the '
                 'asset_hazard_distance of %s km' % assoc_dist)
-        assets_by_site = [
-            sorted(assets_by_sid[sid], key=operator.attrgetter('ordinal'))
-            for sid in sids]
-        data = [(asset.asset_id,) + asset.location for asset in discarded]
-        discarded = numpy.array(data, asset_dt)
-        return self.objects.filtered(sids), assets_by_site, discarded
+        # group the kept assets by site ID and sort them by ordinal
+        kept, = ok.nonzero()
+        sids = self.objects['sids'][idxs[kept]]
+        order = numpy.lexsort((assets['ordinal'][kept], sids))
+        usids, starts = numpy.unique(sids[order], return_index=True)
+        aids_by_site = numpy.split(kept[order], starts[1:])
+        return self.objects.filtered(usids), aids_by_site, assets[~ok]
 
 
 def assoc(objects, sitecol, assoc_dist, mode):
@@ -182,8 +179,8 @@ def assoc(objects, sitecol, assoc_dist, mode):
     Associate geographic objects to a site collection.
 
     :param objects:
-        something with .lons, .lats or ['lon'] ['lat'], or a list of lists
-        of objects with a .location attribute (i.e. assets_by_site)
+        something with .lons, .lats or ['lon'] ['lat'], or an array of
+        assets with fields lon, lat, ordinal
     :param assoc_dist:
         the maximum distance for association
     :param mode:
@@ -191,12 +188,12 @@ def assoc(objects, sitecol, assoc_dist, mode):
         if 'error' fail if all sites are not associated
     :returns: (filtered site collection, filtered objects)
     """
-    if isinstance(objects, numpy.ndarray) or hasattr(objects, 'lons'):
-        # objects is a geo array with lon, lat fields; used for ShakeMaps
-        return _GeographicObjects(objects).assoc(sitecol, assoc_dist, mode)
-    else:  # objects is the list assets_by_site
+    if hasattr(objects, 'dtype') and 'ordinal' in objects.dtype.names:
+        # objects is an array of assets
         return _GeographicObjects(sitecol).assoc2(
             objects, assoc_dist, mode)
+    # objects is a geo array with lon, lat fields; used for ShakeMaps
+    return _GeographicObjects(objects).assoc(sitecol, assoc_dist, mode)
 
 
 def clean_points(points):
@@ -533,13 +530,34 @@ def normalized(vector):
     return vector / length
 
 
+def within(geom, xs, ys):
+    """
+    Vectorized version of shapely `Point(x, y).within(geom)`.
+
+    :param geom: a shapely polygon or multipolygon
+    :param xs: an array of abscissas (or longitudes)
+    :param ys: an array of ordinates (or latitudes)
+    :returns: a boolean array, True for the points strictly inside geom
+    """
+    xs = numpy.asarray(xs, float)
+    ys = numpy.asarray(ys, float)
+    mask = numpy.zeros(xs.shape, bool)
+    # the points on the bounding box are outside or on the boundary
+    min_x, min_y, max_x, max_y = geom.bounds
+    inbox, = ((min_x < xs) & (xs < max_x) &
+              (min_y < ys) & (ys < max_y)).nonzero()
+    if len(inbox):
+        mask[inbox] = shapely.vectorized.contains(geom, xs[inbox], ys[inbox])
+    return mask
+
+
 def point_to_polygon_distance(polygon, pxx, pyy):
     """
     Calculate the distance to polygon for each point of the collection
     on the 2d Cartesian plane.
 
     :param polygon:
-        Shapely "Polygon" geometry object.
+        Shapely "Polygon" or "MultiPolygon" geometry object.
     :param pxx:
         List or numpy array of abscissae values of points to calculate
         the distance from.
@@ -549,16 +567,39 @@ def point_to_polygon_distance(polygon, pxx, pyy):
         Numpy array of distances in units of coordinate system. Points
         that lie inside the polygon have zero distance.
     """
-    pxx = numpy.array(pxx)
-    pyy = numpy.array(pyy)
+    pxx = numpy.array(pxx, float)
+    pyy = numpy.array(pyy, float)
     assert pxx.shape == pyy.shape
     if pxx.ndim == 0:
         pxx = pxx.reshape((1, ))
         pyy = pyy.reshape((1, ))
-    result = numpy.array([
-        polygon.distance(shapely.geometry.Point(pxx.item(i), pyy.item(i)))
-        for i in range(pxx.size)
-    ])
+    # collect the edges of all the rings (exteriors and holes)
+    starts, stops = [], []
+    for poly in getattr(polygon, 'geoms', [polygon]):
+        for ring in [poly.exterior] + list(poly.interiors):
+            coords = numpy.array(ring.coords)[:, :2]
+            starts.append(coords[:-1])
+            stops.append(coords[1:])
+    x0, y0 = numpy.concatenate(starts).T
+    x1, y1 = numpy.concatenate(stops).T
+    dx, dy = x1 - x0, y1 - y0
+    sqlen = dx * dx + dy * dy
+    sqlen[sqlen == 0] = numpy.inf  # degenerate edges, project on the start
+    result = numpy.zeros(pxx.size)
+    xs, ys = pxx.flatten(), pyy.flatten()
+    chunksize = max(1, 1_000_000 // len(x0))  # bound the memory
+    for start in range(0, pxx.size, chunksize):
+        px = xs[start:start + chunksize, None]
+        py = ys[start:start + chunksize, None]
+        # distance from the closest point of each edge
+        t = numpy.clip(((px - x0) * dx + (py - y0) * dy) / sqlen, 0, 1)
+        dists = numpy.hypot(px - x0 - t * dx, py - y0 - t * dy).min(axis=1)
+        # even-odd rule: the points inside have an odd number of crossings
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            crossing = ((y0 > py) != (y1 > py)) & (
+                px < x0 + (py - y0) * dx / dy)
+        dists[crossing.sum(axis=1) % 2 == 1] = 0
+        result[start:start + chunksize] = dists
     return result.reshape(pxx.shape)
 
 
@@ -641,37 +682,35 @@ def bbox2poly(bbox):
 # it may turn useful in the future (with SiteCollection.geohash)
 def geohash(lon, lat, length):
     """
-    Encode a position given in lon, lat into a geohash of the given lenght
+    Encode a position given in lon, lat into a geohash of the given lenght.
+    If lon and lat are arrays, return an array of geohashes.
 
     >>> geohash(lon=10, lat=45, length=5)
     b'spzpg'
-    """
-    lat_interval, lon_interval = (-90.0, 90.0), (-180.0, 180.0)
-    chars = b''
-    bits = [16, 8, 4, 2, 1]
-    bit = 0
-    ch = 0
-    even = True
-    while len(chars) < length:
-        if even:
-            mid = (lon_interval[0] + lon_interval[1]) / 2
-            if lon > mid:
-                ch |= bits[bit]
-                lon_interval = (mid, lon_interval[1])
-            else:
-                lon_interval = (lon_interval[0], mid)
-        else:
-            mid = (lat_interval[0] + lat_interval[1]) / 2
-            if lat > mid:
-                ch |= bits[bit]
-                lat_interval = (mid, lat_interval[1])
-            else:
-                lat_interval = (lat_interval[0], mid)
-        even = not even
-        if bit < 4:
-            bit += 1
-        else:
-            chars += BASE32[ch]
-            bit = 0
-            ch = 0
-    return chars
+    >>> list(geohash(lon=[10, 0], lat=[45, 0], length=3))
+    [b'spz', b'7zz']
+    """
+    lons = numpy.array(lon, float)
+    lats = numpy.array(lat, float)
+    scalar = lons.ndim == 0
+    lons, lats = lons.reshape(-1), lats.reshape(-1)
+    n = len(lons)
+    lon_min, lon_max = numpy.full(n, -180.), numpy.full(n, 180.)
+    lat_min, lat_max = numpy.full(n, -90.), numpy.full(n, 90.)
+    codes = numpy.zeros((n, length), numpy.uint8)
+    for i in range(length * 5):
+        c, bit = divmod(i, 5)
+        if i % 2 == 0:  # bisect the longitude interval
+            mid = (lon_min + lon_max) / 2
+            gt = lons > mid
+            lon_min = numpy.where(gt, mid, lon_min)
+            lon_max = numpy.where(gt, lon_max, mid)
+        else:  # bisect the latitude interval
+            mid = (lat_min + lat_max) / 2
+            gt = lats > mid
+            lat_min = numpy.where(gt, mid, lat_min)
+            lat_max = numpy.where(gt, lat_max, mid)
+        codes[:, c] |= gt.astype(numpy.uint8) << (4 - bit)
+    chars = numpy.array(BASE32)[codes]  # shape (n, length)
+    hashes = chars.view((numpy.string_, length)).reshape(n)
+    return hashes[0] if scalar else hashes
@@ -265,6 +265,21 @@ def _incMFD_absolute(utype, source, value):
 
 # ######################### apply_uncertainties ########################### #
 
+def new_variant(source):
+    """
+    :param source: a seismic source
+    :returns:
+        a variant of the source sharing the geometry and all the other
+        parameters with the original one; since the modifications
+        reassign the source attributes and the MFD attributes without
+        changing them in place, it is enough to copy the MFD object
+    """
+    variant = copy.copy(source)
+    if hasattr(source, 'mfd'):
+        variant.mfd = copy.copy(source.mfd)
+    return variant
+
+
 def apply_uncertainties(bset_values, src_group):
     """
     :param bset_value: a list of pairs (branchset, value)
@@ -280,7 +295,7 @@ def apply_uncertainties(bset_values, src_group):
     for source in src_group:
         oks = [bset.filter_source(source) for bset, value in bset_values]
         if sum(oks):  # source not filtered out
-            src = copy.deepcopy(source)
+            src = new_variant(source)
             srcs = []
             for (bset, value), ok in zip(bset_values, oks):
                 if ok and bset.collapsed:
@@ -289,7 +304,7 @@ def apply_uncertainties(bset_values, src_group):
                             'Collapsing of the logic tree is not implemented '
                             'for %s' % src)
                     for br in bset.branches:
-                        newsrc = copy.deepcopy(src)
+                        newsrc = new_variant(src)
                         newsrc.scaling_rate = br.weight
                         apply_uncertainty(
                             bset.uncertainty_type, newsrc, br.value)
@@ -309,6 +324,23 @@ def apply_uncertainties(bset_values, src_group):
 # ######################### branches and branchsets ######################## #
 
 
+def sample_idxs(weights, num_samples, seed):
+    """
+    Take random indices of a sequence of weights
+
+    :param weights:
+        A finite sequence of weights summing up to 1
+    :param num_samples:
+        The number of samples to return
+    :param seed:
+        A random seed
+    :return:
+        An array of `num_samples` indices in the range 0 .. len(weights) - 1
+    """
+    numpy.random.seed(seed)
+    return numpy.random.choice(len(weights), num_samples, p=weights)
+
+
 def sample(weighted_objects, num_samples, seed):
     """
     Take random samples of a sequence of weighted objects
@@ -330,8 +362,7 @@ def sample(weighted_objects, num_samples, seed):
             weights.append(w)
         else:
             weights.append(w['weight'])
-    numpy.random.seed(seed)
-    idxs = numpy.random.choice(len(weights), num_samples, p=weights)
+    idxs = sample_idxs(weights, num_samples, seed)
     # NB: returning an array would break things
     return [weighted_objects[idx] for idx in idxs]
 
@@ -23,7 +23,6 @@ import zipfile
 import logging
 import numpy
 from scipy.stats import truncnorm, norm
-from scipy import interpolate
 
 from openquake.hazardlib import geo, site, imt, correlation
 from openquake.hazardlib.shakemapconverter import get_shakemap_array
@@ -178,15 +177,8 @@ def spatial_covariance_array(stddev, corrmatrices):
     :returns: an array of shape (M, N, N)
     """
     # this depends on sPGA, sSa03, sSa10, sSa30
-    M, N = corrmatrices.shape[:2]
-    matrices = []
-    for i, std in enumerate(stddev):
-        covmatrix = numpy.zeros((N, N))
-        for j in range(N):
-            for k in range(N):
-                covmatrix[j, k] = corrmatrices[i, j, k] * std[j] * std[k]
-        matrices.append(covmatrix)
-    return numpy.array(matrices)
+    stddev = numpy.array(stddev)
+    return corrmatrices * stddev[:, :, None] * stddev[:, None, :]
 
 
 def cross_correlation_matrix(imts, corr='yes'):
@@ -220,14 +212,40 @@ def cross_correlation_matrix(imts, corr='yes'):
     return cross_matrix
 
 
+# breakpoints of the piecewise-linear amplification as a function of the
+# ground motion value, and exponents of 760 / vs30 at the breakpoints for
+# short periods (T <= 0.3) and long periods
+AMP_GMVS = numpy.array([0, 0.1, 0.2, 0.3, 0.4, 5])
+AMP_EXPS = numpy.array([[0.35, 0.35, 0.25, 0.10, -0.05, -0.05],
+                        [0.65, 0.65, 0.60, 0.53, 0.45, 0.45]])
+
+
+def _amplify(periods, vs30s, gmvs):
+    # periods and vs30s of shape (P,), gmvs of shape (P, E); the linear
+    # interpolation is performed with the same formula of scipy interp1d
+    gmvs[gmvs > MAX_GMV] = MAX_GMV  # accelerations > 5g are absurd
+    exps = AMP_EXPS[(numpy.array(periods) > 0.3).astype(int)]  # (P, 6)
+    amps = (760 / numpy.array(vs30s, float))[:, None] ** exps  # (P, 6)
+    hi = numpy.searchsorted(AMP_GMVS, gmvs).clip(1, len(AMP_GMVS) - 1)
+    lo = hi - 1
+    x_lo, x_hi = AMP_GMVS[lo], AMP_GMVS[hi]
+    y_lo = numpy.take_along_axis(amps, lo, axis=1)
+    y_hi = numpy.take_along_axis(amps, hi, axis=1)
+    slope = (y_hi - y_lo) / (x_hi - x_lo)
+    return (slope * (gmvs - x_lo) + y_lo) * gmvs
+
+
 def amplify_gmfs(imts, vs30s, gmfs):
     """
     Amplify the ground shaking depending on the vs30s
+
+    :param imts: M intensity measure types
+    :param vs30s: N velocities
+    :param gmfs: an array of shape (M * N, E), clipped in place to MAX_GMV
+    :returns: the amplified gmfs, an array of shape (M * N, E)
     """
-    n = len(vs30s)
-    out = [amplify_ground_shaking(im.period, vs30s[i], gmfs[m * n + i])
-           for m, im in enumerate(imts) for i in range(n)]
-    return numpy.array(out)
+    periods = numpy.repeat([im.period for im in imts], len(vs30s))
+    return _amplify(periods, numpy.tile(vs30s, len(imts)), gmfs)
 
 
 def amplify_ground_shaking(T, vs30, gmvs):
@@ -236,51 +254,93 @@ def amplify_ground_shaking(T, vs30, gmvs):
     :param vs30: velocity
     :param gmvs: ground motion values for the current site in units of g
     """
-    gmvs[gmvs > MAX_GMV] = MAX_GMV  # accelerations > 5g are absurd
-    interpolator = interpolate.interp1d(
-        [0, 0.1, 0.2, 0.3, 0.4, 5],
-        [(760 / vs30)**0.35,
-         (760 / vs30)**0.35,
-         (760 / vs30)**0.25,
-         (760 / vs30)**0.10,
-         (760 / vs30)**-0.05,
-         (760 / vs30)**-0.05],
-    ) if T <= 0.3 else interpolate.interp1d(
-        [0, 0.1, 0.2, 0.3, 0.4, 5],
-        [(760 / vs30)**0.65,
-         (760 / vs30)**0.65,
-         (760 / vs30)**0.60,
-         (760 / vs30)**0.53,
-         (760 / vs30)**0.45,
-         (760 / vs30)**0.45],
-    )
-    return interpolator(gmvs) * gmvs
+    return _amplify([T], [vs30], gmvs.reshape(1, -1))[0]
 
 
 def cholesky(spatial_cov, cross_corr):
     """
     Decompose the spatial covariance and cross correlation matrices.
+    The joint covariance matrix has blocks L_i L_j^T cross_corr[i, j],
+    where L_i is the Cholesky factor of spatial_cov[i], i.e. it is
+    B (cross_corr x I) B^T with B = diag(L_1, ..., L_M); therefore its
+    Cholesky factor is B (C x I), with C the Cholesky factor of
+    cross_corr, and it can be built without decomposing the full matrix.
 
     :param spatial_cov: array of shape (M, N, N)
     :param cross_corr: array of shape (M, M)
     :returns: a triangular matrix of shape (M * N, M * N)
     """
     M, N = spatial_cov.shape[:2]
-    L = numpy.array([numpy.linalg.cholesky(spatial_cov[i]) for i in range(M)])
-    LLT = []
-    for i in range(M):
-        row = [L[i] @ L[j].T * cross_corr[i, j] for j in range(M)]
-        for j in range(N):
-            singlerow = numpy.zeros(M * N)
-            for i in range(M):
-                singlerow[i * N:(i + 1) * N] = row[i][j]
-            LLT.append(singlerow)
-    return numpy.linalg.cholesky(numpy.array(LLT))
+    L = numpy.linalg.cholesky(spatial_cov)  # shape (M, N, N)
+    C = numpy.linalg.cholesky(cross_corr)  # shape (M, M)
+    # LLT[i, :, j, :] = L[i] * C[i, j]
+    LLT = L[:, :, None, :] * C[:, None, :, None]
+    return LLT.reshape(M * N, M * N)
+
+
+def _tiles(lons, lats, max_dist):
+    """
+    :param lons: N longitudes
+    :param lats: N latitudes
+    :param max_dist: size of the tiles in km
+    :returns: a dictionary (row, col) -> indices of the sites in the tile
+    """
+    proj = geo.utils.OrthographicProjection.from_lons_lats(lons, lats)
+    xs, ys = proj(lons, lats)
+    cols = numpy.floor((xs - xs.min()) / max_dist).astype(int)
+    rows = numpy.floor((ys - ys.min()) / max_dist).astype(int)
+    order = numpy.lexsort((cols, rows))
+    keys = numpy.array([rows[order], cols[order]]).T
+    uniq, idxs = numpy.unique(keys, axis=0, return_index=True)
+    return {tuple(key): idx for key, idx in zip(
+        uniq, numpy.split(order, idxs[1:]))}
+
+
+def _sample_tiled(lons, lats, imts, spatialcorr, stddev, Y, max_dist):
+    """
+    Sequential conditional simulation on tiles of size max_dist: the
+    GMFs on a tile are sampled conditionally on the GMFs of the already
+    simulated neighbouring tiles, i.e. the correlation is truncated at
+    distances larger than the tile size.
+
+    :param lons: N longitudes
+    :param lats: N latitudes
+    :param imts: M intensity measure types
+    :param spatialcorr: 'yes', 'no' or 'full'
+    :param stddev: array of shape (M, N)
+    :param Y: cross-correlated standard normal variables of shape (M, N, E)
+    :param max_dist: distance in km where the correlation is truncated
+    :returns: an array of shape (M, N, E) with zero mean
+    """
+    X = numpy.zeros_like(Y)
+    tiles = _tiles(lons, lats, max_dist)
+    for (row, col), tile in sorted(tiles.items()):
+        # the neighbouring tiles already simulated
+        cond = [tiles[key] for key in [(row - 1, col - 1), (row - 1, col),
+                                       (row - 1, col + 1), (row, col - 1)]
+                if key in tiles]
+        cond = numpy.concatenate(cond) if cond else numpy.zeros(0, int)
+        nc = len(cond)
+        idxs = numpy.concatenate([cond, tile])
+        dmatrix = geo.geodetic.distance_matrix(lons[idxs], lats[idxs])
+        corr = spatial_correlation_array(dmatrix, imts, spatialcorr)
+        cov = spatial_covariance_array(stddev[:, idxs], corr)
+        for m, K in enumerate(cov):
+            K_tt = K[nc:, nc:]
+            if nc:
+                W = numpy.linalg.solve(K[:nc, :nc], K[:nc, nc:]).T
+                K_tt = K_tt - W @ K[:nc, nc:]
+                X[m, tile] = W @ X[m, cond]
+            X[m, tile] += numpy.linalg.cholesky(K_tt) @ Y[m, tile]
+    return X
 
 
 def to_gmfs(shakemap, spatialcorr, crosscorr, site_effects, trunclevel,
-            num_gmfs, seed, imts=None):
+            num_gmfs, seed, imts=None, max_dist=None):
     """
+    :param max_dist:
+        if given, truncate the spatial correlation at that distance (in km)
+        and sample the GMFs on tiles of that size, with bounded memory
     :returns: (IMT-strings, array of GMFs of shape (R, N, E, M)
     """
     N = len(shakemap)  # number of sites
@@ -293,25 +353,34 @@ def to_gmfs(shakemap, spatialcorr, crosscorr, site_effects, trunclevel,
     imts_ = [imt.from_string(name) for name in imts]
     M = len(imts_)
     cross_corr = cross_correlation_matrix(imts_, crosscorr)
-    mu = numpy.array([numpy.ones(num_gmfs) * val[str(imt)][j]
-                      for imt in imts_ for j in range(N)])
-    dmatrix = geo.geodetic.distance_matrix(
-        shakemap['lon'], shakemap['lat'])
-    spatial_corr = spatial_correlation_array(dmatrix, imts_, spatialcorr)
-    stddev = [std[str(imt)] for imt in imts_]
+    mu = numpy.array([val[str(imt)] for imt in imts_])[:, :, None]
+    stddev = numpy.array([std[str(imt)] for imt in imts_])  # shape (M, N)
     for im, std in zip(imts_, stddev):
         if std.sum() == 0:
             raise ValueError('Cannot decompose the spatial covariance '
                              'because stddev==0 for IMT=%s' % im)
-    spatial_cov = spatial_covariance_array(stddev, spatial_corr)
-    L = cholesky(spatial_cov, cross_corr)  # shape (M * N, M * N)
     if trunclevel:
         Z = truncnorm.rvs(-trunclevel, trunclevel, loc=0, scale=1,
                           size=(M * N, num_gmfs), random_state=seed)
     else:
         Z = norm.rvs(loc=0, scale=1, size=(M * N, num_gmfs), random_state=seed)
-    # Z has shape (M * N, E)
-    gmfs = numpy.exp(L @ Z + mu) / PCTG
+    # the joint Cholesky factor is diag(L_1, ..., L_M) (C x I), see the
+    # function `cholesky`: first apply the cross correlation factor
+    C = numpy.linalg.cholesky(cross_corr)
+    Y = numpy.einsum('ij,jne->ine', C, Z.reshape(M, N, num_gmfs))
+    if spatialcorr == 'no':  # L_i = diag(stddev_i)
+        X = stddev[:, :, None] * Y
+    elif max_dist is None:
+        dmatrix = geo.geodetic.distance_matrix(
+            shakemap['lon'], shakemap['lat'])
+        spatial_corr = spatial_correlation_array(dmatrix, imts_, spatialcorr)
+        spatial_cov = spatial_covariance_array(stddev, spatial_corr)
+        L = numpy.linalg.cholesky(spatial_cov)  # shape (M, N, N)
+        X = L @ Y
+    else:
+        X = _sample_tiled(shakemap['lon'], shakemap['lat'], imts_,
+                          spatialcorr, stddev, Y, max_dist)
+    gmfs = numpy.exp(X + mu).reshape(M * N, num_gmfs) / PCTG
     if site_effects:
         gmfs = amplify_gmfs(imts_, shakemap['vs30'], gmfs)
     if gmfs.max() > MAX_GMV:
@@ -20,11 +20,10 @@
 Module :mod:`openquake.hazardlib.site` defines :class:`Site`.
 """
 import numpy
-from shapely import geometry
 from openquake.baselib.general import (
     split_in_blocks, not_equal, get_duplicates)
 from openquake.hazardlib.geo.utils import (
-    fix_lon, cross_idl, _GeographicObjects, geohash)
+    fix_lon, cross_idl, _GeographicObjects, geohash, within)
 from openquake.hazardlib.geo.mesh import Mesh
 
 U32LIMIT = 2 ** 32
@@ -449,10 +448,7 @@ class SiteCollection(object):
         :param region: a shapely polygon
         :returns: a filtered SiteCollection of sites within the region
         """
-        mask = numpy.array([
-            geometry.Point(rec['lon'], rec['lat']).within(region)
-            for rec in self.array])
-        return self.filter(mask)
+        return self.filter(within(region, self['lon'], self['lat']))
 
     def within_bbox(self, bbox):
         """
@@ -475,9 +471,7 @@ class SiteCollection(object):
         :param length: length of the geohash
         :returns: an array of N geohashes, one per site
         """
-        lst = [geohash(lon, lat, length)
-               for lon, lat in zip(self['lon'], self['lat'])]
-        return numpy.array(lst, (numpy.string_, length))
+        return geohash(self['lon'], self['lat'], length)
 
     def num_geohashes(self, length):
         """
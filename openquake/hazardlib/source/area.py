@@ -17,9 +17,9 @@
 Module :mod:`openquake.hazardlib.source.area` defines :class:`AreaSource`.
 """
 import math
-from copy import deepcopy
 from openquake.hazardlib import geo, mfd
-from openquake.hazardlib.source.point import PointSource
+from openquake.hazardlib.geo.surface.planar import PlanarSurface
+from openquake.hazardlib.source.point import PointSource, get_planes
 from openquake.hazardlib.source.base import ParametricSeismicSource
 from openquake.hazardlib.source.rupture import ParametricProbabilisticRupture
 
@@ -89,42 +89,46 @@ class AreaSource(ParametricSeismicSource):
         scaling_rate_factor = 1. / len(polygon_mesh)
 
         # take the very first point of the polygon mesh
-        [epicenter0] = polygon_mesh[0:1]
-        # generate "reference ruptures" -- all the ruptures that have the same
-        # epicenter location (first point of the polygon's mesh) but different
-        # magnitudes, nodal planes, hypocenters' depths and occurrence rates
-        # NB: all this mumbo-jumbo is done to avoid multiple calls to
-        # PointSource._get_rupture_surface
-        ref_ruptures = []
-        for mag, mag_occ_rate in self.get_annual_occurrence_rates():
-            for np_prob, np in self.nodal_plane_distribution.data:
-                for hc_prob, hc_depth in self.hypocenter_distribution.data:
-                    hypocenter = geo.Point(latitude=epicenter0.latitude,
-                                           longitude=epicenter0.longitude,
-                                           depth=hc_depth)
-                    occurrence_rate = (mag_occ_rate * np_prob * hc_prob
-                                       * scaling_rate_factor)
-                    surface, nhc = PointSource._get_rupture_surface(
-                        self, mag, np, hypocenter)
-                    if kwargs.get('shift_hypo'):
-                        hc_depth = nhc.depth
-                    ref_ruptures.append((mag, np.rake, hc_depth,
-                                         surface, occurrence_rate))
+        lon0, lat0 = polygon_mesh.lons[0], polygon_mesh.lats[0]
+        # generate the planes of the "reference ruptures" -- all the ruptures
+        # that have the same epicenter location (first point of the polygon's
+        # mesh) but different magnitudes, nodal planes, hypocenters' depths
+        # and occurrence rates, as arrays of shape (M, N, D)
+        # NB: all this mumbo-jumbo is done to avoid computing the geometry
+        # of the planes for each point of the mesh
+        planes = get_planes(
+            self, lon0, lat0, self.get_annual_occurrence_rates(),
+            self.nodal_plane_distribution.data,
+            self.hypocenter_distribution.data).flatten()
+        planes['rate'] *= scaling_rate_factor
+        hypo = 'center' if kwargs.get('shift_hypo') else 'hypo'
+        hc_depths = planes[hypo][:, 2]
+        ref_surfaces = [PlanarSurface.from_corners(
+            plane['strike'], plane['dip'], plane['corners'])
+                        for plane in planes]
+        ref_lons = planes['corners'][:, 0]  # shape (M * N * D, 4)
+        ref_lats = planes['corners'][:, 1]  # shape (M * N * D, 4)
 
         # for each of the epicenter positions generate as many ruptures
         # as we generated "reference" ones: new ruptures differ only
-        # in hypocenter and surface location
-        for epicenter in polygon_mesh:
-            for mag, rake, hc_depth, surface, occ_rate in ref_ruptures:
-                # translate the surface from first epicenter position
-                # to the target one preserving it's geometry
-                surface = surface.translate(epicenter0, epicenter)
-                hypocenter = deepcopy(epicenter)
-                hypocenter.depth = hc_depth
-                rupture = ParametricProbabilisticRupture(
-                    mag, rake, self.tectonic_region_type, hypocenter,
-                    surface, occ_rate, self.temporal_occurrence_model)
-                yield rupture
+        # in hypocenter and surface location; the surfaces are translated
+        # from first epicenter position to the target one preserving their
+        # geometry, computing the new corners of all of them at once
+        lons, lats = polygon_mesh.lons, polygon_mesh.lats
+        azimuths = geo.geodetic.azimuth(lon0, lat0, lons, lats)
+        distances = geo.geodetic.geodetic_distance(lon0, lat0, lons, lats)
+        for lon, lat, azimuth, distance in zip(
+                lons, lats, azimuths, distances):
+            corner_lons, corner_lats = geo.geodetic.point_at(
+                ref_lons, ref_lats, azimuth, distance)
+            for i, plane in enumerate(planes):
+                surface = ref_surfaces[i].with_corners(
+                    corner_lons[i], corner_lats[i])
+                hypocenter = geo.Point(lon, lat, hc_depths[i])
+                yield ParametricProbabilisticRupture(
+                    plane['mag'], plane['rake'], self.tectonic_region_type,
+                    hypocenter, surface, plane['rate'],
+                    self.temporal_occurrence_model)
 
     def count_ruptures(self):
         """
@@ -111,7 +111,8 @@ class MultiPointSource(ParametricSeismicSource):
         Bounding box containing all the point sources, enlarged by the
         maximum distance.
         """
-        return utils.get_bounding_box([ps.location for ps in self], maxdist)
+        lonlats = dict(lon=self.mesh.lons.copy(), lat=self.mesh.lats)
+        return utils.get_bounding_box(lonlats, maxdist)
 
     @property
     def polygon(self):
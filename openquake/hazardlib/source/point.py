@@ -27,6 +27,12 @@ from openquake.hazardlib.source.rupture import (
     ParametricProbabilisticRupture, PointRupture)
 from openquake.hazardlib.geo.utils import get_bounding_box
 
+F64 = numpy.float64
+planar_dt = numpy.dtype([
+    ('mag', F64), ('rake', F64), ('strike', F64), ('dip', F64),
+    ('rate', F64), ('hypo', (F64, 3)), ('center', (F64, 3)),
+    ('corners', (F64, (3, 4)))])
+
 
 def _get_rupture_dimensions(src, mag, rake, dip):
     """
@@ -69,6 +75,114 @@ def _get_rupture_dimensions(src, mag, rake, dip):
     return rup_length, rup_width
 
 
+def get_planes(src, lon, lat, mag_rates, nodal_planes, hypo_depths):
+    """
+    Compute the geometry of the planar ruptures generated in a location
+    for all the combinations of magnitude, nodal plane and hypocenter depth.
+
+    :param src:
+        a PointSource, AreaSource or MultiPointSource
+    :param lon, lat:
+        coordinates of the epicenter
+    :param mag_rates:
+        a list of M pairs (magnitude, occurrence rate)
+    :param nodal_planes:
+        a list of N pairs (probability, nodal plane)
+    :param hypo_depths:
+        a list of D pairs (probability, hypocenter depth)
+    :returns:
+        a composite array of shape (M, N, D) and dtype planar_dt, containing
+        the hypocenters, the rupture centers and the corners of the planes
+    """
+    M, N, D = len(mag_rates), len(nodal_planes), len(hypo_depths)
+    planes = numpy.zeros((M, N, D), planar_dt)
+    if M == 0:
+        return planes
+    mags, rates = numpy.array(mag_rates, F64).T
+    np_probs = numpy.array([prob for prob, np in nodal_planes], F64)
+    strikes = numpy.array([np.strike for prob, np in nodal_planes], F64)
+    dips = numpy.array([np.dip for prob, np in nodal_planes], F64)
+    rakes = numpy.array([np.rake for prob, np in nodal_planes], F64)
+    hc_probs, hc_depths = numpy.array(hypo_depths, F64).T
+    planes['mag'] = mags[:, None, None]
+    planes['rake'] = rakes[None, :, None]
+    planes['strike'] = strikes[None, :, None]
+    planes['dip'] = dips[None, :, None]
+    planes['rate'] = (rates[:, None, None] * np_probs[None, :, None] *
+                      hc_probs[None, None, :])
+
+    # the same algorithm as in PointSource._get_rupture_surface, see there
+    # for the details, but acting on all the planes at once; the arrays
+    # below have shape (M, N, 1), (1, N, 1) or (1, 1, D) and are broadcast
+    dims = numpy.array([[_get_rupture_dimensions(src, mag, np.rake, np.dip)
+                         for prob, np in nodal_planes] for mag in mags])
+    rup_length = dims[:, :, 0, None]
+    rup_width = dims[:, :, 1, None]
+    strike = strikes[None, :, None]
+    rdip = numpy.radians(dips)[None, :, None]
+    depths = hc_depths[None, None, :]
+    azimuth_down = (strike + 90) % 360
+    azimuth_left = (azimuth_down + 90) % 360
+    azimuth_up = (azimuth_left + 90) % 360
+    rup_proj_height = rup_width * numpy.sin(rdip)
+    rup_proj_width = rup_width * numpy.cos(rdip)
+    hheight = rup_proj_height / 2.
+    vshift = src.upper_seismogenic_depth - depths + hheight
+    vshift_low = src.lower_seismogenic_depth - depths - hheight
+    vshift = numpy.where(
+        vshift < 0, numpy.where(vshift_low > 0, 0, vshift_low), vshift)
+    shifted = vshift != 0
+    hshift = numpy.abs(vshift / numpy.tan(rdip))
+    clons, clats = geodetic.point_at(
+        lon, lat, numpy.where(vshift < 0, azimuth_up, azimuth_down),
+        numpy.where(shifted, hshift, 0))
+    clons = numpy.where(shifted, clons, lon)
+    clats = numpy.where(shifted, clats, lat)
+    cdepths = numpy.where(shifted, depths + vshift, depths)
+    theta = numpy.degrees(
+        numpy.arctan((rup_proj_width / 2.) / (rup_length / 2.)))
+    hor_dist = numpy.sqrt(
+        (rup_length / 2.) ** 2 + (rup_proj_width / 2.) ** 2)
+    # azimuths of the corners top_left, top_right, bottom_left, bottom_right
+    azimuths = numpy.stack(numpy.broadcast_arrays(
+        (strike + 180 + theta) % 360, (strike - theta) % 360,
+        (strike + 180 - theta) % 360, (strike + theta) % 360), axis=-1)
+    corners = planes['corners']  # shape (M, N, D, 3, 4)
+    corners[..., 0, :], corners[..., 1, :] = geodetic.point_at(
+        clons[..., None], clats[..., None], azimuths, hor_dist[..., None])
+    top = cdepths + (-rup_proj_height / 2.)
+    bottom = cdepths + rup_proj_height / 2.
+    corners[..., 2, :] = numpy.stack(
+        numpy.broadcast_arrays(top, top, bottom, bottom), axis=-1)
+    hypo = planes['hypo']
+    hypo[..., 0] = lon
+    hypo[..., 1] = lat
+    hypo[..., 2] = depths
+    center = planes['center']
+    center[..., 0] = clons
+    center[..., 1] = clats
+    center[..., 2] = cdepths
+    return planes
+
+
+def gen_planar_ruptures(src, planes, shift_hypo=False):
+    """
+    :param src: a PointSource, AreaSource or MultiPointSource
+    :param planes: an array of dtype planar_dt, see :func:`get_planes`
+    :param shift_hypo: if True, use the rupture center as hypocenter
+    :yields: ParametricProbabilisticRuptures, built on demand
+    """
+    trt = src.tectonic_region_type
+    tom = src.temporal_occurrence_model
+    hypo = 'center' if shift_hypo else 'hypo'
+    for plane in planes.flat:
+        surface = PlanarSurface.from_corners(
+            plane['strike'], plane['dip'], plane['corners'])
+        yield ParametricProbabilisticRupture(
+            plane['mag'], plane['rake'], trt, Point(*plane[hypo]),
+            surface, plane['rate'], tom)
+
+
 class PointSource(ParametricSeismicSource):
     """
     Point source typology represents seismicity on a single geographical
@@ -161,21 +275,15 @@ class PointSource(ParametricSeismicSource):
         and hypocenter depth.
         """
         filtermag = kwargs.get('mag')
-        for mag, mag_occ_rate in self.get_annual_occurrence_rates():
-            if filtermag and mag != filtermag:
-                continue  # yield only ruptures of magnitude filtermag
-            for np_prob, np in self.nodal_plane_distribution.data:
-                for hc_prob, hc_depth in self.hypocenter_distribution.data:
-                    hc = Point(latitude=self.location.latitude,
-                               longitude=self.location.longitude,
-                               depth=hc_depth)
-                    occurrence_rate = mag_occ_rate * np_prob * hc_prob
-                    surface, nhc = self._get_rupture_surface(mag, np, hc)
-                    yield ParametricProbabilisticRupture(
-                        mag, np.rake, self.tectonic_region_type,
-                        nhc if kwargs.get('shift_hypo') else hc,
-                        surface, occurrence_rate,
-                        self.temporal_occurrence_model)
+        # yield only ruptures of magnitude filtermag, if given
+        mag_rates = [(mag, rate)
+                     for mag, rate in self.get_annual_occurrence_rates()
+                     if not filtermag or mag == filtermag]
+        planes = get_planes(
+            self, self.location.longitude, self.location.latitude, mag_rates,
+            self.nodal_plane_distribution.data,
+            self.hypocenter_distribution.data)
+        return gen_planar_ruptures(self, planes, kwargs.get('shift_hypo'))
 
     def point_ruptures(self):
         """
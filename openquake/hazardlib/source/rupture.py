@@ -627,21 +627,58 @@ class ExportedRupture(object):
         self.indices = indices
 
 
-def get_eids(rup_array, samples_by_grp, num_rlzs_by_grp):
+def get_rlz_ids(rup_array, samples, rlzs):
     """
-    :param rup_array: a composite array with fields rup_id, n_occ and grp_id
+    :param rup_array: a composite array with fields serial and n_occ
+    :param samples: number of samples of the source group
+    :param rlzs: array of realization indices of the source group
+    :returns: an array with the realization index of each event, in the
+              same order as :meth:`EBRupture.get_eids_by_rlz`
+    """
+    n_occ = rup_array['n_occ']
+    if samples == 1:  # full enumeration or akin to it
+        # the events of each rupture are assigned to the rlzs in blocks
+        counts = numpy.repeat(n_occ, len(rlzs))
+    else:  # the events are distributed randomly across the rlzs
+        assert len(rlzs) == samples, (len(rlzs), samples)
+        counts = numpy.concatenate([
+            general.random_histogram(n, samples, serial)
+            for n, serial in zip(n_occ, rup_array['serial'])])
+    return numpy.repeat(numpy.tile(rlzs, len(rup_array)), counts)
+
+
+def get_events(rup_array, samples_by_grp, rlzs_by_gsim_grp):
+    """
+    :param rup_array: a composite array with fields serial, n_occ and grp_id
     :param samples_by_grp: a dictionary grp_id -> samples
-    :param num_rlzs_by_grp: a dictionary grp_id -> num_rlzs
+    :param rlzs_by_gsim_grp: a dictionary grp_id -> gsim -> rlzs
+    :returns: an array of events ordered by rup_id, with rup_id
+              the index of the rupture in rup_array
     """
-    all_eids = []
-    for rup in rup_array:
-        grp_id = rup['grp_id']
+    rup_ids = numpy.arange(len(rup_array), dtype=U32)
+    arrays = []
+    for grp_id in numpy.unique(rup_array['grp_id']):
+        rlzs_by_gsim = rlzs_by_gsim_grp.get(grp_id)
+        if not rlzs_by_gsim:  # the model has no sources
+            continue
+        rlzs = numpy.concatenate(list(rlzs_by_gsim.values()))
         samples = samples_by_grp[grp_id]
-        num_rlzs = num_rlzs_by_grp[grp_id]
-        num_events = rup['n_occ'] if samples > 1 else rup['n_occ'] * num_rlzs
-        eids = numpy.arange(num_events, dtype=U32)
-        all_eids.append(eids)
-    return numpy.concatenate(all_eids)
+        ok = rup_array['grp_id'] == grp_id
+        rups = rup_array[ok]
+        nev = rups['n_occ'] * (1 if samples > 1 else len(rlzs))
+        events = numpy.zeros(nev.sum(), events_dt)
+        events['rup_id'] = numpy.repeat(rup_ids[ok], nev)
+        events['rlz_id'] = get_rlz_ids(rups, samples, rlzs)
+        arrays.append(events)
+    if not arrays:
+        return numpy.zeros(0, events_dt)
+    events = numpy.concatenate(arrays)
+    # NB: the sort is stable, so the events of a rupture keep their order
+    events = events[numpy.argsort(events['rup_id'], kind='stable')]
+    if len(events) >= TWO32:
+        raise ValueError('There are more than %d events!' % len(events))
+    events['id'] = numpy.arange(len(events))
+    return events
 
 
 class EBRupture(object):
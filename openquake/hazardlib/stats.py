@@ -63,14 +63,22 @@ def quantile_curve(quantile, curves, weights=None):
     else:
         weights = numpy.array(weights)
         assert len(weights) == R, (len(weights), R)
-    result = numpy.zeros(curves.shape[1:])
-    for idx, _ in numpy.ndenumerate(result):
-        data = numpy.array([a[idx] for a in curves])
-        sorted_idxs = numpy.argsort(data)
-        cum_weights = numpy.cumsum(weights[sorted_idxs])
-        # get the quantile from the interpolated CDF
-        result[idx] = numpy.interp(quantile, cum_weights, data[sorted_idxs])
-    return result
+    # sort all the curves along the realization axis at once
+    sorted_idxs = numpy.argsort(curves, axis=0)
+    data = numpy.take_along_axis(curves, sorted_idxs, axis=0)
+    cum_weights = numpy.cumsum(weights[sorted_idxs], axis=0)
+    # get the quantile from the interpolated CDF, like numpy.interp would do
+    # on each element: k is the number of cumulative weights <= quantile
+    k = (cum_weights <= quantile).sum(axis=0)
+    lo = numpy.clip(k - 1, 0, R - 1)[None]
+    hi = numpy.clip(k, 0, R - 1)[None]
+    x0 = numpy.take_along_axis(cum_weights, lo, axis=0)[0]
+    x1 = numpy.take_along_axis(cum_weights, hi, axis=0)[0]
+    y0 = numpy.take_along_axis(data, lo, axis=0)[0]
+    y1 = numpy.take_along_axis(data, hi, axis=0)[0]
+    dx = numpy.where(x1 > x0, x1 - x0, 1.)
+    result = numpy.where(x1 > x0, y0 + (quantile - x0) * (y1 - y0) / dx, y0)
+    return numpy.array(result, float)
 
 
 def max_curve(values, weights=None):
@@ -19,7 +19,16 @@
 import unittest
 import numpy
 from openquake.hazardlib.tom import PoissonTOM
-from openquake.hazardlib.contexts import Effect, RuptureContext, _collapse
+from openquake.hazardlib.contexts import (
+    Effect, RuptureContext, ContextMaker, _collapse, get_distances)
+from openquake.hazardlib.calc.filters import IntegrationDistance
+from openquake.hazardlib.source import PointSource
+from openquake.hazardlib.mfd import TruncatedGRMFD
+from openquake.hazardlib.scalerel import WC1994
+from openquake.hazardlib.geo import Point, NodalPlane
+from openquake.hazardlib.pmf import PMF
+from openquake.hazardlib.site import Site, SiteCollection
+from openquake.hazardlib.gsim.abrahamson_2014 import AbrahamsonEtAl2014
 
 aac = numpy.testing.assert_allclose
 dists = numpy.array([0, 10, 20, 30, 40, 50])
@@ -83,3 +92,30 @@ class CollapseTestCase(unittest.TestCase):
             c1, pnes1 = compose(ctxs, poe)
             c2, pnes2 = compose(_collapse(ctxs), poe)
             aac(c1, c2)  # the same
+
+
+class PlanarDistancesTestCase(unittest.TestCase):
+    def test_make_ctxs(self):
+        # the distances of the planar ruptures computed all together
+        # are the same as the ones computed rupture by rupture
+        trt = 'Active Shallow Crust'
+        src = PointSource(
+            'P', 'point', trt, TruncatedGRMFD(5., 7., .5, 4., 1.),
+            2., WC1994(), 1., PoissonTOM(50.), 0., 20., Point(0., 0.),
+            PMF([(.5, NodalPlane(0., 90., 0.)),
+                 (.5, NodalPlane(45., 50., 90.))]),
+            PMF([(1., 10.)]))
+        sites = SiteCollection(
+            [Site(Point(lon, lat), 760., 100., 5., vs30measured=True)
+             for lon, lat in [(0., .1), (.2, -.1), (-.3, .05)]])
+        cmaker = ContextMaker(trt, [AbrahamsonEtAl2014()], dict(
+            maximum_distance=IntegrationDistance({'default': 200})))
+        self.assertEqual(cmaker.REQUIRES_DISTANCES,
+                         {'rrup', 'rjb', 'rx', 'ry0'})
+        rups = list(src.iter_ruptures())
+        ctxs = cmaker.make_ctxs(rups, sites, [0], filt=False)
+        self.assertEqual(len(ctxs), len(rups))
+        for rup, ctx in zip(rups, ctxs):
+            for par in cmaker.REQUIRES_DISTANCES:
+                numpy.testing.assert_equal(
+                    getattr(ctx, par), get_distances(rup, sites, par))
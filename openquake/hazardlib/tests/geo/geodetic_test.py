@@ -198,6 +198,21 @@ class MinDistanceToSegmentTest(unittest.TestCase):
                           lons=numpy.array([-2.0]),
                           lats=numpy.array([0.5]))
 
+    def test_polyline(self):
+        # compare with the distances from each segment of a polyline
+        seglons = numpy.linspace(-1, 1, 21)
+        seglats = numpy.sin(seglons * 3) / 2
+        rng = numpy.random.RandomState(42)
+        lons = rng.uniform(-3, 3, 1000)
+        lats = rng.uniform(-3, 3, 1000)
+        dists = numpy.array([
+            geodetic.min_distance_to_segment(
+                seglons[i:i + 2], seglats[i:i + 2], lons, lats)
+            for i in range(20)])
+        expected = dists[abs(dists).argmin(axis=0), numpy.arange(1000)]
+        numpy.testing.assert_equal(geodetic.min_distance_to_segments(
+            seglons, seglats, lons, lats), expected)
+
 
 class DistanceToSemiArcTest(unittest.TestCase):
     # values in this test are based on the tests used for the
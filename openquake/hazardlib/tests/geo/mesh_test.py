@@ -17,6 +17,7 @@ import unittest
 import math
 
 import numpy
+from scipy.spatial.distance import cdist
 
 from openquake.hazardlib.geo.point import Point
 from openquake.hazardlib.geo.polygon import Polygon
@@ -256,6 +257,16 @@ class MeshGetMinDistanceTestCase(unittest.TestCase):
         self._test(mesh, target_mesh,
                    expected_distance_indices=[3, 3, 3, 0, 0, 3, 3, 3, 3])
 
+    def test_many_points(self):
+        # compare the KD-tree search with the full distance matrix
+        rng = numpy.random.RandomState(42)
+        mesh = Mesh(rng.uniform(0, 1, (20, 30)), rng.uniform(0, 1, (20, 30)),
+                    rng.uniform(0, 30, (20, 30)))
+        target_mesh = Mesh(rng.uniform(-1, 2, 1000), rng.uniform(-1, 2, 1000))
+        dmatrix = cdist(mesh.xyz, target_mesh.xyz)
+        self._test(mesh, target_mesh, dmatrix.argmin(axis=0))
+        aac(mesh.get_min_distance(target_mesh), dmatrix.min(axis=0))
+
 
 class MeshGetDistanceMatrixTestCase(unittest.TestCase):
     def test_zeroes(self):
@@ -19,7 +19,8 @@ import numpy
 from openquake.hazardlib.geo import Point
 from openquake.hazardlib.geo.mesh import Mesh
 from openquake.hazardlib.geo import utils as geo_utils
-from openquake.hazardlib.geo.surface.planar import PlanarSurface
+from openquake.hazardlib.geo.surface.planar import (
+    PlanarSurface, build_planar_array, get_distances_planar)
 from openquake.hazardlib.tests.geo.surface import _planar_test_data as tdata
 
 aac = numpy.testing.assert_allclose
@@ -523,3 +524,26 @@ class PlanarSurfaceGetMiddlePointTestCase(unittest.TestCase):
         aac(midpoint.longitude, 0.0, atol=1E-4)
         aac(midpoint.latitude, 0.044966, atol=1E-4)
         aac(midpoint.depth, -4.0, atol=1E-4)
+
+
+class PlanarSurfaceBatchedDistancesTestCase(unittest.TestCase):
+    def test(self):
+        surfaces = [PlanarSurface(strike, 3, *corners) for strike, corners in [
+            (2, tdata.TEST_7_RUPTURE_1_CORNERS),
+            (2, tdata.TEST_7_RUPTURE_2_CORNERS),
+            (45, tdata.TEST_7_RUPTURE_6_CORNERS),
+            (0, tdata.TEST_7_RUPTURE_9_CORNERS)]]
+        planes = build_planar_array(surfaces)
+        rng = numpy.random.RandomState(42)
+        mesh = Mesh(rng.uniform(-.5, .5, (5, 4)), rng.uniform(-.5, .5, (5, 4)))
+        methods = dict(rrup='get_min_distance',
+                       rjb='get_joyner_boore_distance',
+                       rx='get_rx_distance', ry0='get_ry0_distance')
+        for param, method in methods.items():
+            expected = [getattr(surface, method)(mesh).flatten()
+                        for surface in surfaces]
+            # use chunks of 2 planes
+            dists = get_distances_planar(planes, mesh, param, chunksize=40)
+            numpy.testing.assert_equal(dists, expected)
+        with self.assertRaises(ValueError):
+            get_distances_planar(planes, mesh, 'rhypo')
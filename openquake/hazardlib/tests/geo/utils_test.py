@@ -21,6 +21,7 @@ import shapely.geometry
 
 from openquake.hazardlib import geo
 from openquake.hazardlib.geo import utils
+from openquake.hazardlib.site import SiteCollection
 
 Point = collections.namedtuple("Point",  'lon lat')
 aac = numpy.testing.assert_allclose
@@ -390,6 +391,21 @@ class ConvexToPointDistanceTestCase(unittest.TestCase):
             dist = utils.point_to_polygon_distance(polygon, pxx, pyy)
             numpy.testing.assert_almost_equal(dist, [0.5, 1, 2])
 
+    def test_holes_and_multipolygons(self):
+        # compare with shapely
+        square = shapely.geometry.box(0, 0, 4, 4)
+        polygons = [square.difference(shapely.geometry.box(1, 1, 2, 3)),
+                    shapely.geometry.MultiPolygon(
+                        [self.polygon, shapely.geometry.box(2, 2, 3, 3)])]
+        rng = numpy.random.RandomState(42)
+        pxx = rng.uniform(-1, 5, 1000)
+        pyy = rng.uniform(-1, 5, 1000)
+        for polygon in polygons:
+            dist = utils.point_to_polygon_distance(polygon, pxx, pyy)
+            expected = [polygon.distance(shapely.geometry.Point(x, y))
+                        for x, y in zip(pxx, pyy)]
+            numpy.testing.assert_allclose(dist, expected, atol=1E-12)
+
 
 class PlaneFit(unittest.TestCase):
     """
@@ -438,4 +454,47 @@ class PlaneFit(unittest.TestCase):
         self.assertAlmostEqual(self.c[-1], -sum(par*pnt), 2)
 
 
-# NB: utils.assoc is tested in the engine
+class WithinTestCase(unittest.TestCase):
+    def test(self):
+        # a square with a hole; the points on the boundaries are outside
+        region = shapely.geometry.Polygon(
+            [(0, 0), (4, 0), (4, 4), (0, 4)], [[(1, 1), (2, 1), (2, 2)]])
+        xs = [2, 0, 4, 1.9, 1.5, 3, 5, -1]
+        ys = [3, 2, 2, 1.1, 1.0, 1, 1, 1]
+        expected = [shapely.geometry.Point(x, y).within(region)
+                    for x, y in zip(xs, ys)]
+        mask = utils.within(region, xs, ys)
+        numpy.testing.assert_equal(
+            mask, [True, False, False, False, False, True, False, False])
+        numpy.testing.assert_equal(mask, expected)
+
+
+class AssocTestCase(unittest.TestCase):
+    def setUp(self):
+        self.sitecol = SiteCollection.from_points([0., 1., 2.], [0., 0., 0.])
+
+    def test_site_model(self):
+        sm = numpy.array([(2.01, 0., 760.), (0.01, 0., 180.)],
+                         [('lon', float), ('lat', float), ('vs30', float)])
+        sitecol, objs, discarded = utils.assoc(sm, self.sitecol, 5, 'filter')
+        numpy.testing.assert_equal(sitecol.sids, [0, 2])
+        numpy.testing.assert_equal(objs['vs30'], [180., 760.])
+        self.assertEqual(discarded[0]['vs30'], 180.)
+        with self.assertRaises(utils.SiteAssociationError):
+            utils.assoc(sm, self.sitecol, 5, 'strict')
+
+    def test_assets(self):
+        assets = numpy.array(
+            [('a', 2.01, 0., 3), ('b', 5., 0., 0), ('c', 1.99, 0., 1),
+             ('d', 0.01, 0., 2), ('e', 2., 0., 0)],
+            [('asset_ref', object), ('lon', float), ('lat', float),
+             ('ordinal', numpy.uint32)])
+        sitecol, aids_by_site, discarded = utils.assoc(
+            assets, self.sitecol, 5, 'filter')
+        numpy.testing.assert_equal(sitecol.sids, [0, 2])
+        # the assets of each site are sorted by ordinal
+        numpy.testing.assert_equal(aids_by_site[0], [3])
+        numpy.testing.assert_equal(aids_by_site[1], [4, 2, 0])
+        numpy.testing.assert_equal(discarded['asset_ref'], ['b'])
+        with self.assertRaises(utils.SiteAssociationError):
+            utils.assoc(assets, self.sitecol, 5, 'strict')
@@ -134,3 +134,28 @@ class CollapseTestCase(unittest.TestCase):
         ax.loglog(self.imtls['PGA'], mean, label='mean')
         ax.loglog(self.imtls['PGA'], coll, label='coll')
         plt.show()
+
+
+class ApplyUncertaintiesTestCase(unittest.TestCase):
+    def test_variants(self):
+        # the modified sources share the geometry with the original source
+        # and the original source is left untouched
+        bs0 = lt.BranchSet('maxMagGRAbsolute')
+        bs0.branches = [lt.Branch('bs0', 'b01', .5, 7.5),
+                        lt.Branch('bs0', 'b02', .5, 7.6)]
+        sg = sourceconverter.SourceGroup(ps.tectonic_region_type, [ps])
+        [src] = lt.apply_uncertainties([(bs0, 7.5)], sg)
+        self.assertEqual(src.mfd.max_mag, 7.5)
+        self.assertEqual(ps.mfd.max_mag, 7)
+        self.assertIs(src.location, ps.location)
+        self.assertIs(src.nodal_plane_distribution,
+                      ps.nodal_plane_distribution)
+
+        # collapsed branchset, one variant per branch
+        bs0.collapsed = True
+        srcs = lt.apply_uncertainties([(bs0, None)], sg)
+        self.assertEqual([s.mfd.max_mag for s in srcs], [7.5, 7.6])
+        self.assertEqual(scaling_rates(srcs), [.5, .5])
+        self.assertEqual(ps.mfd.max_mag, 7)
+        self.assertGreater(max(r.mag for r in srcs[0].iter_ruptures()),
+                           max(r.mag for r in ps.iter_ruptures()))
@@ -4,7 +4,7 @@ import numpy
 from openquake.hazardlib import geo, imt
 from openquake.hazardlib.shakemap import (
     get_shakemap_array, get_sitecol_shakemap, to_gmfs, amplify_ground_shaking,
-    spatial_correlation_array, spatial_covariance_array,
+    amplify_gmfs, spatial_correlation_array, spatial_covariance_array,
     cross_correlation_matrix, cholesky)
 
 aae = numpy.testing.assert_almost_equal
@@ -46,6 +46,19 @@ class ShakemapTestCase(unittest.TestCase):
         res = amplify_ground_shaking(T=0.3, vs30=780, gmvs=gmvs)
         aae(res, [0.09909498, 0.19870543, 0.29922175])
 
+    def test_amplify_gmfs(self):
+        # amplifying all the sites and IMTs at once is the same as
+        # amplifying one site and IMT at the time
+        imts = [imt.PGA(), imt.SA(1.0)]
+        vs30s = numpy.array([180., 400., 760., 1200.])
+        gmfs = numpy.exp(numpy.random.RandomState(42).normal(
+            -2, 1.5, (8, 10)))
+        res = amplify_gmfs(imts, vs30s, gmfs.copy())
+        for m, im in enumerate(imts):
+            for i, vs30 in enumerate(vs30s):
+                aae(res[m * 4 + i], amplify_ground_shaking(
+                    im.period, vs30, gmfs[m * 4 + i].copy()))
+
     def test_matrices(self):
 
         # distance matrix
@@ -72,6 +85,12 @@ class ShakemapTestCase(unittest.TestCase):
         self.assertEqual(L.shape, (36, 36))
         aae(L.sum(), 30.5121263)
 
+        # compare with the decomposition of the full covariance matrix
+        Ls = numpy.linalg.cholesky(scov)
+        cov = numpy.block([[Ls[i] @ Ls[j].T * ccor[i, j] for j in range(4)]
+                           for i in range(4)])
+        aae(L, numpy.linalg.cholesky(cov))
+
         # intensity
         val = numpy.array(
             [(5.38409665, 3.9383686, 3.55435415, 4.37692394)] * 9, imt_dt)
@@ -114,6 +133,30 @@ class ShakemapTestCase(unittest.TestCase):
                     trunclevel=3, num_gmfs=2, seed=42)
         self.assertIn('stddev==0 for IMT=PGA', str(ctx.exception))
 
+    def test_max_dist(self):
+        # 20 x 20 grid with a spacing of ~5.5 km
+        lons, lats = numpy.meshgrid(numpy.arange(20) * .05 + 84,
+                                    numpy.arange(20) * .05 + 26)
+        shakemap = numpy.zeros(400, shakemap_dt)
+        shakemap['lon'] = lons.flatten()
+        shakemap['lat'] = lats.flatten()
+        shakemap['vs30'] = 301.17
+        shakemap['val'] = (5.38409665, 3.9383686, 3.55435415, 4.37692394)
+        shakemap['std'] = (0.5, 0.52, 0.64, 0.73)
+
+        # a single tile gives the same GMFs as the full decomposition
+        _, gmfs = to_gmfs(shakemap, 'yes', 'yes', site_effects=False,
+                          trunclevel=0, num_gmfs=2, seed=42)
+        _, gmfs1 = to_gmfs(shakemap, 'yes', 'yes', site_effects=False,
+                           trunclevel=0, num_gmfs=2, seed=42, max_dist=1000)
+        aae(gmfs, gmfs1)
+
+        # truncating the correlation at 30 km the stddevs are preserved
+        _, gmfs = to_gmfs(shakemap, 'yes', 'yes', site_effects=False,
+                          trunclevel=0, num_gmfs=500, seed=42, max_dist=30)
+        std = numpy.log(gmfs).std(axis=1).mean(axis=0)
+        aae(std, [0.5, 0.52, 0.64, 0.73], decimal=1)
+
     def test_from_files(self):
         # files provided by Vitor Silva, without site amplification
         f1 = os.path.join(CDIR, 'test_shaking.xml')
@@ -250,6 +250,17 @@ class SiteCollectionFilterTestCase(unittest.TestCase):
         self.assertEqual(len(close_sites), 4)
         self.assertIsNone(far_sites)
 
+    def test_geohash(self):
+        # the geohashes of all the sites are computed at once, including
+        # points on the boundaries of the bisected intervals
+        lons = [0., -180., -180., 10., -45., 90., 179.99]
+        lats = [0., -90., 90., 45., -22.5, 0., -0.01]
+        col = SiteCollection.from_points(lons, lats)
+        expected = [b'7zzzzz', b'000000', b'bpbpbp', b'spzpgx', b'6gzzzz',
+                    b'mzzzzz', b'rzzzzy']  # computed site by site
+        numpy.testing.assert_equal(col.geohash(6), expected)
+        self.assertEqual(col.geohash(6).dtype, numpy.dtype('S6'))
+
 
 class WithinBBoxTestCase(unittest.TestCase):
     # to understand this test case it is ESSENTIAL to plot sites and
@@ -14,6 +14,7 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import unittest
+import numpy
 from openquake.hazardlib.const import TRT
 from openquake.hazardlib.source.point import PointSource
 from openquake.hazardlib.source.rupture import ParametricProbabilisticRupture
@@ -408,6 +409,42 @@ class PointSourceIterRupturesTestCase(unittest.TestCase):
         ruptures = list(src.iter_ruptures())
         self.assertEqual(len(ruptures), 1)
 
+    def test_planes(self):
+        # the vectorized planes must be the same as the ones built with
+        # _get_rupture_surface, also when the ruptures are shifted
+        np_dist = PMF([(0.3, NodalPlane(45, 90, 0)),
+                       (0.7, NodalPlane(130, 30, -90))])
+        hc_dist = PMF([(0.2, 2.), (0.5, 8.), (0.3, 19.)])
+        mfd = TruncatedGRMFD(a_val=3, b_val=1, min_mag=4, max_mag=8,
+                             bin_width=.5)
+        src = make_point_source(
+            lon=10, lat=45, mfd=mfd, nodal_plane_distribution=np_dist,
+            hypocenter_distribution=hc_dist, upper_seismogenic_depth=1.,
+            lower_seismogenic_depth=20.,
+            magnitude_scaling_relationship=WC1994())
+        ruptures = list(src.iter_ruptures(shift_hypo=True))
+        self.assertEqual(len(ruptures), src.count_ruptures())
+        i = 0
+        for mag, rate in src.get_annual_occurrence_rates():
+            for np_prob, np in np_dist.data:
+                for hc_prob, depth in hc_dist.data:
+                    hc = Point(10, 45, depth)
+                    surface, nhc = src._get_rupture_surface(mag, np, hc)
+                    rup = ruptures[i]
+                    self.assertEqual(rup.mag, mag)
+                    self.assertEqual(rup.rake, np.rake)
+                    self.assertEqual(rup.occurrence_rate,
+                                     rate * np_prob * hc_prob)
+                    self.assertEqual(rup.hypocenter, nhc)
+                    for attr in ('corner_lons', 'corner_lats',
+                                 'corner_depths', 'normal', 'uv1', 'uv2'):
+                        numpy.testing.assert_equal(
+                            getattr(rup.surface, attr),
+                            getattr(surface, attr))
+                    self.assertEqual(rup.surface.width, surface.width)
+                    self.assertEqual(rup.surface.length, surface.length)
+                    i += 1
+
 
 class PointSourceMaxRupProjRadiusTestCase(unittest.TestCase):
     def test(self):
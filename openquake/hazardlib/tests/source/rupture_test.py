@@ -14,6 +14,7 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import unittest
+from unittest import mock
 import numpy
 import os
 from openquake.hazardlib import const
@@ -21,7 +22,8 @@ from openquake.hazardlib.geo import Point, Line
 from openquake.hazardlib.geo.surface.planar import PlanarSurface
 from openquake.hazardlib.tom import PoissonTOM
 from openquake.hazardlib.source.rupture import BaseRupture, \
-    ParametricProbabilisticRupture, NonParametricProbabilisticRupture
+    ParametricProbabilisticRupture, NonParametricProbabilisticRupture, \
+    EBRupture, get_rlz_ids, get_events
 from openquake.hazardlib.pmf import PMF
 from openquake.hazardlib.geo.mesh import Mesh
 from openquake.hazardlib.geo.surface.simple_fault import SimpleFaultSurface
@@ -260,3 +262,51 @@ class NonParametricProbabilisticRuptureTestCase(unittest.TestCase):
         self.assertAlmostEqual(p_occs_0, 0.7, places=2)
         self.assertAlmostEqual(p_occs_1, 0.2, places=2)
         self.assertAlmostEqual(p_occs_2, 0.1, places=2)
+
+
+def _rlz_ids(rups, samples, rlzs_by_gsim):
+    # realization of each event computed rupture by rupture
+    rlz_ids = []
+    for rup in rups:
+        ebr = EBRupture(mock.Mock(rup_id=rup['serial']), 'src',
+                        rup['grp_id'], rup['n_occ'], samples)
+        for rlz, eids in ebr.get_eids_by_rlz(rlzs_by_gsim).items():
+            rlz_ids.extend([rlz] * len(eids))
+    return rlz_ids
+
+
+class GetEventsTestCase(unittest.TestCase):
+    rup_dt = numpy.dtype([('serial', numpy.uint32), ('n_occ', numpy.uint32),
+                          ('grp_id', numpy.uint16)])
+    # group 0 with full enumeration, group 1 with 3 samples
+    samples_by_grp = {0: 1, 1: 3}
+    rlzs_by_gsim_grp = {0: {'gsim1': numpy.array([0, 1]),
+                            'gsim2': numpy.array([2])},
+                        1: {'gsim1': numpy.array([0, 2]),
+                            'gsim2': numpy.array([1])}}
+    rups = numpy.array([(10, 2, 1), (11, 3, 0), (12, 5, 1), (13, 1, 0)],
+                       rup_dt)
+
+    def test_get_rlz_ids(self):
+        for grp_id, samples in self.samples_by_grp.items():
+            rups = self.rups[self.rups['grp_id'] == grp_id]
+            rlzs_by_gsim = self.rlzs_by_gsim_grp[grp_id]
+            rlzs = numpy.concatenate(list(rlzs_by_gsim.values()))
+            numpy.testing.assert_equal(
+                get_rlz_ids(rups, samples, rlzs),
+                _rlz_ids(rups, samples, rlzs_by_gsim))
+
+    def test_get_events(self):
+        events = get_events(
+            self.rups, self.samples_by_grp, self.rlzs_by_gsim_grp)
+        # 3 events per rupture of group 0, n_occ events for group 1
+        self.assertEqual(len(events), 2 + 3 * 3 + 5 + 1 * 3)
+        numpy.testing.assert_equal(events['id'], numpy.arange(len(events)))
+        numpy.testing.assert_equal(
+            events['rup_id'], numpy.repeat([0, 1, 2, 3], [2, 9, 5, 3]))
+        for rup_id, rup in enumerate(self.rups):
+            grp_id = rup['grp_id']
+            expected = _rlz_ids(rup[None], self.samples_by_grp[grp_id],
+                                self.rlzs_by_gsim_grp[grp_id])
+            got = events['rlz_id'][events['rup_id'] == rup_id]
+            numpy.testing.assert_equal(got, expected)
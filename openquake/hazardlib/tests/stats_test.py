@@ -124,3 +124,21 @@ class QuantileCurveTestCase(unittest.TestCase):
         actual_curve = quantile_curve(quantile, curves, weights)
 
         numpy.testing.assert_allclose(expected_curve, actual_curve)
+
+    def test_compute_quantile_curves_block(self):
+        # the quantile of a block of curves of shape (R, A, C) is the same
+        # as the one computed curve by curve
+        curves = numpy.random.RandomState(42).random_sample((5, 3, 4))
+        weights = [0.1, 0.2, 0.3, 0.15, 0.25]
+        for quantile in (0., 0.15, 0.5, 0.85, 1.):
+            actual = quantile_curve(quantile, curves, weights)
+            self.assertEqual(actual.shape, (3, 4))
+            for a in range(3):
+                numpy.testing.assert_allclose(
+                    actual[a], quantile_curve(quantile, curves[:, a], weights))
+                for c in range(4):
+                    data = numpy.sort(curves[:, a, c])
+                    cum = numpy.cumsum(numpy.array(weights)[
+                        numpy.argsort(curves[:, a, c])])
+                    self.assertAlmostEqual(
+                        actual[a, c], numpy.interp(quantile, cum, data))
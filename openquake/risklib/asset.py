@@ -21,7 +21,7 @@ import logging
 import csv
 import os
 import numpy
-from shapely import wkt, geometry
+from shapely import wkt
 
 from openquake.baselib import hdf5, general
 from openquake.baselib.node import Node, context
@@ -847,15 +847,15 @@ class Exposure(object):
         if tagcol:
             exposure.tagcol = tagcol
         if assetnodes:
-            array = assets2array(
+            arrays = [assets2array(
                 assetnodes, exposure._csv_header(),
                 exposure.retrofitted or calculation_mode == 'classical_bcr',
-                ignore_missing_costs)
+                ignore_missing_costs)]
         else:
-            array = exposure._read_csv()
+            arrays = exposure._read_csv()
         param['relevant_cost_types'] = set(exposure.cost_types['name']) - set(
             ['occupants'])
-        exposure._populate_from(array, param, check_dupl)
+        exposure._populate_from(arrays, param, check_dupl)
         if param['region'] and param['out_of_region']:
             logging.info('Discarded %d assets outside the region',
                          param['out_of_region'])
@@ -900,7 +900,7 @@ class Exposure(object):
 
     def _read_csv(self):
         """
-        :yields: asset nodes
+        :yields: asset arrays, one per CSV file
         """
         expected_header = set(self._csv_header('', ''))
         for fname in self.datafiles:
@@ -930,18 +930,28 @@ class Exposure(object):
             array = hdf5.read_csv(fname, conv, rename).array
             array['lon'] = numpy.round(array['lon'], 5)
             array['lat'] = numpy.round(array['lat'], 5)
-            yield from array
+            yield array
 
-    def _populate_from(self, asset_array, param, check_dupl):
+    def _populate_from(self, asset_arrays, param, check_dupl):
         asset_refs = set()
-        for idx, asset in enumerate(asset_array):
-            asset_id = asset['id']
-            # check_dupl is False only in oq prepare_site_model since
-            # in that case we are only interested in the asset locations
-            if check_dupl and asset_id in asset_refs:
-                raise nrml.DuplicatedID(asset_id)
-            asset_refs.add(param['asset_prefix'] + asset_id)
-            self._add_asset(idx, asset, param)
+        idx = 0
+        for asset_array in asset_arrays:
+            if param['region']:
+                inside = geo.utils.within(
+                    param['region'], asset_array['lon'], asset_array['lat'])
+                param['out_of_region'] += int((~inside).sum())
+            else:
+                inside = numpy.ones(len(asset_array), bool)
+            for asset, ok in zip(asset_array, inside):
+                asset_id = asset['id']
+                # check_dupl is False only in oq prepare_site_model since
+                # in that case we are only interested in the asset locations
+                if check_dupl and asset_id in asset_refs:
+                    raise nrml.DuplicatedID(asset_id)
+                asset_refs.add(param['asset_prefix'] + asset_id)
+                if ok:
+                    self._add_asset(idx, asset, param)
+                idx += 1
 
     def _add_asset(self, idx, asset, param):
         values = {}
@@ -956,10 +966,6 @@ class Exposure(object):
         taxonomy = asset['taxonomy']
         number = asset['number']
         location = asset['lon'], asset['lat']
-        if param['region'] and not geometry.Point(*location).within(
-                param['region']):
-            param['out_of_region'] += 1
-            return
         dic = {tagname: asset[tagname] for tagname in self.tagcol.tagnames
                if tagname not in ('country', 'exposure') and
                asset[tagname] != '?'}
@@ -1009,6 +1015,16 @@ class Exposure(object):
             assets_by_loc[lonlat] for lonlat in zip(mesh.lons, mesh.lats)]
         return mesh, assets_by_site
 
+    def get_asset_array(self):
+        """
+        :returns: an array with fields asset_ref, lon, lat, ordinal and a
+                  record for each asset, in the order of .assets
+        """
+        asset_dt = numpy.dtype([('asset_ref', hdf5.vstr), ('lon', float),
+                                ('lat', float), ('ordinal', U32)])
+        return numpy.array([(a.asset_id,) + tuple(a.location) + (a.ordinal,)
+                            for a in self.assets], asset_dt)
+
     def __iter__(self):
         return iter(self.assets)
 
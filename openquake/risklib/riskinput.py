@@ -49,6 +49,42 @@ def get_assets_by_taxo(assets, tempname=None):
     return assets_by_taxo
 
 
+def gen_assets_by_taxo(assets, tempname=None):
+    """
+    Group the assets of a block of sites by site and taxonomy with a
+    single sort, reading the epsilons of the whole block at once.
+
+    :param assets: an array of assets on one or more sites
+    :param tempname: hdf5 file where the epsilons are (or None)
+    :yields: pairs (sid, assets_by_taxo) for each site
+    """
+    assets = assets[numpy.lexsort(
+        (assets['ordinal'], assets['taxonomy'], assets['site_id']))]
+    if tempname is None:  # no epsilons
+        eps = None
+    else:
+        ordinals = numpy.sort(assets['ordinal'])
+        with hdf5.File(tempname, 'r') as h5:
+            epsilons = h5['epsilon_matrix'][ordinals]
+        eps = epsilons[numpy.searchsorted(ordinals, assets['ordinal'])]
+    sids, sstarts = numpy.unique(assets['site_id'], return_index=True)
+    sstops = numpy.append(sstarts[1:], len(assets))
+    for sid, s0, s1 in zip(sids, sstarts, sstops):
+        site_assets = assets[s0:s1]  # sorted by taxonomy
+        taxos, tstarts = numpy.unique(
+            site_assets['taxonomy'], return_index=True)
+        tstops = numpy.append(tstarts[1:], len(site_assets))
+        assets_by_taxo = AccumDict()
+        assets_by_taxo.eps = {}
+        for taxo, t0, t1 in zip(taxos, tstarts, tstops):
+            assets_by_taxo[taxo] = site_assets[t0:t1]
+            if eps is not None:
+                assets_by_taxo.eps[taxo] = eps[s0 + t0:s0 + t1]
+        assets_by_taxo.idxs = numpy.argsort(site_assets['ordinal'])
+        assets_by_taxo.assets = site_assets[assets_by_taxo.idxs]
+        yield sid, assets_by_taxo
+
+
 def get_output(crmodel, assets_by_taxo, haz, rlzi=None):
     """
     :param assets_by_taxo: a dictionary taxonomy index -> assets on a site
@@ -109,53 +145,53 @@ def get_output(crmodel, assets_by_taxo, haz, rlzi=None):
 class RiskInput(object):
     """
     Contains all the assets and hazard values associated to a given
-    imt and site.
+    block of sites.
 
     :param hazard_getter:
-        a callable returning the hazard data for a given realization
-    :param assets_by_site:
-        array of assets, one per site
+        a callable returning the hazard data for the sites in the block
+    :param assets:
+        array of assets on the sites of the block
     """
-    def __init__(self, sid, hazard_getter, assets):
-        self.sid = sid
+    def __init__(self, hazard_getter, assets):
         self.hazard_getter = hazard_getter
         self.assets = assets
         self.weight = len(assets)
-        aids = []
-        for asset in self.assets:
-            aids.append(asset['ordinal'])
-        self.aids = numpy.array(aids, numpy.uint32)
+        self.aids = numpy.array(assets['ordinal'], numpy.uint32)
+
+    @property
+    def sids(self):
+        return self.hazard_getter.sids
 
     def gen_outputs(self, cr_model, monitor, tempname=None, haz=None):
         """
-        Group the assets per taxonomy and compute the outputs by using the
-        underlying riskmodels. Yield one output per realization.
+        Group the assets per site and taxonomy and compute the outputs by
+        using the underlying riskmodels. Yield one output per site and
+        realization; the assets of the output are in `out.assets`.
 
         :param cr_model: a CompositeRiskModel instance
         :param monitor: a monitor object used to measure the performance
         """
         self.monitor = monitor
-        hazard_getter = self.hazard_getter
-        [sid] = hazard_getter.sids
         if haz is None:
-            haz = hazard_getter.get_hazard()
-        if isinstance(haz, dict):
-            items = haz.items()
-        else:  # list of length R
-            items = enumerate(haz)
+            haz = self.hazard_getter.get_hazard()
         with monitor('computing risk', measuremem=False):
             # this approach is slow for event_based_risk since a lot of
             # small arrays are passed (one per realization) instead of
             # a long array with all realizations; ebrisk does the right
             # thing since it calls get_output directly
-            assets_by_taxo = get_assets_by_taxo(self.assets, tempname)
-            for rlzi, haz_by_rlzi in items:
-                out = get_output(cr_model, assets_by_taxo, haz_by_rlzi, rlzi)
-                yield out
+            for sid, assets_by_taxo in gen_assets_by_taxo(
+                    self.assets, tempname):
+                if isinstance(haz[sid], dict):
+                    items = haz[sid].items()
+                else:  # list of length R
+                    items = enumerate(haz[sid])
+                for rlzi, haz_by_rlzi in items:
+                    yield get_output(
+                        cr_model, assets_by_taxo, haz_by_rlzi, rlzi)
 
     def __repr__(self):
-        return '<%s sid=%s, %d asset(s)>' % (
-            self.__class__.__name__, self.sid, len(self.aids))
+        return '<%s sids=%s, %d asset(s)>' % (
+            self.__class__.__name__, self.sids, len(self.aids))
 
 
 # used in scenario_risk
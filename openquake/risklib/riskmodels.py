@@ -249,7 +249,8 @@ class RiskModel(object):
             assets is an iterator over A
             :class:`openquake.risklib.scientific.Asset` instances
         :param hazard_curve:
-            an array of poes
+            an array of poes, or an array of shape (A, I) with the
+            hazard curves of the sites of the assets
         :param eids:
             ignored, here only for API compatibility with other calculators
         :param eps:
@@ -262,8 +263,9 @@ class RiskModel(object):
         lratios = self.loss_ratios[loss_type]
         imls = self.hazard_imtls[vf.imt]
         values = get_values(loss_type, assets)
-        lrcurves = numpy.array(
-            [scientific.classical(vf, imls, hazard_curve, lratios)] * n)
+        # shape (2, C) or (A, 2, C), computed with a single matrix product
+        lrcurves = scientific.classical(vf, imls, hazard_curve, lratios)
+        lrcurves = numpy.broadcast_to(lrcurves, (n,) + lrcurves.shape[-2:])
         return rescale(lrcurves, values)
 
     def event_based_risk(self, loss_type, assets, gmvs, eids, epsilons):
@@ -289,13 +291,10 @@ class RiskModel(object):
         elif self.ignore_covs or covs.sum() == 0 or len(epsilons) == 0:
             # the ratios are equal for all assets
             ratios = vf.sample(means, covs, idxs, None)  # right shape
-            for a in range(A):
-                loss_ratios[a, idxs] = ratios
+            loss_ratios[:, idxs] = ratios
         else:
-            # take into account the epsilons
-            for a, asset in enumerate(assets):
-                loss_ratios[a, idxs] = vf.sample(
-                    means, covs, idxs, epsilons[a])
+            # take into account the epsilons of all the assets at once
+            loss_ratios[:, idxs] = vf.sample(means, covs, idxs, epsilons)
         return loss_ratios
 
     ebrisk = event_based_risk
@@ -323,14 +322,11 @@ class RiskModel(object):
         curves_retro = functools.partial(
             scientific.classical, vf_retro, imls,
             loss_ratios=self.loss_ratios_retro[loss_type])
-        original_loss_curves = numpy.array([curves_orig(hazard)] * n)
-        retrofitted_loss_curves = numpy.array([curves_retro(hazard)] * n)
-
-        eal_original = numpy.array([scientific.average_loss(lc)
-                                    for lc in original_loss_curves])
-
-        eal_retrofitted = numpy.array([scientific.average_loss(lc)
-                                       for lc in retrofitted_loss_curves])
+        # the loss curves are the same for all the assets
+        eal_original = numpy.full(
+            n, scientific.average_loss(curves_orig(hazard)))
+        eal_retrofitted = numpy.full(
+            n, scientific.average_loss(curves_retro(hazard)))
 
         bcr_results = [
             scientific.bcr(
@@ -365,12 +361,11 @@ class RiskModel(object):
         means, covs, idxs = vf.interpolate(gmvs)
         loss_ratio_matrix = numpy.zeros((len(assets), E))
         if len(epsilons):
-            for a, eps in enumerate(epsilons):
-                loss_ratio_matrix[a, idxs] = vf.sample(means, covs, idxs, eps)
+            loss_ratio_matrix[:, idxs] = vf.sample(
+                means, covs, idxs, numpy.array(epsilons))
         else:
             ratios = vf.sample(means, covs, idxs, numpy.zeros(len(means), F32))
-            for a in range(len(assets)):
-                loss_ratio_matrix[a, idxs] = ratios
+            loss_ratio_matrix[:, idxs] = ratios
         loss_matrix[:, :] = (loss_ratio_matrix.T * values).T
         return loss_matrix
 
@@ -547,10 +542,10 @@ class CompositeRiskModel(collections.abc.Mapping):
 
     def compute_csq(self, asset, fractions, loss_type):
         """
-        :param asset: asset record
-        :param fractions: array of probabilies of shape (E, D)
+        :param asset: asset record or array of A asset records
+        :param fractions: array of probabilies of shape (E, D) or (A, E, D)
         :param loss_type: loss type as a string
-        :returns: a dict consequence_name -> array of length E
+        :returns: a dict consequence_name -> array of shape E or (A, E)
         """
         csq = {}  # cname -> values per event
         for byname, coeffs in self.cons_model.items():
@@ -558,7 +553,7 @@ class CompositeRiskModel(collections.abc.Mapping):
                 cname, tagname = byname.split('_by_')
                 func = scientific.consequence[cname]
                 coeffs = coeffs[asset[tagname] - 1][loss_type]
-                csq[cname] = func(coeffs, asset, fractions[:, 1:], loss_type)
+                csq[cname] = func(coeffs, asset, fractions[..., 1:], loss_type)
         return csq
 
     def init(self, oqparam):
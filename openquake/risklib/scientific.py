@@ -76,6 +76,17 @@ def fine_graining(points, steps):
 #
 
 
+def _broadcast(ratios, epsilons):
+    # the random generator is reseeded by .set_distribution, so the
+    # samples which do not depend on the epsilons are the same for all
+    # the assets; those depending on a matrix of epsilons have already
+    # the right shape
+    if epsilons is not None and numpy.ndim(epsilons) == 2:
+        return numpy.broadcast_to(ratios, (len(epsilons), numpy.shape(
+            ratios)[-1]))
+    return ratios
+
+
 class VulnerabilityFunction(object):
     dtype = numpy.dtype([('iml', F64), ('loss_ratio', F64), ('cov', F64)])
     seed = None  # to be overridden
@@ -181,15 +192,15 @@ class VulnerabilityFunction(object):
         :param idxs:
            array of E booleans with E >= E'
         :param epsilons:
-           array of E floats (or None)
+           array of E floats, or matrix of (A, E) floats, or None
         :returns:
-           array of E' loss ratios
+           array of E' loss ratios, or matrix of (A, E') loss ratios
         """
         if self.distribution_name == 'LN' and epsilons is None:
             return means
         self.set_distribution(epsilons)
         res = self.distribution.sample(means, covs, means * covs, idxs)
-        return res
+        return _broadcast(res, epsilons)
 
     # this is used in the tests, not in the engine code base
     def __call__(self, gmvs, epsilons):
@@ -295,13 +306,9 @@ class VulnerabilityFunction(object):
         """
         # LREM has number of rows equal to the number of loss ratios
         # and number of columns equal to the number of imls
-        lrem = numpy.empty((len(loss_ratios), len(self.imls)))
-        for row, loss_ratio in enumerate(loss_ratios):
-            for col, (mean_loss_ratio, stddev) in enumerate(
-                    zip(self.mean_loss_ratios, self.stddevs)):
-                lrem[row, col] = self.distribution.survival(
-                    loss_ratio, mean_loss_ratio, stddev)
-        return lrem
+        return self.distribution.survival(
+            numpy.array(loss_ratios)[:, None], self.mean_loss_ratios,
+            self.stddevs)
 
     @lru_cache()
     def mean_imls(self):
@@ -427,12 +434,13 @@ class VulnerabilityFunctionWithPMF(VulnerabilityFunction):
         :param idxs:
            array of E booleans with E >= E'
         :param epsilons:
-           array of E floats
+           array of E floats, or matrix of (A, E) floats
         :returns:
-           array of E' probabilities
+           array of E' probabilities, or matrix of (A, E') probabilities
         """
         self.set_distribution(epsilons)
-        return self.distribution.sample(self.loss_ratios, probs)
+        return _broadcast(
+            self.distribution.sample(self.loss_ratios, probs), epsilons)
 
     @lru_cache()
     def loss_ratio_exceedance_matrix(self, loss_ratios):
@@ -776,8 +784,7 @@ class DegenerateDistribution(Distribution):
         return means
 
     def survival(self, loss_ratio, mean, _stddev):
-        return numpy.piecewise(
-            loss_ratio, [loss_ratio > mean or not mean], [0, 1])
+        return numpy.where((loss_ratio > mean) | (mean == 0), 0., 1.)
 
 
 def make_epsilons(matrix, seed, correlation):
@@ -817,7 +824,7 @@ class LogNormalDistribution(Distribution):
         if self.epsilons is None:
             raise ValueError("A LogNormalDistribution must be initialized "
                              "before you can use it")
-        eps = self.epsilons[idxs]
+        eps = self.epsilons[..., idxs]  # shape E' or (A, E')
         sigma = numpy.sqrt(numpy.log(covs ** 2.0 + 1.0))
         probs = means / numpy.sqrt(1 + covs ** 2) * numpy.exp(eps * sigma)
         return probs
@@ -826,16 +833,18 @@ class LogNormalDistribution(Distribution):
         # scipy does not handle correctly the limit case stddev = 0.
         # In that case, when `mean` > 0 the survival function
         # approaches to a step function, otherwise (`mean` == 0) we
-        # returns 0
-        if stddev == 0:
-            return numpy.piecewise(
-                loss_ratio, [loss_ratio > mean or not mean], [0, 1])
-
-        variance = stddev ** 2.0
-
-        sigma = numpy.sqrt(numpy.log((variance / mean ** 2.0) + 1.0))
-        mu = mean ** 2.0 / numpy.sqrt(variance + mean ** 2.0)
-        return stats.lognorm.sf(loss_ratio, sigma, scale=mu)
+        # returns 0; the arguments can be arrays, broadcast together
+        loss_ratio, mean, stddev = numpy.broadcast_arrays(
+            loss_ratio, mean, stddev)
+        res = numpy.where((loss_ratio > mean) | (mean == 0), 0., 1.)
+        ok = stddev > 0
+        if ok.any():
+            variance = stddev[ok] ** 2.0
+            mean = mean[ok]
+            sigma = numpy.sqrt(numpy.log((variance / mean ** 2.0) + 1.0))
+            mu = mean ** 2.0 / numpy.sqrt(variance + mean ** 2.0)
+            res[ok] = stats.lognorm.sf(loss_ratio[ok], sigma, scale=mu)
+        return res
 
 
 @DISTRIBUTIONS.add('BT')
@@ -989,32 +998,28 @@ def classical(vulnerability_function, hazard_imls, hazard_poes, loss_ratios):
     :param hazard_imls:
         the hazard intensity measure type and levels
     :type hazard_poes:
-        the hazard curve
+        the hazard curve, or an array of N hazard curves
     :param loss_ratios:
         a tuple of C loss ratios
     :returns:
-        an array of shape (2, C)
+        an array of shape (2, C), or (N, 2, C) for N hazard curves
     """
-    assert len(hazard_imls) == len(hazard_poes), (
-        len(hazard_imls), len(hazard_poes))
+    hazard_poes = numpy.array(hazard_poes)
+    assert len(hazard_imls) == hazard_poes.shape[-1], (
+        len(hazard_imls), hazard_poes.shape)
     vf = vulnerability_function
-    imls = vf.mean_imls()
-    lrem = vf.loss_ratio_exceedance_matrix(loss_ratios)
+    lrem = vf.loss_ratio_exceedance_matrix(loss_ratios)  # shape (C, I)
 
     # saturate imls to hazard imls
-    min_val, max_val = hazard_imls[0], hazard_imls[-1]
-    numpy.putmask(imls, imls < min_val, min_val)
-    numpy.putmask(imls, imls > max_val, max_val)
+    imls = numpy.clip(vf.mean_imls(), hazard_imls[0], hazard_imls[-1])
 
-    # interpolate the hazard curve
+    # interpolate the hazard curves, shape (..., I + 1)
     poes = interpolate.interp1d(hazard_imls, hazard_poes)(imls)
 
-    # compute the poos
-    pos = pairwise_diff(poes)
-    lrem_po = numpy.empty(lrem.shape)
-    for idx, po in enumerate(pos):
-        lrem_po[:, idx] = lrem[:, idx] * po  # column * po
-    return numpy.array([loss_ratios, lrem_po.sum(axis=1)])
+    # compute the poos and the loss curves with a single matrix product
+    pos = poes[..., :-1] - poes[..., 1:]  # shape (..., I)
+    lrs = numpy.broadcast_to(loss_ratios, pos.shape[:-1] + (len(lrem),))
+    return numpy.stack([lrs, pos @ lrem.T], axis=-2)
 
 
 def conditional_loss_ratio(loss_ratios, poes, probability):
@@ -1205,9 +1210,13 @@ def average_loss(lc):
            is a result of a linear interpolation, we compute an exact
            integral by using the trapeizodal rule with the width given by the
            loss bin width.
+
+    The loss curve array can also have shape (A, C): then A average losses
+    are returned.
     """
     losses, poes = (lc['loss'], lc['poe']) if lc.dtype.names else lc
-    return -pairwise_diff(losses) @ pairwise_mean(poes)
+    return numpy.einsum('...c,...c', numpy.diff(losses),
+                        (poes[..., :-1] + poes[..., 1:]) / 2)
 
 
 def normalize_curves_eb(curves):
@@ -1543,10 +1552,11 @@ consequence = CallableDict()
 @consequence.add('losses')
 def economic_losses(coeffs, asset, dmgdist, loss_type):
     """
-    :param coeffs: coefficients per damage state
-    :param asset: asset record
-    :param dmgdist: an array of probabilies of shape (E, D - 1)
+    :param coeffs: coefficients per damage state, shape (D - 1) or (A, D - 1)
+    :param asset: asset record or array of A asset records
+    :param dmgdist: probabilies of shape (E, D - 1) or (A, E, D - 1)
     :param loss_type: loss type string
-    :returns: array of economic losses of length E
+    :returns: array of economic losses of shape E or (A, E)
     """
-    return dmgdist @ coeffs * asset['value-' + loss_type]
+    value = numpy.array(asset['value-' + loss_type])[..., None]
+    return numpy.einsum('...ed,...d->...e', dmgdist, coeffs) * value
@@ -197,3 +197,32 @@ class ClassicalTestCase(unittest.TestCase):
         for loss, poe in expected_curve:
             numpy.testing.assert_allclose(
                 poe, actual_poes_interp(loss), atol=0.005)
+
+    def test_compute_loss_ratio_curves_block(self):
+        hazard_imls = [0.01, 0.08, 0.17, 0.26, 0.36, 0.55, 0.7]
+        hazard_curves = numpy.array([
+            [0.99, 0.96, 0.89, 0.82, 0.7, 0.4, 0.01],
+            [0.9, 0.8, 0.6, 0.4, 0.2, 0.1, 0.0]])
+        imls = [0.1, 0.2, 0.4, 0.6]
+        covs = [0.5, 0.3, 0.2, 0.]
+        loss_ratios = [0.05, 0.08, 0.2, 0.4]
+        vf = scientific.VulnerabilityFunction(
+            'VF', 'PGA', imls, loss_ratios, covs, "LN")
+        vf.seed = 42
+        vf.init()
+        ratios = tuple(vf.mean_loss_ratios_with_steps(2))
+
+        # the vectorized LREM is the same as the one computed cell by cell
+        lrem = vf.loss_ratio_exceedance_matrix(ratios)
+        for row, lr in enumerate(ratios):
+            for col, (mean, std) in enumerate(
+                    zip(vf.mean_loss_ratios, vf.stddevs)):
+                self.assertAlmostEqual(
+                    lrem[row, col], vf.distribution.survival(lr, mean, std))
+
+        # a block of hazard curves gives the same curves one by one
+        curves = scientific.classical(vf, hazard_imls, hazard_curves, ratios)
+        self.assertEqual(curves.shape, (2, 2, len(ratios)))
+        for curve, hazard_curve in zip(curves, hazard_curves):
+            numpy.testing.assert_allclose(curve, scientific.classical(
+                vf, hazard_imls, hazard_curve, ratios))
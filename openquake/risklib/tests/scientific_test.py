@@ -304,6 +304,23 @@ class VulnerabilityFunctionBlockSizeTestCase(unittest.TestCase):
         # this test has been broken forever, finally fixed in OpenQuake 1.5
         self.assertEqual(singleblock, multiblock)
 
+    def test_epsilon_matrix(self):
+        # sampling with a matrix of epsilons of shape (A, E) produces the
+        # same loss ratios as sampling one asset at the time
+        gmvs = numpy.array([0.3307648, 0.77900947, 0., 2.15393227, 0.01])
+        eps = numpy.random.RandomState(42).normal(size=(3, 5))
+        for dist in ('LN', 'BT'):
+            vf = scientific.VulnerabilityFunction(
+                'RM', 'PGA', [0.02, 0.3, 0.5, 0.9, 1.2],
+                [0.05, 0.1, 0.2, 0.4, 0.8], [0.1, 0.1, 0.1, 0.1, 0.1], dist)
+            vf.seed = 42
+            vf.init()
+            means, covs, idxs = vf.interpolate(gmvs)
+            ratios = vf.sample(means, covs, idxs, eps)
+            self.assertEqual(ratios.shape, (3, idxs.sum()))
+            for a in range(3):
+                aaae(ratios[a], vf.sample(means, covs, idxs, eps[a]))
+
 
 class MeanLossTestCase(unittest.TestCase):
     def test_mean_loss(self):